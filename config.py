@@ -32,6 +32,9 @@ RECENT_PATH = os.path.join(
     os.environ.get("APPDATA", ""), "Microsoft", "Windows", "Recent"
 )
 
+# Listas de saltos (jump lists) de Windows: historial por aplicacion
+RECENT_JUMPLIST_PATH = os.path.join(RECENT_PATH, "AutomaticDestinations")
+
 # Dias para considerar un archivo como "reciente"
 RECENT_DAYS = 30
 
@@ -41,6 +44,42 @@ SECONDS_PER_DAY = 86400
 # Directorios del sistema a excluir en busquedas de disco
 SKIP_DIRS = {"$Recycle.Bin", "System Volume Information", "Windows", "$WinREAgent", "Recovery"}
 
+# Filas por pagina en la vista de resultados (arriba de esto se pagina)
+RESULTS_PAGE_SIZE = 25
+
+# Copias simultaneas al restaurar varios archivos a la vez
+RESTORE_WORKERS = 4
+
+# Arriba de este total se pregunta si verificar con SHA-256 (sin hash la copia es mas rapida)
+VERIFY_PROMPT_BYTES = 1024 ** 3
+
+# Carpeta de datos persistentes de la app (indices, caches)
+APP_CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "SalvaGodinez",
+)
+
+# Indice de propiedades de documentos (autor, titulo...) por (ruta, tamano, mtime)
+DOC_INDEX_PATH = os.path.join(APP_CACHE_DIR, "propiedades.sqlite")
+
+# Hilos para leer docProps de archivos nuevos o modificados
+DOC_PROPS_WORKERS = 8
+
+# Memoria para la tabla de claves al comparar CSV por clave (arriba se usa disco)
+CSV_JOIN_MEMORY = 256 * 1024 ** 2
+
+# Huellas de hojas y resumenes de comparaciones de carpetas ya hechas
+COMPARE_CACHE_PATH = os.path.join(APP_CACHE_DIR, "comparaciones.sqlite")
+
+# Parejas de libros que se comparan a la vez al comparar carpetas
+BATCH_COMPARE_WORKERS = 4
+
+# Hojas ya leidas (valores, formulas, estilos) de libros que no cambiaron
+WORKBOOK_CACHE_DIR = os.path.join(APP_CACHE_DIR, "hojas")
+
+# Espacio maximo de esa cache; al pasarlo se borran las hojas usadas hace mas tiempo
+WORKBOOK_CACHE_BYTES = 2 * 1024 ** 3
+
 # ─── Fase 2: Constantes adicionales ─────────────────────────
 
 # Respaldo rapido a USB: carpetas de origen
@@ -8,9 +8,12 @@ de impresoras, diagnostico del sistema y mas.
 
 __version__ = "2.3.0"
 
+import multiprocessing
+import sqlite3
 import sys
 import os
 import webbrowser
+from datetime import datetime
 
 # Agregar el directorio del script al path para imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -21,11 +24,17 @@ from rich import box
 
 # Searchers (modulo de rescate de archivos Office)
 from searchers.recycle_bin import search_recycle_bin
-from searchers.disk_search import search_by_name, search_recent_excel
+from searchers.disk_search import (
+    doc_index_info, parse_property_query, search_by_name, search_by_properties,
+    search_recent_excel, update_doc_index,
+)
 from searchers.temp_files import search_temp_files
 from searchers.recent_files import search_recent_files
 from searchers.shadow_copies import search_shadow_copies
+from searchers.fat_undelete import search_deleted_usb, recover_deleted
+from searchers.orchestrator import run_sources
 from reporting.console_report import show_results, offer_restore
+from reporting.export import offer_export
 
 # Tools — Fase 1
 from tools.spooler import reset_spooler
@@ -39,7 +48,11 @@ from tools.password_generator import password_generator_menu
 from tools.excel_cell_cleaner import cell_cleaner_menu
 from tools.excel_consolidator import consolidator_menu
 from tools.excel_comparator import comparator_menu
+from tools.excel_batch import batch_compare_menu
 from tools.file_unlocker import file_unlocker_menu
+from tools.office_carver import carver_menu
+from tools.office_validator import validate_results
+from tools.xlsx_repair import xlsx_repair_menu
 from tools.ghost_printers import ghost_printers_menu
 from tools.ping_checker import ping_checker_menu
 from tools.usb_health import usb_health_menu
@@ -55,7 +68,8 @@ from tools.printer_share import printer_share_menu
 from tools.salary_calculator import salary_calculator_menu
 from tools.retention_calculator import retention_calculator_menu
 from tools.updater import check_for_updates
-from utils import deduplicate as _deduplicate, console
+from tools import is_admin
+from utils import get_drives, raw_device_path, console
 
 
 BANNER = r"""[bold cyan]
@@ -106,6 +120,7 @@ def show_office_submenu() -> str:
             "[bold]3[/bold] - Consolidador de Libros\n"
             "[bold]4[/bold] - Comparador de Excel\n"
             "[bold]5[/bold] - Desbloquear Archivo\n"
+            "[bold]6[/bold] - Comparar Carpetas de Excel\n"
             "[bold]0[/bold] - Volver",
             title="[bold yellow]Office (El Rescatista)[/bold yellow]",
             box=box.ROUNDED,
@@ -128,12 +143,14 @@ def office_menu() -> None:
             comparator_menu()
         elif choice == "5":
             file_unlocker_menu()
+        elif choice == "6":
+            batch_compare_menu()
         elif choice == "0":
             break
         else:
             console.print("[red]Opcion no valida.[/red]")
 
-        if choice in ("2", "3", "4", "5"):
+        if choice in ("2", "3", "4", "5", "6"):
             Prompt.ask("\n[dim]Presiona Enter para continuar[/dim]", default="")
 
 
@@ -306,6 +323,10 @@ def show_office_rescue_menu() -> str:
             "[bold]4[/bold] - Revisar archivos temporales / autorecuperacion\n"
             "[bold]5[/bold] - Revisar archivos recientes de Windows\n"
             "[bold]6[/bold] - Busqueda completa (todas las opciones)\n"
+            "[bold]7[/bold] - Recuperar de USB/SD formateada\n"
+            "[bold]8[/bold] - Archivos borrados en USB (FAT32/exFAT)\n"
+            "[bold]9[/bold] - Reparar Excel danado (.xlsx)\n"
+            "[bold]10[/bold] - Buscar por autor / titulo (propiedades del documento)\n"
             "[bold]0[/bold] - Volver",
             title="[bold yellow]Rescatista de Archivos Office[/bold yellow]",
             box=box.ROUNDED,
@@ -314,42 +335,65 @@ def show_office_rescue_menu() -> str:
     return Prompt.ask("[bold cyan]Opcion[/bold cyan]", default="0")
 
 
+def _offer_validation(results: list[dict]) -> None:
+    """Ofrece revisar cuales resultados abren antes de mostrarlos."""
+    if not results:
+        return
+    choice = Prompt.ask(
+        "Revisar integridad de los archivos? ([bold]s[/bold]i / "
+        "[bold]p[/bold]rofunda / [bold]n[/bold]o)",
+        choices=["s", "p", "n"],
+        default="n",
+    )
+    if choice == "n":
+        return
+    with console.status("[bold green]Revisando archivos...") as status:
+        def progress(done, total):
+            status.update(f"[bold green]Revisando archivos...[/bold green] {done}/{total}")
+        counts = validate_results(results, deep=(choice == "p"), progress_callback=progress)
+    summary = ", ".join(f"{n} {state}" for state, n in sorted(counts.items()))
+    console.print(f"[dim]Integridad: {summary}[/dim]")
+
+
+def _show_and_offer(results: list[dict], title: str) -> None:
+    """Muestra resultados y ofrece revisarlos, exportarlos y restaurarlos."""
+    _offer_validation(results)
+    show_results(results, title=title)
+    offer_export(results)
+    offer_restore(results)
+
+
 def ask_name() -> str:
     return Prompt.ask(
         "[bold]Nombre (o parte del nombre) del archivo[/bold]"
     ).strip()
 
 
+def _rescue_sources(name: str) -> list[tuple[str, object]]:
+    """Fuentes de rescate independientes para el orquestador (un disco por hilo)."""
+    sources = [
+        ("Papelera de reciclaje", lambda progress: search_recycle_bin(name)),
+        ("Temporales / autorecuperacion", lambda progress: search_temp_files(name)),
+        ("Recientes de Windows", lambda progress: search_recent_files(name)),
+    ]
+    for drive in get_drives():
+        sources.append((
+            f"Disco {drive.rstrip(os.sep)}",
+            lambda progress, d=drive: search_by_name(name, progress_callback=progress,
+                                                     drives=[d]),
+        ))
+    sources.append(("Shadow copies (VSS)", lambda progress: search_shadow_copies(name)))
+    return sources
+
+
 def option_search_by_name() -> None:
     name = ask_name()
     if not name:
         console.print("[red]Debes ingresar un nombre.[/red]")
         return
 
-    all_results = []
-
-    with console.status("[bold green]Buscando en papelera de reciclaje..."):
-        all_results.extend(search_recycle_bin(name))
-
-    with console.status("[bold green]Buscando en archivos temporales / autorecuperacion..."):
-        all_results.extend(search_temp_files(name))
-
-    with console.status("[bold green]Revisando archivos recientes de Windows..."):
-        all_results.extend(search_recent_files(name))
-
-    console.print("[bold yellow]Buscando en todos los discos (esto puede tardar)...[/bold yellow]")
-    with console.status("[bold green]Escaneando discos...") as status:
-        def progress(path):
-            display = path if len(path) < 60 else "..." + path[-57:]
-            status.update(f"[bold green]Escaneando:[/bold green] {display}")
-        all_results.extend(search_by_name(name, progress_callback=progress))
-
-    with console.status("[bold green]Revisando shadow copies (VSS)..."):
-        all_results.extend(search_shadow_copies(name))
-
-    all_results = _deduplicate(all_results)
-    show_results(all_results, title=f"Resultados para '{name}'")
-    offer_restore(all_results)
+    all_results = run_sources(_rescue_sources(name), title=f"Buscando '{name}'")
+    _show_and_offer(all_results, title=f"Resultados para '{name}'")
 
 
 def option_recent_office() -> None:
@@ -360,8 +404,50 @@ def option_recent_office() -> None:
             status.update(f"[bold green]Escaneando:[/bold green] {display}")
         results = search_recent_excel(progress_callback=progress)
 
-    show_results(results, title="Archivos Office recientes (ultimos 30 dias)")
-    offer_restore(results)
+    _show_and_offer(results, title="Archivos Office recientes (ultimos 30 dias)")
+
+
+def option_search_by_properties() -> None:
+    count, updated = doc_index_info()
+    if count:
+        stamp = datetime.fromtimestamp(updated).strftime("%Y-%m-%d %H:%M") if updated else "?"
+        console.print(f"[dim]Indice: {count} documento(s), actualizado {stamp}[/dim]")
+        refresh = Prompt.ask(
+            "Actualizar el indice antes de buscar? (s/n)", choices=["s", "n"], default="n"
+        ) == "s"
+    else:
+        console.print(
+            "[yellow]El indice esta vacio: la primera pasada recorre todos los discos "
+            "y puede tardar. Las siguientes solo leen archivos nuevos o modificados.[/yellow]"
+        )
+        refresh = True
+
+    if refresh:
+        try:
+            with console.status("[bold green]Indexando propiedades...") as status:
+                def progress(path):
+                    display = path if len(path) < 60 else "..." + path[-57:]
+                    status.update(f"[bold green]Indexando:[/bold green] {display}")
+                stats = update_doc_index(progress_callback=progress)
+        except (OSError, sqlite3.Error) as e:
+            console.print(f"[red]No se pudo actualizar el indice:[/red] {e}")
+            return
+        console.print(
+            f"[dim]{stats['archivos']} documento(s) en disco, {stats['leidos']} leido(s), "
+            f"{stats['eliminados']} eliminado(s) del indice[/dim]"
+        )
+
+    query = Prompt.ask(
+        "[bold]Filtros[/bold] [dim](autor, modifico, titulo, asunto, palabras, empresa, "
+        'ext, dias; ej. autor="Juan Perez" dias=60 ext=xlsx)[/dim]'
+    )
+    try:
+        filters = parse_property_query(query)
+        results = search_by_properties(**filters)
+    except (ValueError, sqlite3.Error) as e:
+        console.print(f"[red]{e}[/red]")
+        return
+    _show_and_offer(results, title=f"Documentos con {query.strip() or 'cualquier propiedad'}")
 
 
 def option_recycle_bin() -> None:
@@ -370,8 +456,7 @@ def option_recycle_bin() -> None:
     )
     with console.status("[bold green]Revisando papelera de reciclaje..."):
         results = search_recycle_bin(name)
-    show_results(results, title="Archivos Office en la Papelera")
-    offer_restore(results)
+    _show_and_offer(results, title="Archivos Office en la Papelera")
 
 
 def option_temp_files() -> None:
@@ -380,8 +465,7 @@ def option_temp_files() -> None:
     )
     with console.status("[bold green]Buscando archivos temporales y de autorecuperacion..."):
         results = search_temp_files(name)
-    show_results(results, title="Archivos Temporales / Autorecuperacion")
-    offer_restore(results)
+    _show_and_offer(results, title="Archivos Temporales / Autorecuperacion")
 
 
 def option_recent_windows() -> None:
@@ -390,8 +474,7 @@ def option_recent_windows() -> None:
     )
     with console.status("[bold green]Revisando archivos recientes de Windows..."):
         results = search_recent_files(name)
-    show_results(results, title="Archivos Recientes de Windows")
-    offer_restore(results)
+    _show_and_offer(results, title="Archivos Recientes de Windows")
 
 
 def option_full_search() -> None:
@@ -400,45 +483,69 @@ def option_full_search() -> None:
         console.print("[red]Debes ingresar un nombre.[/red]")
         return
 
-    all_results = []
+    console.print("[bold yellow]Buscando en todas las fuentes a la vez...[/bold yellow]")
+    all_results = run_sources(_rescue_sources(name), title=f"Busqueda completa: '{name}'")
+    console.print()
+    _show_and_offer(all_results, title=f"Busqueda completa para '{name}'")
 
-    steps = [
-        ("Papelera de reciclaje", lambda: search_recycle_bin(name)),
-        ("Archivos temporales / autorecuperacion", lambda: search_temp_files(name)),
-        ("Archivos recientes de Windows", lambda: search_recent_files(name)),
-    ]
 
-    for label, searcher in steps:
-        with console.status(f"[bold green]Buscando en {label}..."):
-            results = searcher()
-            all_results.extend(results)
-            if results:
-                console.print(
-                    f"  [green]+{len(results)}[/green] encontrado(s) en {label}"
-                )
+def option_usb_deleted() -> None:
+    console.print(
+        "[dim]Escribe la letra de la USB (ej: E:) o la ruta de una imagen (.img, .dd).[/dim]"
+    )
+    source = Prompt.ask("[bold]Unidad o imagen[/bold]").strip().strip('"')
+    if not source:
+        return
+    source = raw_device_path(source)
+    if source.startswith("\\\\.\\") and not is_admin():
+        console.print("[red]Se requieren permisos de administrador para leer la USB directamente.[/red]")
+        return
 
-    console.print("[bold yellow]Escaneando todos los discos...[/bold yellow]")
-    with console.status("[bold green]Escaneando discos...") as status:
-        def progress(path):
-            display = path if len(path) < 60 else "..." + path[-57:]
-            status.update(f"[bold green]Escaneando:[/bold green] {display}")
-        results = search_by_name(name, progress_callback=progress)
-        all_results.extend(results)
-        if results:
-            console.print(f"  [green]+{len(results)}[/green] encontrado(s) en discos")
-
-    with console.status("[bold green]Revisando shadow copies (VSS)..."):
-        results = search_shadow_copies(name)
-        all_results.extend(results)
-        if results:
-            console.print(
-                f"  [green]+{len(results)}[/green] encontrado(s) en Shadow Copies"
-            )
-
-    all_results = _deduplicate(all_results)
-    console.print()
-    show_results(all_results, title=f"Busqueda completa para '{name}'")
-    offer_restore(all_results)
+    name = Prompt.ask(
+        "[bold]Filtrar por nombre (dejar vacio para ver todos)[/bold]", default=""
+    )
+    try:
+        with console.status("[bold green]Leyendo directorios de la USB..."):
+            results = search_deleted_usb(source, name)
+    except OSError as e:
+        console.print(f"[red]No se pudo leer {source}: {e}[/red]")
+        return
+
+    show_results(results, title="Archivos Office borrados en USB")
+    if not results:
+        return
+    offer_export(results)
+
+    choice = Prompt.ask(
+        "Numeros a recuperar (ej: 1,3,5), 'todo' o 0 para omitir", default="0"
+    ).strip().lower()
+    if choice in ("", "0"):
+        return
+    if choice == "todo":
+        selected = results
+    else:
+        selected = []
+        for part in choice.split(","):
+            part = part.strip()
+            if part.isdigit() and 1 <= int(part) <= len(results):
+                selected.append(results[int(part) - 1])
+    if not selected:
+        return
+
+    dest_dir = Prompt.ask(
+        "Carpeta destino (no uses la misma USB)",
+        default=os.path.join(os.path.expanduser("~"), "Desktop", "Recuperados"),
+    ).strip().strip('"')
+
+    try:
+        with console.status("[bold green]Recuperando archivos..."):
+            written = recover_deleted(selected, dest_dir)
+    except OSError as e:
+        console.print(f"[red]Error al recuperar: {e}[/red]")
+        return
+    console.print(
+        f"\n[bold green]{len(written)} archivo(s) recuperado(s) en:[/bold green] {dest_dir}\n"
+    )
 
 
 def office_rescue_menu() -> None:
@@ -458,6 +565,14 @@ def office_rescue_menu() -> None:
             option_recent_windows()
         elif choice == "6":
             option_full_search()
+        elif choice == "7":
+            carver_menu()
+        elif choice == "8":
+            option_usb_deleted()
+        elif choice == "9":
+            xlsx_repair_menu()
+        elif choice == "10":
+            option_search_by_properties()
         elif choice == "0":
             break
         else:
@@ -523,6 +638,8 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos del validador en el .exe congelado
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception:
@@ -1,52 +1,196 @@
 """Reporte de resultados en consola usando Rich y acciones de restauracion."""
 
 import os
-import shutil
 
 from rich.table import Table
 from rich.panel import Panel
-from rich.prompt import Prompt
-from utils import console
+from rich.progress import (
+    Progress, BarColumn, DownloadColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn,
+)
+from rich.markup import escape
+from rich.prompt import Confirm, Prompt
 
+from config import RESULTS_PAGE_SIZE, VERIFY_PROMPT_BYTES
+from reporting.restore import parse_selection, restore_files
+from reporting.result_index import ResultIndex, SORT_FIELDS
+from tools.office_validator import DAMAGED, MISSING, OK as HEALTH_OK
+from utils import console, format_size
 
 
-def show_results(results: list[dict], title: str = "Resultados") -> None:
-    """Muestra los resultados en una tabla Rich.
+# Color de cada estado de la columna "Salud"
+_HEALTH_STYLES = {HEALTH_OK: "green", DAMAGED: "bold red", MISSING: "red"}
 
-    Args:
-        results: Lista de dicts con nombre, ruta, tamano, fecha, origen.
-        title: Titulo de la tabla.
-    """
-    if not results:
-        console.print(
-            Panel("[yellow]No se encontraron archivos.[/yellow]", title=title)
-        )
-        return
 
-    table = Table(title=title, show_lines=True)
-    table.add_column("#", style="bold cyan", width=4, justify="right")
+def _results_table(results: list[dict], rows, title: str, caption: str = "") -> Table:
+    """Tabla Rich solo con las filas indicadas (indices 0-based de `results`)."""
+    # validate_results marca todos los resultados, basta revisar el primero
+    health = bool(results) and "salud" in results[0]
+
+    table = Table(title=title, show_lines=True, caption=caption or None)
+    table.add_column("#", style="bold cyan", width=6, justify="right")
     table.add_column("Nombre", style="bold white", max_width=40)
     table.add_column("Ruta", style="dim", max_width=60)
     table.add_column("Tamano", justify="right", style="green")
     table.add_column("Fecha", style="yellow")
     table.add_column("Origen", style="magenta")
+    if health:
+        table.add_column("Salud", max_width=30)
 
-    for i, r in enumerate(results, 1):
-        table.add_row(
-            str(i),
+    for i in rows:
+        r = results[i]
+        cells = [
+            str(i + 1),
             r.get("nombre", "?"),
             r.get("ruta", "?"),
             r.get("tamano", "?"),
             r.get("fecha", "?"),
             r.get("origen", "?"),
+        ]
+        if health:
+            state = r.get("salud", "")
+            style = _HEALTH_STYLES.get(state, "dim")
+            detail = r.get("salud_detalle", "")
+            text = f"[{style}]{state}[/{style}]"
+            if detail and state != "OK":
+                text += f"\n[dim]{escape(detail)}[/dim]"
+            cells.append(text)
+        table.add_row(*cells)
+    return table
+
+
+def _page_results(results: list[dict], title: str) -> None:
+    """Vista paginada: solo se dibuja la ventana visible.
+
+    La vista es una lista de indices que sale de un ResultIndex, asi que
+    ordenar y filtrar no copia resultados ni vuelve a buscar, y los
+    numeros "#" siempre son los originales (siguen sirviendo para
+    restaurar despues).
+    """
+    page_size = max(1, RESULTS_PAGE_SIZE)
+    index = ResultIndex(results)
+    filters = {}             # "texto" / "origen" / "ext" -> (valor, mapa de bits)
+    sort, descending = None, False
+    view = index.view()
+    page = 0
+
+    def refresh():
+        mask = index.all_mask
+        for _, bits in filters.values():
+            mask &= bits
+        return index.view(mask, sort, descending)
+
+    while True:
+        pages = max(1, -(-len(view) // page_size))
+        page = min(max(page, 0), pages - 1)
+        start = page * page_size
+        rows = view[start:start + page_size]
+
+        caption = f"Pagina {page + 1}/{pages} - {len(view)} de {len(results)} resultado(s)"
+        for key, (value, _) in filters.items():
+            caption += f" - {key}: '{value}'"
+        if sort:
+            caption += f" - orden: {sort}{' (desc)' if descending else ''}"
+        console.print(_results_table(results, rows, title, caption))
+
+        cmd = Prompt.ask(
+            "[dim]\\[n/p] pagina  \\[g N] ir a #N  \\[/texto] buscar  "
+            "\\[o texto] origen  \\[e ext] extension  "
+            "\\[s campo | s -campo] ordenar (nombre, tamano, fecha, origen, ext)  "
+            "\\[x] quitar filtros  \\[q] terminar[/dim]",
+            default="n" if page + 1 < pages else "q",
+            show_default=False,
+        ).strip()
+        low = cmd.lower()
+        arg = cmd[1:].strip()
+
+        if low in ("q", "0", ""):
+            return
+        if low == "n":
+            if page + 1 >= pages:
+                console.print("[dim]Ya estas en la ultima pagina.[/dim]")
+            page += 1
+            continue
+        if low == "p":
+            page -= 1
+            continue
+
+        if low == "x" or low == "/":
+            filters.clear()
+            new_filters = filters
+        elif cmd.startswith("/") or low[:2] in ("o ", "e "):
+            kind = {"/": "texto", "o": "origen", "e": "ext"}[low[0]]
+            if kind == "texto":
+                # Busqueda incremental: si se extiende el texto, solo se revisan las filas que ya coincidian
+                prev = filters.get("texto")
+                within = prev[1] if prev and arg.lower().startswith(prev[0].lower()) else None
+                bits = index.text_mask(arg, within)
+            elif kind == "origen":
+                bits = index.origin_mask(arg)
+            else:
+                bits = index.ext_mask(arg)
+            new_filters = dict(filters)
+            new_filters[kind] = (arg, bits)
+        elif low.startswith("s "):
+            field = low[2:].strip()
+            desc = field.startswith("-")
+            field = field.lstrip("-")
+            if field not in SORT_FIELDS:
+                console.print(f"[red]Campo no valido: {field}[/red]")
+                continue
+            sort, descending = field, desc
+            new_filters = filters
+        else:
+            target = low[1:].strip() if low.startswith("g") else low
+            if not target.isdigit():
+                console.print("[red]Comando no valido.[/red]")
+                continue
+            try:
+                pos = view.index(int(target) - 1)
+            except ValueError:
+                console.print(f"[yellow]El #{target} no esta en la vista actual.[/yellow]")
+                continue
+            page = pos // page_size
+            continue
+
+        saved, filters = filters, new_filters
+        new_view = refresh()
+        if not new_view and filters:
+            console.print("[yellow]Sin coincidencias; se conserva el filtro anterior.[/yellow]")
+            filters = saved
+            continue
+        view = new_view
+        page = 0
+
+
+def show_results(results: list[dict], title: str = "Resultados") -> None:
+    """Muestra los resultados en una tabla Rich.
+
+    Si hay mas de RESULTS_PAGE_SIZE resultados se muestran por paginas,
+    con busqueda, filtros, orden y salto a fila, para no dibujar miles de
+    filas de golpe.
+
+    Args:
+        results: Lista de dicts con nombre, ruta, tamano, fecha, origen.
+        title: Titulo de la tabla.
+    """
+    if not results:
+        console.print(
+            Panel("[yellow]No se encontraron archivos.[/yellow]", title=title)
         )
+        return
 
-    console.print(table)
+    if len(results) > RESULTS_PAGE_SIZE:
+        _page_results(results, title)
+    else:
+        console.print(_results_table(results, range(len(results)), title))
     console.print(f"\n  [bold]Total: {len(results)} archivo(s) encontrado(s)[/bold]\n")
 
 
 def offer_restore(results: list[dict]) -> None:
-    """Ofrece copiar/restaurar un archivo encontrado a una ubicacion elegida.
+    """Ofrece copiar/restaurar uno o varios archivos encontrados.
+
+    Acepta numeros, rangos, "origen:texto", "patron:*.xlsx" o "todo"
+    (ver `reporting.restore.parse_selection`).
 
     Args:
         results: Lista de resultados mostrados previamente.
@@ -55,52 +199,103 @@ def offer_restore(results: list[dict]) -> None:
         return
 
     console.print(
-        "[bold cyan]Puedes copiar un archivo encontrado a otra ubicacion.[/bold cyan]"
-    )
-    choice = Prompt.ask(
-        "Numero del archivo a copiar (0 para omitir)", default="0"
+        "[bold cyan]Puedes copiar archivos encontrados a otra ubicacion.[/bold cyan]\n"
+        "[dim]Ej: 3  |  1-5,8  |  origen:papelera  |  patron:*.xlsx  |  todo[/dim]"
     )
+    choice = Prompt.ask("Archivos a copiar (0 para omitir)", default="0").strip()
+    if choice in ("", "0"):
+        return
 
     try:
-        idx = int(choice)
-    except ValueError:
+        indices = parse_selection(choice, results)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
         return
-
-    if idx < 1 or idx > len(results):
+    if not indices:
+        console.print("[yellow]La seleccion no coincide con ningun archivo.[/yellow]")
         return
 
-    selected = results[idx - 1]
-    source = selected["ruta"]
-
-    if not os.path.isfile(source):
-        console.print(
-            f"[red]El archivo ya no existe en:[/red] {source}"
-        )
+    selected = []
+    for i in indices:
+        item = results[i]
+        # Algunos origenes (papelera) guardan el contenido en otra ruta
+        source = item.get("ruta_fuente") or item["ruta"]
+        if os.path.isfile(source):
+            selected.append(item)
+        else:
+            console.print(f"[red]El archivo ya no existe en:[/red] {source}")
+    if not selected:
         return
 
     dest_dir = Prompt.ask(
         "Carpeta destino (ej: C:\\Users\\TuUsuario\\Desktop)",
         default=os.path.join(os.path.expanduser("~"), "Desktop"),
-    )
+    ).strip().strip('"')
 
     if not os.path.isdir(dest_dir):
         console.print(f"[red]La carpeta no existe:[/red] {dest_dir}")
         return
 
-    dest_path = os.path.join(dest_dir, selected["nombre"])
+    many = len(selected) > 1
+    total = 0
+    for item in selected:
+        try:
+            total += os.path.getsize(item.get("ruta_fuente") or item["ruta"])
+        except OSError:
+            pass
 
-    # Evitar sobreescribir
-    if os.path.exists(dest_path):
-        base, ext = os.path.splitext(selected["nombre"])
-        counter = 1
-        while os.path.exists(dest_path):
-            dest_path = os.path.join(dest_dir, f"{base}_recuperado{counter}{ext}")
-            counter += 1
+    verify = True
+    if total >= VERIFY_PROMPT_BYTES:
+        verify = Confirm.ask(
+            f"Son {format_size(total)}. Verificar cada copia con SHA-256? "
+            "(sin verificar la copia es mas rapida)",
+            default=True,
+        )
 
-    try:
-        shutil.copy2(source, dest_path)
+    with Progress(
+        TextColumn("[bold cyan]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=console,
+    ) as progress:
+        task = progress.add_task(f"Copiando 0/{len(selected)}", total=total)
+        done = [0]
+
+        def on_bytes(n):
+            progress.advance(task, n)
+
+        def on_done(item, dest, error):
+            done[0] += 1
+            progress.update(task, description=f"Copiando {done[0]}/{len(selected)}")
+            if error:
+                progress.console.print(f"[red]Error al copiar {item['nombre']}:[/red] {error}")
+
+        summary = restore_files(selected, dest_dir, on_done, write_manifest=many,
+                                bytes_callback=on_bytes, verify=verify)
+
+    if summary["fallidos"]:
+        console.print(
+            "[yellow]Las copias incompletas quedaron como .parcial; "
+            "repite la restauracion a la misma carpeta para continuarlas.[/yellow]"
+        )
+    copied = summary["copiados"]
+    if not copied:
+        return
+    if many:
+        console.print(
+            f"\n[bold green]{len(copied)} archivo(s) copiados a:[/bold green] {dest_dir} "
+            f"({format_size(summary['bytes'])})"
+        )
+        if summary["manifiesto"]:
+            console.print(f"[dim]Hashes SHA-256 en: {summary['manifiesto']}[/dim]")
+        console.print()
+    else:
+        dest_path, sha = copied[0]
         console.print(
-            f"\n[bold green]Archivo copiado exitosamente a:[/bold green] {dest_path}\n"
+            f"\n[bold green]Archivo copiado exitosamente a:[/bold green] {dest_path}"
         )
-    except OSError as e:
-        console.print(f"[red]Error al copiar:[/red] {e}")
+        if sha:
+            console.print(f"[dim]SHA-256: {sha}[/dim]")
+        console.print()
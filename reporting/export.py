@@ -0,0 +1,185 @@
+"""Exportacion de resultados de rescate a CSV, JSON Lines y XLSX.
+
+Cada escritor recibe una fila a la vez y la manda directo al archivo,
+asi que se puede exportar mientras un buscador sigue produciendo
+resultados y nunca se arma una segunda copia de la lista en memoria.
+El XLSX usa el modo write-only de openpyxl, que tambien escribe fila por
+fila sin construir el libro completo.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+
+from rich.prompt import Prompt
+
+from utils import get_openpyxl as _get_openpyxl, console
+
+
+# Columnas exportadas, en orden (clave del resultado, encabezado)
+EXPORT_FIELDS = [
+    ("nombre", "Nombre"),
+    ("ruta", "Ruta"),
+    ("tamano", "Tamano"),
+    ("tamano_bytes", "Bytes"),
+    ("fecha", "Fecha"),
+    ("origen", "Origen"),
+    ("existe", "Existe"),
+    ("autor", "Autor"),
+    ("modifico", "Modificado por"),
+    ("titulo", "Titulo"),
+    ("salud", "Salud"),
+    ("salud_detalle", "Detalle salud"),
+]
+
+
+def _values(result: dict) -> list:
+    return [result.get(key, "") for key, _ in EXPORT_FIELDS]
+
+
+class _CsvWriter:
+    def __init__(self, path: str):
+        # utf-8-sig para que Excel abra bien los acentos
+        self._f = open(path, "w", encoding="utf-8-sig", newline="")
+        self._w = csv.writer(self._f)
+        self._w.writerow([header for _, header in EXPORT_FIELDS])
+
+    def write(self, result: dict) -> None:
+        self._w.writerow(_values(result))
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path: str):
+        self._f = open(path, "w", encoding="utf-8", newline="\n")
+
+    def write(self, result: dict) -> None:
+        row = {key: result.get(key, "") for key, _ in EXPORT_FIELDS}
+        self._f.write(json.dumps(row, ensure_ascii=False, default=str))
+        self._f.write("\n")
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path: str, openpyxl):
+        self._path = path
+        self._wb = openpyxl.Workbook(write_only=True)
+        self._ws = self._wb.create_sheet("Resultados")
+        self._ws.append([header for _, header in EXPORT_FIELDS])
+
+    def write(self, result: dict) -> None:
+        self._ws.append(_values(result))
+
+    def close(self) -> None:
+        self._wb.save(self._path)
+        self._wb.close()
+
+
+class ResultExporter:
+    """Escritor de resultados por streaming; usar como context manager.
+
+    Ejemplo:
+        with open_export("hallazgos.csv") as out:
+            for r in resultados:
+                out.write(r)
+    """
+
+    def __init__(self, writer):
+        self._writer = writer
+        self.count = 0
+
+    def write(self, result: dict) -> None:
+        self._writer.write(result)
+        self.count += 1
+
+    def write_many(self, results) -> None:
+        for r in results:
+            self.write(r)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_export(path: str) -> ResultExporter | None:
+    """Abre un exportador segun la extension de `path` (.csv, .jsonl, .xlsx).
+
+    Returns:
+        El exportador, o None si se pidio XLSX y openpyxl no esta instalado.
+
+    Raises:
+        ValueError: Si la extension no es soportada.
+        OSError: Si no se puede crear el archivo.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return ResultExporter(_CsvWriter(path))
+    if ext == ".jsonl":
+        return ResultExporter(_JsonlWriter(path))
+    if ext == ".xlsx":
+        openpyxl = _get_openpyxl()
+        if not openpyxl:
+            return None
+        return ResultExporter(_XlsxWriter(path, openpyxl))
+    raise ValueError(f"Formato no soportado: {ext or '(sin extension)'}")
+
+
+def export_results(results, path: str) -> int:
+    """Exporta resultados (lista o cualquier iterable/generador) a `path`.
+
+    Returns:
+        Numero de filas escritas, o 0 si no se pudo exportar.
+    """
+    exporter = open_export(path)
+    if exporter is None:
+        return 0
+    with exporter:
+        exporter.write_many(results)
+    return exporter.count
+
+
+def offer_export(results: list[dict]) -> None:
+    """Ofrece guardar los resultados mostrados para adjuntarlos a un ticket."""
+    if not results:
+        return
+
+    choice = Prompt.ask(
+        "Exportar resultados? ([bold]c[/bold]sv / [bold]j[/bold]sonl / "
+        "[bold]x[/bold]lsx / [bold]n[/bold]o)",
+        choices=["c", "j", "x", "n"],
+        default="n",
+    )
+    if choice == "n":
+        return
+
+    ext = {"c": ".csv", "j": ".jsonl", "x": ".xlsx"}[choice]
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    default_path = os.path.join(
+        os.path.expanduser("~"), "Desktop", f"rescate_{stamp}{ext}"
+    )
+    path = Prompt.ask("Archivo de salida", default=default_path).strip().strip('"')
+    if not path.lower().endswith(ext):
+        path += ext
+
+    try:
+        count = export_results(results, path)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]No se pudo exportar:[/red] {e}")
+        return
+    if count:
+        console.print(
+            f"[bold green]{count} resultado(s) exportados a:[/bold green] {path}\n"
+        )
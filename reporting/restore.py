@@ -0,0 +1,383 @@
+"""Restauracion masiva de resultados: seleccion multiple y copia en paralelo.
+
+Flujo:
+    1. `parse_selection` traduce lo que escribe el usuario ("1-5,8",
+       "origen:papelera", "patron:*.xlsx", "todo") a indices.
+    2. `plan_restore` decide el destino de cada archivo conservando la
+       estructura de carpetas relativa a su carpeta comun y resuelve los
+       choques de nombre en memoria: lista cada carpeta destino una sola
+       vez en lugar de preguntar `os.path.exists` por cada candidato.
+    3. `restore_files` copia con un pool de hilos acotado usando
+       `copy_file`: bloques grandes, reintento por bloque, reanudacion de
+       copias parciales y copia del kernel cuando no se pide hash. El
+       SHA-256 se calcula sobre los mismos bloques que se escriben, sin
+       una segunda lectura, y se guarda en un manifiesto.
+"""
+
+import errno
+import fnmatch
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from config import RESTORE_WORKERS
+
+
+# Bloque de lectura/escritura al copiar (grande: pocas llamadas en discos lentos)
+COPY_CHUNK = 8 * 1024 * 1024
+
+# Reintentos por bloque ante errores de lectura transitorios
+COPY_RETRIES = 3
+RETRY_DELAY = 0.5
+
+# Sufijo de la copia en curso y bytes de la cola que se comparan al reanudar
+PARTIAL_SUFFIX = ".parcial"
+RESUME_CHECK = 64 * 1024
+
+# errno que indican que la copia del kernel no aplica a estos archivos
+_NO_KERNEL_COPY = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+    getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL),
+}
+
+# Manifiesto con el hash de cada archivo restaurado (formato de sha256sum)
+MANIFEST_NAME = "restaurados.sha256"
+
+
+def parse_selection(text: str, results: list[dict]) -> list[int]:
+    """Traduce una seleccion a indices 0-based de `results`.
+
+    Acepta varias partes separadas por coma:
+        N          un resultado ("#" de la tabla)
+        N-M        un rango
+        todo       todos
+        origen:X   todos cuyo origen contiene X
+        patron:X   todos cuyo nombre coincide con el comodin X (*.xlsx, presu*)
+
+    Raises:
+        ValueError: Si alguna parte no se entiende o esta fuera de rango.
+    """
+    selected = set()
+    total = len(results)
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low = part.lower()
+        if low in ("todo", "todos"):
+            selected.update(range(total))
+        elif low.startswith("origen:"):
+            needle = low[len("origen:"):].strip()
+            selected.update(i for i, r in enumerate(results)
+                            if needle in str(r.get("origen", "")).lower())
+        elif low.startswith("patron:"):
+            pattern = low[len("patron:"):].strip()
+            if not any(c in pattern for c in "*?["):
+                pattern = f"*{pattern}*"
+            selected.update(i for i, r in enumerate(results)
+                            if fnmatch.fnmatchcase(str(r.get("nombre", "")).lower(), pattern))
+        else:
+            lo, sep, hi = part.partition("-")
+            if not lo.strip().isdigit() or (sep and not hi.strip().isdigit()):
+                raise ValueError(f"No se entiende '{part}'")
+            start = int(lo)
+            end = int(hi) if sep else start
+            if start > end:
+                start, end = end, start
+            if start < 1 or end > total:
+                raise ValueError(f"'{part}' esta fuera de rango (1-{total})")
+            selected.update(range(start - 1, end))
+    return sorted(selected)
+
+
+def _relative_dirs(paths: list[str]) -> list[str]:
+    """Carpeta de cada ruta relativa a la carpeta comun de todas.
+
+    Si las rutas estan en unidades distintas, cada una cuelga de una
+    carpeta con la letra de su unidad. Si ni dentro de la unidad hay
+    carpeta comun (rutas relativas mezcladas con absolutas), los archivos
+    de esa unidad quedan todos directo en su carpeta.
+    """
+    dirs = [os.path.dirname(os.path.normpath(p)) for p in paths]
+    try:
+        common = os.path.commonpath(dirs)
+        return [os.path.relpath(d, common) for d in dirs]
+    except ValueError:
+        pass
+
+    by_drive: dict[str, list[int]] = {}
+    for i, d in enumerate(dirs):
+        by_drive.setdefault(os.path.splitdrive(d)[0], []).append(i)
+    rel = [""] * len(dirs)
+    for drive, idxs in by_drive.items():
+        label = drive.rstrip(":\\/").replace("\\", "_").strip("_") or "raiz"
+        group = [dirs[i] for i in idxs]
+        try:
+            common = os.path.commonpath(group)
+        except ValueError:
+            for i in idxs:
+                rel[i] = label
+            continue
+        for i, d in zip(idxs, group):
+            rel[i] = os.path.join(label, os.path.relpath(d, common))
+    return rel
+
+
+def _unique_name(name: str, taken: set[str]) -> str:
+    """Nombre libre en `taken` (en minusculas, como compara Windows)."""
+    if name.lower() not in taken:
+        return name
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while True:
+        candidate = f"{base}_recuperado{counter}{ext}"
+        if candidate.lower() not in taken:
+            return candidate
+        counter += 1
+
+
+def plan_restore(items: list[dict], dest_dir: str) -> list[tuple[dict, str]]:
+    """Calcula el destino de cada resultado sin tocar el disco (salvo listar).
+
+    Returns:
+        Lista de (resultado, ruta_destino), en el orden de `items`.
+    """
+    if not items:
+        return []
+    rel_dirs = _relative_dirs([r["ruta"] for r in items])
+
+    taken_by_dir: dict[str, set[str]] = {}
+    plan = []
+    for item, rel in zip(items, rel_dirs):
+        target_dir = os.path.normpath(os.path.join(dest_dir, rel))
+        taken = taken_by_dir.get(target_dir)
+        if taken is None:
+            taken = set()
+            try:
+                with os.scandir(target_dir) as it:
+                    taken.update(entry.name.lower() for entry in it)
+            except OSError:
+                pass  # la carpeta aun no existe: no hay choques
+            taken_by_dir[target_dir] = taken
+        name = _unique_name(item["nombre"], taken)
+        taken.add(name.lower())
+        plan.append((item, os.path.join(target_dir, name)))
+    return plan
+
+
+def _read_chunk(src, offset: int, view: memoryview) -> int:
+    """Lee en `view` desde `offset`, reintentando errores transitorios.
+
+    Shadow copies y recursos de red fallan de vez en cuando con errores
+    de E/S que se resuelven al reintentar; solo se repite el bloque.
+    """
+    for attempt in range(COPY_RETRIES + 1):
+        try:
+            src.seek(offset)
+            return src.readinto(view)
+        except OSError:
+            if attempt == COPY_RETRIES:
+                raise
+            time.sleep(RETRY_DELAY * (attempt + 1))
+    return 0
+
+
+def _resume_offset(src, partial: str, size: int, digest) -> int:
+    """Bytes validos de una copia parcial previa (0 si no hay o no coincide).
+
+    Compara la cola del parcial con el origen para no continuar una copia
+    de otro archivo; si hay que calcular hash, lo alimenta con lo que ya
+    estaba copiado (lectura local, no del origen lento).
+    """
+    try:
+        done = os.path.getsize(partial)
+    except OSError:
+        return 0
+    if done == 0 or done > size:
+        return 0
+    tail = min(done, RESUME_CHECK)
+    try:
+        with open(partial, "rb") as f:
+            f.seek(done - tail)
+            mine = f.read(tail)
+            src.seek(done - tail)
+            if mine != src.read(tail):
+                return 0
+            if digest is not None:
+                f.seek(0)
+                for block in iter(lambda: f.read(COPY_CHUNK), b""):
+                    digest.update(block)
+    except OSError:
+        return 0
+    return done
+
+
+def _copy_kernel(src, dst, offset: int, size: int, progress_callback) -> int:
+    """Copia dentro del kernel (copy_file_range o sendfile) sin pasar por Python.
+
+    Returns:
+        Offset alcanzado. Si el sistema no soporta ninguna de las dos
+        llamadas para estos archivos (p. ej. en Windows) regresa antes
+        y la copia con buffer termina el resto.
+    """
+    use_range = hasattr(os, "copy_file_range")
+    if not use_range and not hasattr(os, "sendfile"):
+        return offset
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    failures = 0
+    while offset < size:
+        count = min(COPY_CHUNK, size - offset)
+        try:
+            if use_range:
+                n = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+            else:
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                n = os.sendfile(dst_fd, src_fd, offset, count)
+        except OSError as e:
+            if e.errno in _NO_KERNEL_COPY:
+                if use_range and hasattr(os, "sendfile"):
+                    use_range = False
+                    continue
+                return offset
+            failures += 1
+            if failures > COPY_RETRIES:
+                raise
+            time.sleep(RETRY_DELAY * failures)
+            continue
+        if n == 0:
+            break
+        failures = 0
+        offset += n
+        if progress_callback:
+            progress_callback(n)
+    return offset
+
+
+def _copy_buffered(src, dst, offset: int, size: int, digest, progress_callback) -> int:
+    """Copia con un buffer grande reutilizado; alimenta el hash con el mismo bloque."""
+    buf = bytearray(COPY_CHUNK)
+    view = memoryview(buf)
+    dst.seek(offset)
+    while offset < size:
+        n = _read_chunk(src, offset, view[:min(COPY_CHUNK, size - offset)])
+        if not n:
+            break
+        chunk = view[:n]
+        written = 0
+        while written < n:
+            written += dst.write(chunk[written:])
+        if digest is not None:
+            digest.update(chunk)
+        offset += n
+        if progress_callback:
+            progress_callback(n)
+    return offset
+
+
+def copy_file(source: str, dest: str, progress_callback=None,
+              verify: bool = True) -> tuple[int, str | None]:
+    """Copia `source` a `dest` por bloques, con reanudacion y reintentos.
+
+    La copia se escribe en `dest` + PARTIAL_SUFFIX y solo se renombra al
+    terminar completa; si se interrumpe, la siguiente llamada continua
+    desde donde se quedo. Con `verify` el SHA-256 se calcula sobre los
+    mismos bloques que se escriben (sin segunda lectura); sin `verify` se
+    usa la copia del kernel cuando el sistema la ofrece.
+
+    Args:
+        progress_callback: Funcion opcional que recibe los bytes avanzados
+            (incluye de golpe lo ya copiado al reanudar).
+
+    Returns:
+        (bytes_copiados, sha256_hex o None si no se verifico)
+
+    Raises:
+        OSError: Si falla la lectura/escritura tras los reintentos o si se
+            copiaron menos bytes de los que tiene el origen. El parcial se
+            conserva para reanudar.
+    """
+    size = os.path.getsize(source)
+    partial = dest + PARTIAL_SUFFIX
+    digest = hashlib.sha256() if verify else None
+
+    with open(source, "rb", buffering=0) as src:
+        offset = _resume_offset(src, partial, size, digest)
+        with open(partial, "r+b" if offset else "wb", buffering=0) as dst:
+            dst.truncate(offset)
+            if offset and progress_callback:
+                progress_callback(offset)
+            if digest is None:
+                offset = _copy_kernel(src, dst, offset, size, progress_callback)
+            offset = _copy_buffered(src, dst, offset, size, digest, progress_callback)
+
+    if offset != size:
+        raise OSError(f"copia incompleta ({offset} de {size} bytes)")
+    shutil.copystat(source, partial)
+    os.replace(partial, dest)
+    return size, digest.hexdigest() if digest else None
+
+
+def _restore_one(item: dict, dest: str, bytes_callback, verify: bool) -> tuple[int, str | None]:
+    source = item.get("ruta_fuente") or item["ruta"]
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    return copy_file(source, dest, bytes_callback, verify)
+
+
+def restore_files(items: list[dict], dest_dir: str, progress_callback=None,
+                  write_manifest: bool = True, bytes_callback=None,
+                  verify: bool = True) -> dict:
+    """Restaura varios resultados a `dest_dir` en paralelo.
+
+    Args:
+        items: Resultados a restaurar (usa `ruta_fuente` si existe).
+        dest_dir: Carpeta destino; se conserva la estructura relativa.
+        progress_callback: Funcion opcional (resultado, destino, error) que
+            se llama al terminar cada archivo, desde el hilo principal.
+        write_manifest: Si se agregan los hashes a MANIFEST_NAME en `dest_dir`.
+        bytes_callback: Funcion opcional que recibe los bytes copiados;
+            se llama desde los hilos de copia.
+        verify: Calcular SHA-256 durante la copia. Sin verificacion se
+            puede usar la copia del kernel (mas rapida).
+
+    Returns:
+        dict con copiados [(destino, sha256)], fallidos [(ruta, error)],
+        bytes y manifiesto (ruta del .sha256 o None).
+    """
+    plan = plan_restore(items, dest_dir)
+    copied, failed = [], []
+    total_bytes = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, RESTORE_WORKERS)) as pool:
+        futures = {pool.submit(_restore_one, item, dest, bytes_callback, verify): (item, dest)
+                   for item, dest in plan}
+        for fut in as_completed(futures):
+            item, dest = futures[fut]
+            try:
+                size, sha = fut.result()
+            except OSError as e:
+                failed.append((item["ruta"], str(e)))
+                if progress_callback:
+                    progress_callback(item, dest, str(e))
+                continue
+            copied.append((dest, sha))
+            total_bytes += size
+            if progress_callback:
+                progress_callback(item, dest, None)
+
+    manifest = None
+    if copied and write_manifest and verify:
+        manifest = os.path.join(dest_dir, MANIFEST_NAME)
+        try:
+            with open(manifest, "a", encoding="utf-8") as f:
+                f.write(f"# Restaurados {datetime.now():%Y-%m-%d %H:%M}\n")
+                for dest, sha in sorted(copied):
+                    rel = os.path.relpath(dest, dest_dir).replace("\\", "/")
+                    f.write(f"{sha} *{rel}\n")
+        except OSError:
+            manifest = None
+
+    return {"copiados": copied, "fallidos": failed, "bytes": total_bytes,
+            "manifiesto": manifest}
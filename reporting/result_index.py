@@ -0,0 +1,150 @@
+"""Indice columnar en memoria para ordenar y filtrar resultados sin re-escanear.
+
+Los resultados se guardan una sola vez en columnas paralelas (nombre,
+extension, origen, tamano, fecha) y la vista trabaja con listas de
+indices. Cada orden se calcula la primera vez que se pide y queda en
+cache (el descendente es el mismo recorrido al reves); los filtros por
+origen, extension y texto son mapas de bits (un int de Python con un bit
+por fila) que se combinan con AND. Reordenar 100k filas ya ordenadas
+antes es solo tomar la lista de la cache.
+"""
+
+import os
+from array import array
+from datetime import datetime
+
+
+# Campos ordenables: nombre que escribe el usuario -> columna
+SORT_FIELDS = {
+    "nombre": "names",
+    "tamano": "sizes",
+    "fecha": "mtimes",
+    "origen": "origins",
+    "ext": "exts",
+}
+
+
+def _parse_fecha(text) -> float:
+    """Timestamp a partir de la columna "fecha" cuando falta "mtime"."""
+    try:
+        return datetime.strptime(str(text)[:16], "%Y-%m-%d %H:%M").timestamp()
+    except ValueError:
+        return -1.0
+
+
+class ResultIndex:
+    """Vista ordenable y filtrable sobre una lista de resultados.
+
+    Los indices que devuelve `view()` son posiciones en la lista
+    original, asi que el "#" mostrado sigue siendo valido para restaurar.
+    """
+
+    def __init__(self, results: list[dict]):
+        self.results = results
+        n = len(results)
+        self.size = n
+        self.all_mask = (1 << n) - 1
+
+        self.names = [str(r.get("nombre", "")).lower() for r in results]
+        self.paths = [str(r.get("ruta", "")).lower() for r in results]
+        self.exts = [os.path.splitext(name)[1] for name in self.names]
+        self.origins = [str(r.get("origen", "")) for r in results]
+        self.sizes = array("q", (
+            r["tamano_bytes"] if isinstance(r.get("tamano_bytes"), int) else -1
+            for r in results
+        ))
+        self.mtimes = array("d", (
+            r["mtime"] if isinstance(r.get("mtime"), (int, float))
+            else _parse_fecha(r.get("fecha", ""))
+            for r in results
+        ))
+
+        self._orders: dict[str, list[int]] = {}
+        self._value_masks: dict[tuple[str, str], int] = {}
+
+    # ─── Ordenes ──────────────────────────────────────────────
+
+    def order(self, field: str) -> list[int]:
+        """Permutacion ascendente por `field` (calculada una vez y cacheada)."""
+        cached = self._orders.get(field)
+        if cached is None:
+            column = getattr(self, SORT_FIELDS[field])
+            # sorted es estable: empates conservan el orden original
+            cached = sorted(range(self.size), key=column.__getitem__)
+            self._orders[field] = cached
+        return cached
+
+    # ─── Mapas de bits ────────────────────────────────────────
+
+    @staticmethod
+    def _mask_from_flags(flags) -> int:
+        """Convierte una secuencia de bool (fila 0 primero) en mapa de bits."""
+        bits = "".join("1" if f else "0" for f in reversed(flags))
+        return int(bits, 2) if bits else 0
+
+    def _value_mask(self, column: str, value: str) -> int:
+        """Mapa de bits de las filas cuya columna es exactamente `value`."""
+        key = (column, value)
+        mask = self._value_masks.get(key)
+        if mask is None:
+            values = getattr(self, column)
+            mask = self._mask_from_flags([v == value for v in values])
+            self._value_masks[key] = mask
+        return mask
+
+    def origin_mask(self, text: str) -> int:
+        """Filas cuyo origen contiene `text` (union de los origenes que coinciden)."""
+        text = text.lower()
+        mask = 0
+        for origin in set(self.origins):
+            if text in origin.lower():
+                mask |= self._value_mask("origins", origin)
+        return mask
+
+    def ext_mask(self, ext: str) -> int:
+        """Filas con la extension dada (".xlsx" o "xlsx")."""
+        ext = ext.lower()
+        if not ext.startswith("."):
+            ext = "." + ext
+        return self._value_mask("exts", ext)
+
+    def text_mask(self, text: str, within: int | None = None) -> int:
+        """Filas cuyo nombre o ruta contienen `text`.
+
+        Si se pasa `within` solo se revisan esas filas (refinar un filtro
+        previo no vuelve a recorrer todo).
+        """
+        text = text.lower()
+        if within is None or within == self.all_mask:
+            return self._mask_from_flags(
+                [text in name or text in path for name, path in zip(self.names, self.paths)]
+            )
+        hits = {i for i in self.rows(within)
+                if text in self.names[i] or text in self.paths[i]}
+        return self._mask_from_flags([i in hits for i in range(self.size)])
+
+    def rows(self, mask: int) -> list[int]:
+        """Indices (ascendentes) con el bit encendido en `mask`."""
+        if mask == self.all_mask:
+            return list(range(self.size))
+        bits = bin(mask)[:1:-1]  # bit 0 primero
+        return [i for i, b in enumerate(bits) if b == "1"]
+
+    # ─── Vista ────────────────────────────────────────────────
+
+    def view(self, mask: int | None = None, sort: str | None = None,
+             descending: bool = False) -> list[int]:
+        """Indices visibles: filtrados por `mask` y ordenados por `sort`."""
+        if mask is None:
+            mask = self.all_mask
+        if sort is None:
+            rows = self.rows(mask)
+            return rows[::-1] if descending else rows
+
+        order = self.order(sort)
+        if descending:
+            order = order[::-1]
+        if mask == self.all_mask:
+            return list(order)
+        flags = bin(mask)[:1:-1].ljust(self.size, "0")
+        return [i for i in order if flags[i] == "1"]
@@ -1,13 +1,68 @@
-"""Busqueda de archivos Office por nombre en todos los discos."""
+"""Busqueda de archivos Office por nombre en todos los discos.
+
+Tambien mantiene un indice en disco (SQLite) con las propiedades de los
+documentos OOXML: autor, ultimo en modificar, titulo... Solo se leen las
+partes docProps/core.xml y docProps/app.xml de cada ZIP, y solo de los
+archivos nuevos o cuyo (tamano, mtime) cambio desde la ultima pasada; la
+consulta posterior no toca el disco.
+"""
 
 import os
+import shlex
+import sqlite3
 import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from xml.etree import ElementTree
 
-from config import OFFICE_EXTENSIONS, RECENT_DAYS, SECONDS_PER_DAY, SKIP_DIRS
+from config import (
+    DOC_INDEX_PATH, DOC_PROPS_WORKERS, OFFICE_EXTENSIONS, RECENT_DAYS,
+    SECONDS_PER_DAY, SKIP_DIRS,
+)
 from utils import format_size as _format_size, get_drives as _get_drives
 
 
+# Formatos con propiedades en docProps/ (los binarios .xls/.doc no se indexan)
+DOC_INDEX_EXTENSIONS = {
+    ".xlsx", ".xlsm", ".docx", ".docm", ".dotx", ".dotm",
+    ".pptx", ".pptm", ".potx", ".ppsx",
+}
+
+# Campo del indice -> (parte, etiqueta sin namespace)
+DOC_PROPS = {
+    "autor": ("docProps/core.xml", "creator"),
+    "modifico": ("docProps/core.xml", "lastModifiedBy"),
+    "titulo": ("docProps/core.xml", "title"),
+    "asunto": ("docProps/core.xml", "subject"),
+    "palabras": ("docProps/core.xml", "keywords"),
+    "empresa": ("docProps/app.xml", "Company"),
+}
+_PROP_BY_TAG = {tag: (part, field) for field, (part, tag) in DOC_PROPS.items()}
+_PROP_PARTS = sorted({part for part, _ in DOC_PROPS.values()})
+
+# docProps pesa unos KB; algo mucho mayor es sospechoso (bomba ZIP)
+_DOC_PROPS_MAX = 1024 * 1024
+
+# Filas por lote al escribir en el indice
+_INDEX_BATCH = 500
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    ruta TEXT PRIMARY KEY,
+    tamano INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ext TEXT NOT NULL,
+    autor TEXT, modifico TEXT, titulo TEXT,
+    asunto TEXT, palabras TEXT, empresa TEXT
+);
+CREATE INDEX IF NOT EXISTS docs_mtime ON docs (mtime);
+CREATE INDEX IF NOT EXISTS docs_ext ON docs (ext);
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+
 def _file_info(filepath: str) -> dict | None:
     try:
         stat = os.stat(filepath)
@@ -23,19 +78,22 @@ def _file_info(filepath: str) -> dict | None:
         return None
 
 
-def search_by_name(name_filter: str, progress_callback=None) -> list[dict]:
+def search_by_name(name_filter: str, progress_callback=None,
+                   drives: list[str] | None = None) -> list[dict]:
     """Busca archivos Office por nombre parcial en todos los discos.
 
     Args:
         name_filter: Texto parcial del nombre del archivo (sin extension).
         progress_callback: Funcion opcional que recibe el directorio actual.
+        drives: Unidades a recorrer. Por defecto, todas las detectadas.
 
     Returns:
         Lista de resultados con nombre, ruta, tamano, fecha.
     """
     name_lower = name_filter.lower()
     results = []
-    drives = _get_drives()
+    if drives is None:
+        drives = _get_drives()
 
     for drive in drives:
         for dirpath, dirnames, filenames in os.walk(drive, topdown=True,
@@ -100,3 +158,250 @@ def search_recent_excel(days: int = RECENT_DAYS, progress_callback=None) -> list
     # Ordenar por fecha de modificacion, mas reciente primero
     results.sort(key=lambda x: x["mtime"], reverse=True)
     return results
+
+
+# ─── Indice de propiedades de documentos ──────────────────────
+
+
+def _read_doc_props(path: str) -> dict[str, str]:
+    """Lee autor, titulo, etc. de un archivo OOXML sin abrir el resto del ZIP."""
+    props = {}
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for part in _PROP_PARTS:
+                try:
+                    info = zf.getinfo(part)
+                except KeyError:
+                    continue
+                if info.file_size > _DOC_PROPS_MAX:
+                    continue
+                root = ElementTree.fromstring(zf.read(info))
+                for elem in root:
+                    tag = elem.tag.rsplit("}", 1)[-1]
+                    hit = _PROP_BY_TAG.get(tag)
+                    if hit and hit[0] == part and elem.text and elem.text.strip():
+                        props[hit[1]] = elem.text.strip()
+    except (OSError, EOFError, RuntimeError, NotImplementedError,
+            zipfile.BadZipFile, zlib.error, ElementTree.ParseError):
+        # Cifrado (es OLE2, no ZIP), danado o bloqueado: queda sin propiedades
+        pass
+    return props
+
+
+def _scan_indexable(root: str, progress_callback=None):
+    """Genera (ruta, tamano, mtime) de los documentos OOXML bajo `root`.
+
+    Usa scandir directamente: en Windows el tamano y la fecha vienen en el
+    listado del directorio y no cuesta un stat por archivo.
+    """
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        if progress_callback:
+            progress_callback(folder)
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in DOC_INDEX_EXTENSIONS:
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            yield entry.path, st.st_size, st.st_mtime
+
+
+def _open_doc_index(index_path: str) -> sqlite3.Connection:
+    folder = os.path.dirname(index_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(index_path)
+    conn.executescript(_INDEX_SCHEMA)
+    return conn
+
+
+def doc_index_info(index_path: str = DOC_INDEX_PATH) -> tuple[int, float | None]:
+    """(documentos en el indice, timestamp de la ultima actualizacion o None)."""
+    if not os.path.isfile(index_path):
+        return 0, None
+    try:
+        conn = _open_doc_index(index_path)
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            row = conn.execute(
+                "SELECT valor FROM meta WHERE clave = 'actualizado'"
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0, None
+    return count, float(row[0]) if row else None
+
+
+def update_doc_index(progress_callback=None, drives: list[str] | None = None,
+                     index_path: str = DOC_INDEX_PATH) -> dict:
+    """Recorre los discos y actualiza el indice de propiedades.
+
+    Solo se leen los archivos nuevos o con (tamano, mtime) distinto al
+    guardado; la lectura se reparte en hilos mientras sigue el recorrido.
+    Las entradas de archivos que ya no estan se eliminan.
+
+    Args:
+        progress_callback: Funcion opcional que recibe el directorio actual.
+        drives: Unidades a recorrer. Por defecto, todas las detectadas.
+        index_path: Archivo SQLite del indice.
+
+    Returns:
+        {"archivos": vistos, "leidos": extraidos de nuevo, "eliminados": n}
+
+    Raises:
+        sqlite3.Error, OSError: Si no se puede abrir o escribir el indice.
+    """
+    if drives is None:
+        drives = _get_drives()
+    conn = _open_doc_index(index_path)
+    try:
+        known = {ruta: (tamano, mtime) for ruta, tamano, mtime
+                 in conn.execute("SELECT ruta, tamano, mtime FROM docs")}
+        seen = set()
+        pending = []
+
+        with ThreadPoolExecutor(max_workers=DOC_PROPS_WORKERS) as pool:
+            for drive in drives:
+                for path, size, mtime in _scan_indexable(drive, progress_callback):
+                    seen.add(path)
+                    if known.get(path) != (size, mtime):
+                        pending.append((path, size, mtime, pool.submit(_read_doc_props, path)))
+
+            batch = []
+            for path, size, mtime, future in pending:
+                props = future.result()
+                batch.append((path, size, mtime, os.path.splitext(path)[1].lower(),
+                              *(props.get(field) for field in DOC_PROPS)))
+                if len(batch) >= _INDEX_BATCH:
+                    _store_docs(conn, batch)
+                    batch = []
+            _store_docs(conn, batch)
+
+        # Solo se olvida lo que estaba en las unidades recorridas
+        roots = tuple(drives)
+        gone = [(path,) for path in known
+                if path not in seen and path.startswith(roots)]
+        conn.executemany("DELETE FROM docs WHERE ruta = ?", gone)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (clave, valor) VALUES ('actualizado', ?)",
+            (str(time.time()),),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {"archivos": len(seen), "leidos": len(pending), "eliminados": len(gone)}
+
+
+def _store_docs(conn: sqlite3.Connection, rows: list[tuple]) -> None:
+    if not rows:
+        return
+    columns = ", ".join(["ruta", "tamano", "mtime", "ext", *DOC_PROPS])
+    marks = ", ".join("?" * (4 + len(DOC_PROPS)))
+    conn.executemany(f"INSERT OR REPLACE INTO docs ({columns}) VALUES ({marks})", rows)
+
+
+def parse_property_query(text: str) -> dict:
+    """Convierte 'autor=Juan dias=60 ext=xlsx' en argumentos de `search_by_properties`.
+
+    Los valores con espacios van entre comillas: autor="Juan Perez".
+
+    Raises:
+        ValueError: Si un filtro no existe o "dias" no es un numero.
+    """
+    filters = {}
+    for token in shlex.split(text, posix=True):
+        key, sep, value = token.partition("=")
+        key = key.strip().lower()
+        if not sep or not value:
+            raise ValueError(f"Filtro incompleto: {token} (usa campo=valor)")
+        if key == "dias":
+            if not value.isdigit():
+                raise ValueError(f"dias debe ser un numero: {value}")
+            filters["days"] = int(value)
+        elif key == "ext":
+            filters["ext"] = value
+        elif key in DOC_PROPS:
+            filters[key] = value
+        else:
+            valid = ", ".join([*DOC_PROPS, "ext", "dias"])
+            raise ValueError(f"Filtro desconocido: {key} (validos: {valid})")
+    return filters
+
+
+def search_by_properties(days: int | None = None, ext: str = "",
+                         index_path: str = DOC_INDEX_PATH, **props) -> list[dict]:
+    """Consulta el indice de propiedades (no recorre el disco).
+
+    Args:
+        days: Solo archivos modificados en los ultimos N dias.
+        ext: Extension (".xlsx" o "xlsx").
+        index_path: Archivo SQLite del indice.
+        **props: Texto parcial por campo de DOC_PROPS (autor="juan", ...),
+            sin distinguir mayusculas.
+
+    Returns:
+        Lista de resultados, el mas reciente primero. Incluye autor,
+        modifico y titulo.
+    """
+    if not os.path.isfile(index_path):
+        return []
+
+    clauses, params = [], []
+    for field, value in props.items():
+        if field not in DOC_PROPS:
+            raise ValueError(f"Campo desconocido: {field}")
+        if value:
+            clauses.append(f"instr(plegar({field}), ?) > 0")
+            params.append(value.casefold())
+    if days is not None:
+        clauses.append("mtime >= ?")
+        params.append(time.time() - days * SECONDS_PER_DAY)
+    if ext:
+        ext = ext.lower()
+        clauses.append("ext = ?")
+        params.append(ext if ext.startswith(".") else "." + ext)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = _open_doc_index(index_path)
+    try:
+        # casefold de Python: "JOSÉ" encuentra "josé" (lower() de SQLite solo hace ASCII)
+        conn.create_function("plegar", 1, lambda v: v.casefold() if v else "",
+                             deterministic=True)
+        rows = conn.execute(
+            f"SELECT ruta, tamano, mtime, autor, modifico, titulo FROM docs "
+            f"{where} ORDER BY mtime DESC",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    results = []
+    for ruta, tamano, mtime, autor, modifico, titulo in rows:
+        drive = os.path.splitdrive(ruta)[0] or os.sep
+        results.append({
+            "nombre": os.path.basename(ruta),
+            "ruta": ruta,
+            "tamano": _format_size(tamano),
+            "fecha": datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M"),
+            "tamano_bytes": tamano,
+            "mtime": mtime,
+            "origen": f"Indice ({drive})",
+            "autor": autor or "",
+            "modifico": modifico or "",
+            "titulo": titulo or "",
+        })
+    return results
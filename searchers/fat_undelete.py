@@ -0,0 +1,455 @@
+"""Busqueda y recuperacion de archivos Office borrados en USBs FAT12/16/32 y exFAT.
+
+Lee el volumen (o una imagen cruda) directamente: parsea el sector de
+arranque, la FAT y los directorios para listar entradas borradas
+(0xE5 en FAT, bit "in use" apagado en exFAT). La recuperacion asume
+clusters contiguos, que es el caso comun en USBs.
+"""
+
+import os
+import struct
+from datetime import datetime
+
+from config import OFFICE_EXTENSIONS
+from utils import format_size as _format_size, read_aligned as _read_aligned
+
+
+# Limite de bytes por directorio (protege contra cadenas corruptas)
+_MAX_DIR_BYTES = 32 * 1024 * 1024
+
+# Bloque de copia en la recuperacion
+_COPY_CHUNK = 8 * 1024 * 1024
+
+# Tipos de entrada exFAT (bit 0x80 = en uso)
+_EXFAT_FILE = 0x05
+_EXFAT_STREAM = 0x40
+_EXFAT_NAME = 0x41
+_EXFAT_BITMAP = 0x81
+
+
+def _dos_timestamp(date: int, time_: int) -> float | None:
+    """Convierte fecha/hora DOS (FAT y exFAT) a timestamp."""
+    try:
+        return datetime(
+            1980 + (date >> 9), (date >> 5) & 0x0F, date & 0x1F,
+            time_ >> 11, (time_ >> 5) & 0x3F, (time_ & 0x1F) * 2,
+        ).timestamp()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _parse_boot(boot: bytes, base: int) -> dict | None:
+    """Interpreta el sector de arranque de un volumen FAT o exFAT."""
+    if len(boot) < 512 or boot[510:512] != b"\x55\xaa":
+        return None
+
+    if boot[3:11] == b"EXFAT   ":
+        fat_offset, fat_length, heap_offset, cluster_count, root_cluster = (
+            struct.unpack_from("<IIIII", boot, 80)
+        )
+        bps = 1 << boot[108]
+        spc = 1 << boot[109]
+        return {
+            "tipo": "exFAT",
+            "base": base,
+            "cluster_size": bps * spc,
+            "fat_offset": base + fat_offset * bps,
+            "fat_bytes": (cluster_count + 2) * 4,
+            "data_offset": base + heap_offset * bps,
+            "cluster_count": cluster_count,
+            "root_cluster": root_cluster,
+        }
+
+    bps, spc, reserved, num_fats, root_entries, total16, _, fat16 = (
+        struct.unpack_from("<HBHBHHBH", boot, 11)
+    )
+    if bps not in (512, 1024, 2048, 4096) or spc == 0 or spc & (spc - 1) or num_fats == 0:
+        return None
+    total32, fat32 = struct.unpack_from("<II", boot, 32)
+    fat_size = fat16 or fat32
+    total = total16 or total32
+    root_dir_bytes = root_entries * 32
+    root_dir_sectors = (root_dir_bytes + bps - 1) // bps
+    first_data_sector = reserved + num_fats * fat_size + root_dir_sectors
+    if fat_size == 0 or total <= first_data_sector:
+        return None
+    cluster_count = (total - first_data_sector) // spc
+
+    if cluster_count < 4085:
+        kind = "FAT12"
+    elif cluster_count < 65525:
+        kind = "FAT16"
+    else:
+        kind = "FAT32"
+
+    layout = {
+        "tipo": kind,
+        "base": base,
+        "cluster_size": bps * spc,
+        "fat_offset": base + reserved * bps,
+        "fat_bytes": fat_size * bps,
+        "data_offset": base + first_data_sector * bps,
+        "cluster_count": cluster_count,
+    }
+    if kind == "FAT32":
+        layout["root_cluster"], = struct.unpack_from("<I", boot, 44)
+    else:
+        layout["root_offset"] = base + (reserved + num_fats * fat_size) * bps
+        layout["root_bytes"] = root_dir_bytes
+    return layout
+
+
+def _read_layout(f) -> dict | None:
+    """Detecta el volumen; si es una imagen de disco completo usa la 1a particion (MBR)."""
+    boot = _read_aligned(f, 0, 512)
+    layout = _parse_boot(boot, 0)
+    if layout or len(boot) < 512 or boot[510:512] != b"\x55\xaa":
+        return layout
+    lba, = struct.unpack_from("<I", boot, 0x1C6)
+    if lba == 0:
+        return None
+    return _parse_boot(_read_aligned(f, lba * 512, 512), lba * 512)
+
+
+def _next_cluster(fat: bytes, kind: str, cluster: int) -> int | None:
+    """Siguiente cluster de la cadena, o None al final / si es invalido."""
+    try:
+        if kind == "FAT12":
+            val, = struct.unpack_from("<H", fat, cluster + cluster // 2)
+            val = val >> 4 if cluster & 1 else val & 0x0FFF
+            return val if 2 <= val < 0xFF7 else None
+        if kind == "FAT16":
+            val, = struct.unpack_from("<H", fat, cluster * 2)
+            return val if 2 <= val < 0xFFF7 else None
+        val, = struct.unpack_from("<I", fat, cluster * 4)
+        if kind == "FAT32":
+            val &= 0x0FFFFFFF
+            return val if 2 <= val < 0x0FFFFFF7 else None
+        return val if 2 <= val < 0xFFFFFFF7 else None
+    except struct.error:
+        return None
+
+
+def _cluster_offset(layout: dict, cluster: int) -> int:
+    return layout["data_offset"] + (cluster - 2) * layout["cluster_size"]
+
+
+def _read_chain(f, layout: dict, fat: bytes, first: int) -> bytes:
+    """Lee un directorio siguiendo su cadena de clusters en la FAT."""
+    chunks = []
+    seen = set()
+    cluster = first
+    total = 0
+    while cluster is not None and cluster not in seen and total < _MAX_DIR_BYTES:
+        if cluster > layout["cluster_count"] + 1:
+            break
+        seen.add(cluster)
+        chunks.append(_read_aligned(f, _cluster_offset(layout, cluster), layout["cluster_size"]))
+        total += layout["cluster_size"]
+        cluster = _next_cluster(fat, layout["tipo"], cluster)
+    return b"".join(chunks)
+
+
+def _read_contiguous(f, layout: dict, first: int, size: int) -> bytes:
+    """Lee `size` bytes contiguos desde el cluster `first`."""
+    if first < 2 or first > layout["cluster_count"] + 1:
+        return b""
+    return _read_aligned(f, _cluster_offset(layout, first), min(size, _MAX_DIR_BYTES))
+
+
+def _lfn_checksum(short_name: bytes) -> int:
+    total = 0
+    for b in short_name:
+        total = (((total & 1) << 7) + (total >> 1) + b) & 0xFF
+    return total
+
+
+def _parse_fat_dir(data: bytes) -> list[dict]:
+    """Parsea entradas de directorio FAT, incluyendo nombres largos (LFN)."""
+    entries = []
+    lfn_parts = []
+    lfn_checksum = None
+    for off in range(0, len(data) - 31, 32):
+        e = data[off:off + 32]
+        first = e[0]
+        if first == 0x00:
+            break
+        attr = e[11]
+        if attr == 0x0F:
+            lfn_parts.append(e[1:11] + e[14:26] + e[28:32])
+            lfn_checksum = e[13]
+            continue
+        parts, lfn_parts = lfn_parts, []
+        if attr & 0x08 or e[:2] in (b". ", b".."):
+            continue
+
+        deleted = first == 0xE5
+        short = bytearray(e[:11])
+        if first == 0x05:
+            short[0] = 0xE5  # 0x05 escapa un 0xE5 real (Kanji)
+        long_name = None
+        if parts:
+            # Las entradas LFN se guardan en orden inverso; al borrar se pierde
+            # el primer byte del nombre corto, asi que se busca el que cuadre
+            candidates = [bytes(short)]
+            if deleted:
+                candidates = [bytes([c]) + bytes(short[1:]) for c in range(0x20, 0x100)]
+            for cand in candidates:
+                if _lfn_checksum(cand) == lfn_checksum:
+                    short = bytearray(cand)
+                    raw = b"".join(reversed(parts)).decode("utf-16-le", "replace")
+                    long_name = raw.split("\x00", 1)[0]
+                    break
+
+        if long_name:
+            name = long_name
+        else:
+            base = short[:8].decode("latin-1").rstrip()
+            ext = short[8:11].decode("latin-1").rstrip()
+            if deleted:
+                base = "_" + base[1:]
+            name = f"{base}.{ext}" if ext else base
+
+        high, = struct.unpack_from("<H", e, 20)
+        time_, date, low, size = struct.unpack_from("<HHHI", e, 22)
+        entries.append({
+            "nombre": name,
+            "borrado": deleted,
+            "es_dir": bool(attr & 0x10),
+            "cluster": (high << 16) | low,
+            "tamano": size,
+            "contiguo": False,
+            "mtime": _dos_timestamp(date, time_),
+        })
+    return entries
+
+
+def _parse_exfat_dir(data: bytes) -> tuple[list[dict], dict | None]:
+    """Parsea un directorio exFAT.
+
+    Returns:
+        (entradas, bitmap) donde bitmap es la entrada del allocation bitmap
+        (solo existe en el directorio raiz).
+    """
+    entries = []
+    bitmap = None
+    count = len(data) // 32
+    i = 0
+    while i < count:
+        e = data[i * 32:i * 32 + 32]
+        etype = e[0]
+        if etype == 0x00:
+            break
+        if etype == _EXFAT_BITMAP:
+            bitmap = {"cluster": struct.unpack_from("<I", e, 20)[0],
+                      "tamano": struct.unpack_from("<Q", e, 24)[0]}
+        if etype & 0x7F != _EXFAT_FILE:
+            i += 1
+            continue
+
+        deleted = not etype & 0x80
+        secondary = e[1]
+        attrs, = struct.unpack_from("<H", e, 4)
+        modified, = struct.unpack_from("<I", e, 12)
+        stream = None
+        name_parts = []
+        for j in range(1, secondary + 1):
+            if i + j >= count:
+                break
+            s = data[(i + j) * 32:(i + j) * 32 + 32]
+            # Todas las secundarias deben tener el mismo estado que la primaria
+            if bool(s[0] & 0x80) == deleted:
+                break
+            stype = s[0] & 0x7F
+            if stype == _EXFAT_STREAM:
+                stream = s
+            elif stype == _EXFAT_NAME:
+                name_parts.append(s[2:32])
+        i += 1 + secondary
+
+        if stream is None:
+            continue
+        name_len = stream[3]
+        name = b"".join(name_parts).decode("utf-16-le", "replace")[:name_len]
+        if not name:
+            continue
+        entries.append({
+            "nombre": name,
+            "borrado": deleted,
+            "es_dir": bool(attrs & 0x10),
+            "cluster": struct.unpack_from("<I", stream, 20)[0],
+            "tamano": struct.unpack_from("<Q", stream, 24)[0],
+            "contiguo": bool(stream[1] & 0x02),
+            "mtime": _dos_timestamp(modified >> 16, modified & 0xFFFF),
+        })
+    return entries, bitmap
+
+
+def _cluster_in_use(layout: dict, fat: bytes, bitmap: bytes | None, cluster: int) -> bool:
+    """Indica si el primer cluster de un archivo borrado ya fue reasignado."""
+    if layout["tipo"] == "exFAT":
+        if bitmap is None:
+            return False
+        idx = cluster - 2
+        return idx // 8 < len(bitmap) and bool(bitmap[idx // 8] >> (idx % 8) & 1)
+    try:
+        if layout["tipo"] == "FAT12":
+            val, = struct.unpack_from("<H", fat, cluster + cluster // 2)
+            val = val >> 4 if cluster & 1 else val & 0x0FFF
+        elif layout["tipo"] == "FAT16":
+            val, = struct.unpack_from("<H", fat, cluster * 2)
+        else:
+            val = struct.unpack_from("<I", fat, cluster * 4)[0] & 0x0FFFFFFF
+    except struct.error:
+        return False
+    return val != 0
+
+
+def _walk_volume(f, layout: dict) -> list[dict]:
+    """Recorre todos los directorios (vivos y borrados) y devuelve sus entradas con ruta."""
+    fat = _read_aligned(f, layout["fat_offset"], layout["fat_bytes"])
+    exfat = layout["tipo"] == "exFAT"
+    bitmap = None
+
+    if "root_offset" in layout:
+        root = _read_aligned(f, layout["root_offset"], layout["root_bytes"])
+    else:
+        root = _read_chain(f, layout, fat, layout["root_cluster"])
+
+    found = []
+    pending = [("", root)]
+    visited = set()
+    while pending:
+        rel_dir, data = pending.pop()
+        if exfat:
+            entries, bmp = _parse_exfat_dir(data)
+            if bmp and bitmap is None:
+                bitmap = _read_contiguous(f, layout, bmp["cluster"], bmp["tamano"])
+        else:
+            entries = _parse_fat_dir(data)
+
+        for entry in entries:
+            entry["ruta_rel"] = f"{rel_dir}\\{entry['nombre']}" if rel_dir else entry["nombre"]
+            cluster = entry["cluster"]
+            if entry["es_dir"]:
+                if cluster < 2 or cluster in visited:
+                    continue
+                visited.add(cluster)
+                if entry["borrado"] or entry["contiguo"]:
+                    size = entry["tamano"] or layout["cluster_size"]
+                    sub = _read_contiguous(f, layout, cluster, size)
+                else:
+                    sub = _read_chain(f, layout, fat, cluster)
+                pending.append((entry["ruta_rel"], sub))
+            else:
+                found.append(entry)
+
+    for entry in found:
+        if entry["borrado"] and entry["cluster"] >= 2:
+            entry["sobrescrito"] = _cluster_in_use(layout, fat, bitmap, entry["cluster"])
+            entry["offset"] = _cluster_offset(layout, entry["cluster"])
+    return found
+
+
+def _display_root(source: str) -> str:
+    """'\\\\.\\E:' -> 'E:'; para imagenes usa el nombre del archivo."""
+    if source.startswith("\\\\.\\"):
+        return source[4:]
+    return os.path.basename(source)
+
+
+def search_deleted_usb(source: str, name_filter: str = "") -> list[dict]:
+    """Lista archivos Office borrados en un volumen o imagen FAT/exFAT.
+
+    Args:
+        source: Volumen crudo (\\\\.\\E:) o imagen (.img/.dd).
+        name_filter: Texto parcial opcional para filtrar por nombre.
+
+    Returns:
+        Lista de resultados. Ademas de las llaves comunes incluye
+        `volumen`, `offset` y `tamano_bytes` para `recover_deleted`.
+
+    Raises:
+        OSError: Si el volumen no se puede abrir.
+    """
+    name_lower = name_filter.lower()
+    results = []
+    with open(source, "rb", buffering=0) as f:
+        layout = _read_layout(f)
+        if not layout:
+            return results
+        entries = _walk_volume(f, layout)
+
+    root = _display_root(source)
+    for entry in entries:
+        if not entry["borrado"] or "offset" not in entry:
+            continue
+        name = entry["nombre"]
+        if os.path.splitext(name)[1].lower() not in OFFICE_EXTENSIONS:
+            continue
+        if name_lower and name_lower not in name.lower():
+            continue
+        estado = "posiblemente sobrescrito" if entry["sobrescrito"] else "recuperable"
+        results.append({
+            "nombre": name,
+            "ruta": f"{root}\\{entry['ruta_rel']}",
+            "tamano": _format_size(entry["tamano"]),
+            "fecha": (datetime.fromtimestamp(entry["mtime"]).strftime("%Y-%m-%d %H:%M")
+                      if entry["mtime"] else "?"),
+            "origen": f"USB borrado ({layout['tipo']}, {estado})",
+            "tamano_bytes": entry["tamano"],
+            "mtime": entry["mtime"],
+            "volumen": source,
+            "offset": entry["offset"],
+        })
+    return results
+
+
+def recover_deleted(items: list[dict], dest_dir: str, progress_callback=None) -> list[str]:
+    """Recupera archivos listados por `search_deleted_usb` en una sola pasada.
+
+    Los archivos se leen en orden de offset, de modo que el volumen se
+    recorre de forma secuencial aunque se recuperen cientos de archivos.
+
+    Args:
+        items: Resultados de `search_deleted_usb`.
+        dest_dir: Carpeta destino (no debe estar en el mismo volumen).
+        progress_callback: Funcion opcional que recibe los bytes copiados.
+
+    Returns:
+        Rutas de los archivos escritos.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    written = []
+    used_names = set()
+    by_volume = {}
+    for item in items:
+        by_volume.setdefault(item["volumen"], []).append(item)
+
+    for volume, vol_items in by_volume.items():
+        vol_items.sort(key=lambda x: x["offset"])
+        with open(volume, "rb", buffering=0) as f:
+            for item in vol_items:
+                base, ext = os.path.splitext(item["nombre"])
+                name = item["nombre"]
+                counter = 1
+                while name.lower() in used_names or os.path.exists(os.path.join(dest_dir, name)):
+                    name = f"{base}_recuperado{counter}{ext}"
+                    counter += 1
+                used_names.add(name.lower())
+                dest = os.path.join(dest_dir, name)
+
+                pos = item["offset"]
+                end = pos + item["tamano_bytes"]
+                try:
+                    with open(dest, "wb") as out:
+                        while pos < end:
+                            n = min(_COPY_CHUNK, end - pos)
+                            out.write(_read_aligned(f, pos, n))
+                            pos += n
+                            if progress_callback:
+                                progress_callback(n)
+                except OSError:
+                    continue
+                written.append(dest)
+    return written
@@ -0,0 +1,150 @@
+"""Ejecucion concurrente de varias fuentes de rescate con progreso en vivo.
+
+Cada fuente (papelera, temporales, recientes, cada disco, shadow copies)
+corre en su propio hilo; casi todo el tiempo lo pasan esperando disco o
+un subproceso, asi que el total se acerca al de la fuente mas lenta en
+lugar de la suma de todas. El hilo principal es el unico que toca la
+consola: refresca un panel Rich Live con el estado de cada fuente y va
+combinando los resultados conforme llegan.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from rich import box
+from rich.live import Live
+from rich.table import Table
+
+from utils import console, deduplicate
+
+
+# Intervalo de refresco del panel (segundos)
+_REFRESH_INTERVAL = 0.1
+
+
+class SearchCancelled(Exception):
+    """Se lanza dentro de una fuente cuando el usuario cancela con Ctrl+C."""
+
+
+class _SourceState:
+    """Estado de una fuente. Lo escribe su hilo y lo lee el hilo principal."""
+
+    __slots__ = ("label", "status", "detail", "found", "started", "finished")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.status = "En espera"
+        self.detail = ""
+        self.found = 0
+        self.started = None
+        self.finished = None
+
+
+def _short(path: str, width: int = 50) -> str:
+    return path if len(path) <= width else "..." + path[-(width - 3):]
+
+
+def _render(states: list[_SourceState], merged: int, title: str) -> Table:
+    table = Table(title=title, box=box.ROUNDED, show_lines=False)
+    table.add_column("Fuente", style="cyan", no_wrap=True)
+    table.add_column("Estado", no_wrap=True)
+    table.add_column("Encontrados", justify="right")
+    table.add_column("Tiempo", justify="right", style="dim")
+    table.add_column("Detalle", style="dim", overflow="ellipsis", no_wrap=True)
+
+    now = time.monotonic()
+    for st in states:
+        if st.started is None:
+            elapsed = ""
+        else:
+            elapsed = f"{(st.finished or now) - st.started:.1f}s"
+        color = {
+            "En espera": "dim",
+            "Buscando": "yellow",
+            "Listo": "green",
+            "Error": "red",
+            "Cancelado": "red",
+        }.get(st.status, "white")
+        table.add_row(
+            st.label,
+            f"[{color}]{st.status}[/{color}]",
+            str(st.found) if st.started is not None else "",
+            elapsed,
+            st.detail,
+        )
+    table.caption = f"{merged} archivo(s) unicos hasta ahora"
+    return table
+
+
+def run_sources(sources: list[tuple[str, object]], title: str = "Buscando") -> list[dict]:
+    """Ejecuta varias fuentes de busqueda en paralelo y combina sus resultados.
+
+    Args:
+        sources: Lista de (etiqueta, funcion). Cada funcion recibe un
+            callback de progreso (texto del elemento actual) y devuelve
+            una lista de resultados.
+        title: Titulo del panel de progreso.
+
+    Returns:
+        Resultados sin duplicados por ruta, en el orden de las fuentes
+        (si dos fuentes reportan la misma ruta, gana la que va primero).
+    """
+    states = [_SourceState(label) for label, _ in sources]
+    cancel = threading.Event()
+    per_source: list[list[dict] | None] = [None] * len(sources)
+    seen: set[str] = set()  # rutas combinadas hasta ahora (solo para el conteo)
+
+    def make_worker(idx, func):
+        st = states[idx]
+
+        def progress(text):
+            if cancel.is_set():
+                raise SearchCancelled()
+            st.detail = _short(str(text))
+
+        def worker():
+            st.status = "Buscando"
+            st.started = time.monotonic()
+            try:
+                results = func(progress)
+            except SearchCancelled:
+                st.status = "Cancelado"
+                results = []
+            except Exception as e:  # una fuente rota no debe tumbar las demas
+                st.status = "Error"
+                st.detail = str(e)
+                results = []
+            else:
+                st.status = "Listo"
+                st.detail = ""
+            st.found = len(results)
+            st.finished = time.monotonic()
+            return results
+
+        return worker
+
+    pool = ThreadPoolExecutor(max_workers=max(1, len(sources)),
+                              thread_name_prefix="rescate")
+    futures = {pool.submit(make_worker(i, func)): i
+               for i, (_, func) in enumerate(sources)}
+    pending = set(futures)
+    try:
+        with Live(_render(states, 0, title), console=console,
+                  refresh_per_second=10, transient=False) as live:
+            while pending:
+                done, pending = wait(pending, timeout=_REFRESH_INTERVAL,
+                                     return_when=FIRST_COMPLETED)
+                for fut in done:
+                    idx = futures[fut]
+                    results = fut.result()
+                    per_source[idx] = results
+                    seen.update(r.get("ruta", "") for r in results)
+                live.update(_render(states, len(seen), title))
+    except KeyboardInterrupt:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown(wait=True)
+
+    return deduplicate([r for results in per_source for r in results or []])
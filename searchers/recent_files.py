@@ -1,15 +1,106 @@
-"""Busqueda de archivos Office en el historial reciente de Windows (.lnk)."""
+"""Busqueda de archivos Office en el historial reciente de Windows (.lnk y jump lists)."""
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from config import OFFICE_EXTENSIONS, RECENT_PATH
-from utils import format_size as _format_size, read_lnk_target as _read_lnk_target
+from config import OFFICE_EXTENSIONS, RECENT_PATH, RECENT_JUMPLIST_PATH
+from utils import (
+    format_size as _format_size,
+    parse_lnk_target as _parse_lnk_target,
+    read_cfb_streams as _read_cfb_streams,
+    read_lnk_target as _read_lnk_target,
+)
+
+
+# Hilos para parsear .lnk / jump lists no cacheados
+_PARSE_WORKERS = 8
+
+# Cache de destinos ya parseados: (ruta, mtime) -> lista de rutas destino.
+# Una consulta repetida solo cuesta el listado de las carpetas.
+_TARGET_CACHE: dict[tuple[str, float], list[str]] = {}
+
+
+def _parse_jumplist(path: str) -> list[str]:
+    """Extrae los destinos de una lista de saltos (*.automaticDestinations-ms).
+
+    Es un archivo OLE2: cada stream numerado es un shell link embebido y
+    el stream DestList guarda el orden MRU.
+    """
+    try:
+        with open(path, "rb") as f:
+            streams = _read_cfb_streams(f.read())
+    except (OSError, ValueError):
+        return []
+    targets = []
+    for name, data in streams.items():
+        if name == "DestList":
+            continue
+        target = _parse_lnk_target(data)
+        if target:
+            targets.append(target)
+    return targets
+
+
+def _parse_source(path: str, is_jumplist: bool) -> list[str]:
+    if is_jumplist:
+        return _parse_jumplist(path)
+    target = _read_lnk_target(path)
+    return [target] if target else []
+
+
+def _list_sources() -> list[tuple[str, float, bool]]:
+    """Lista (ruta, mtime, es_jumplist) de .lnk y jump lists sin leer su contenido."""
+    sources = []
+    for folder, suffix, is_jumplist in (
+        (RECENT_PATH, ".lnk", False),
+        (RECENT_JUMPLIST_PATH, ".automaticdestinations-ms", True),
+    ):
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if not entry.name.lower().endswith(suffix):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    sources.append((entry.path, mtime, is_jumplist))
+        except OSError:
+            continue
+    return sources
+
+
+def _collect_targets() -> list[tuple[str, bool]]:
+    """Devuelve (ruta_destino, viene_de_jumplist), usando la cache cuando se puede."""
+    sources = _list_sources()
+    pending = [s for s in sources if (s[0], s[1]) not in _TARGET_CACHE]
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=_PARSE_WORKERS) as pool:
+            parsed = pool.map(lambda s: _parse_source(s[0], s[2]), pending)
+            for (path, mtime, _), targets in zip(pending, parsed):
+                _TARGET_CACHE[(path, mtime)] = targets
+
+    # Olvidar entradas de archivos que ya no existen o cambiaron
+    current = {(path, mtime) for path, mtime, _ in sources}
+    for key in list(_TARGET_CACHE):
+        if key not in current:
+            del _TARGET_CACHE[key]
+
+    collected = []
+    for path, mtime, is_jumplist in sources:
+        for target in _TARGET_CACHE[(path, mtime)]:
+            collected.append((target, is_jumplist))
+    return collected
 
 
 def search_recent_files(name_filter: str = "") -> list[dict]:
     """Busca archivos Office en el historial reciente de Windows.
 
+    Revisa los accesos directos de la carpeta Recent y las listas de
+    saltos de cada aplicacion (AutomaticDestinations).
+
     Args:
         name_filter: Texto parcial opcional para filtrar por nombre.
 
@@ -18,55 +109,46 @@ def search_recent_files(name_filter: str = "") -> list[dict]:
     """
     results = []
     name_lower = name_filter.lower()
-
-    if not os.path.isdir(RECENT_PATH):
-        return results
-
-    try:
-        for fname in os.listdir(RECENT_PATH):
-            if not fname.lower().endswith(".lnk"):
-                continue
-
-            lnk_path = os.path.join(RECENT_PATH, fname)
-            target = _read_lnk_target(lnk_path)
-            if not target:
-                continue
-
-            ext = os.path.splitext(target)[1].lower()
-            if ext not in OFFICE_EXTENSIONS:
-                continue
-
-            target_name = os.path.basename(target)
-            if name_lower and name_lower not in target_name.lower():
-                continue
-
-            exists = os.path.isfile(target)
-
-            if exists:
-                try:
-                    stat = os.stat(target)
-                    size = _format_size(stat.st_size)
-                    fecha = datetime.fromtimestamp(stat.st_mtime).strftime(
-                        "%Y-%m-%d %H:%M"
-                    )
-                except OSError:
-                    size = "?"
-                    fecha = "?"
-            else:
-                size = "N/A"
-                fecha = "N/A"
-
-            estado = "Existe" if exists else "NO encontrado"
-
-            results.append({
-                "nombre": target_name,
-                "ruta": target,
-                "tamano": size,
-                "fecha": fecha,
-                "origen": f"Recientes ({estado})",
-                "existe": exists,
-            })
-    except OSError:
-        pass
+    seen = set()
+
+    for target, is_jumplist in _collect_targets():
+        key = target.lower()
+        if key in seen:
+            continue
+
+        ext = os.path.splitext(target)[1].lower()
+        if ext not in OFFICE_EXTENSIONS:
+            continue
+
+        target_name = os.path.basename(target)
+        if name_lower and name_lower not in target_name.lower():
+            continue
+        seen.add(key)
+
+        try:
+            stat = os.stat(target)
+            exists = True
+            size_bytes, mtime = stat.st_size, stat.st_mtime
+            size = _format_size(size_bytes)
+            fecha = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M")
+        except OSError:
+            exists = False
+            size_bytes, mtime = None, None
+            size = "N/A"
+            fecha = "N/A"
+
+        estado = "Existe" if exists else "NO encontrado"
+        fuente = "Lista de saltos" if is_jumplist else "Recientes"
+
+        results.append({
+            "nombre": target_name,
+            "ruta": target,
+            "tamano": size,
+            "fecha": fecha,
+            "origen": f"{fuente} ({estado})",
+            "existe": exists,
+            "tamano_bytes": size_bytes,
+            "mtime": mtime,
+        })
 
     return results
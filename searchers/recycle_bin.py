@@ -1,81 +1,145 @@
-"""Busqueda de archivos Office en la papelera de reciclaje via PowerShell."""
+"""Busqueda de archivos Office en la papelera de reciclaje leyendo $Recycle.Bin."""
+
+import os
+import struct
+from datetime import datetime
 
-import json
-import subprocess
 from config import OFFICE_EXTENSIONS
+from utils import (
+    filetime_to_timestamp as _filetime_to_timestamp,
+    format_size as _format_size,
+    get_drives as _get_drives,
+)
 
 
-def search_recycle_bin(name_filter: str = "") -> list[dict]:
-    """Busca archivos Office en la papelera de reciclaje.
+RECYCLE_DIR = "$Recycle.Bin"
 
-    Args:
-        name_filter: Texto parcial para filtrar por nombre (sin extension).
+
+def parse_index_file(data: bytes) -> dict | None:
+    """Parsea un archivo de metadatos $I de la papelera.
+
+    Formato v1 (Vista a 8.1): ruta de 260 caracteres fijos desde el offset 24.
+    Formato v2 (Windows 10+): longitud en el offset 24 y ruta desde el 28.
 
     Returns:
-        Lista de dicts con nombre, ruta_original, tamano y fecha.
+        dict con ruta_original, tamano_bytes y borrado (timestamp), o None.
     """
-    ps_script = r"""
-[Console]::OutputEncoding = [Text.Encoding]::UTF8
-$shell = New-Object -ComObject Shell.Application
-$folder = $shell.NameSpace(0x0a)
-$items = $folder.Items()
-$results = @()
-foreach ($item in $items) {
-    $name = $folder.GetDetailsOf($item, 0)
-    $originalPath = $folder.GetDetailsOf($item, 1)
-    $date = $folder.GetDetailsOf($item, 2)
-    $size = $folder.GetDetailsOf($item, 3)
-    $results += @{
-        Name = $name
-        OriginalPath = $originalPath
-        DeleteDate = $date
-        Size = $size
-    }
-}
-$results | ConvertTo-Json -Compress
-"""
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command", ps_script],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=30,
-            creationflags=subprocess.CREATE_NO_WINDOW,
-        )
-        if result.returncode != 0:
-            return []
-
-        output = result.stdout.strip()
-        if not output:
-            return []
-
-        data = json.loads(output)
-        # PowerShell devuelve un objeto si es un solo item, lista si son varios
-        if isinstance(data, dict):
-            data = [data]
-
-        found = []
-        name_lower = name_filter.lower()
-        for item in data:
-            item_name = item.get("Name", "")
-            ext = _get_extension(item_name)
-            if ext not in OFFICE_EXTENSIONS:
-                continue
-            if name_lower and name_lower not in item_name.lower():
+        version, size, filetime = struct.unpack_from("<QQQ", data, 0)
+        if version == 1:
+            raw = data[24:24 + 520]
+        elif version == 2:
+            length, = struct.unpack_from("<I", data, 24)
+            raw = data[28:28 + length * 2]
+        else:
+            return None
+    except struct.error:
+        return None
+    path = raw.decode("utf-16-le", "replace").split("\x00", 1)[0]
+    if not path:
+        return None
+    return {
+        "ruta_original": path,
+        "tamano_bytes": size,
+        "borrado": _filetime_to_timestamp(filetime),
+    }
+
+
+def _iter_index_files(drives: list[str]):
+    """Genera las rutas de los $I de todas las papeleras (todos los SIDs) de cada unidad."""
+    for drive in drives:
+        root = os.path.join(drive, RECYCLE_DIR)
+        try:
+            with os.scandir(root) as sids:
+                sid_dirs = [e.path for e in sids if e.is_dir()]
+        except OSError:
+            continue
+        for sid_dir in sid_dirs:
+            # Las papeleras de otros usuarios requieren admin
+            try:
+                with os.scandir(sid_dir) as it:
+                    for entry in it:
+                        if entry.name.startswith("$I"):
+                            yield entry.path
+            except OSError:
                 continue
-            found.append({
-                "nombre": item_name,
-                "ruta": item.get("OriginalPath", "Desconocida"),
-                "tamano": item.get("Size", "?"),
-                "fecha": item.get("DeleteDate", "?"),
-                "origen": "Papelera de reciclaje",
-            })
-        return found
-
-    except (subprocess.TimeoutExpired, json.JSONDecodeError, OSError):
-        return []
+
+
+def _result(name: str, original: str, source: str, size: int, deleted: float | None) -> dict:
+    fecha = datetime.fromtimestamp(deleted).strftime("%Y-%m-%d %H:%M") if deleted else "?"
+    return {
+        "nombre": name,
+        "ruta": original,
+        "tamano": _format_size(size),
+        "fecha": fecha,
+        "origen": "Papelera de reciclaje",
+        "tamano_bytes": size,
+        "mtime": deleted,
+        # Archivo $R con el contenido; offer_restore copia desde aqui
+        "ruta_fuente": source,
+    }
+
+
+def search_recycle_bin(name_filter: str = "", drives: list[str] | None = None) -> list[dict]:
+    """Busca archivos Office en la papelera de reciclaje de todas las unidades.
+
+    Lee directamente los metadatos $I de cada usuario en $Recycle.Bin, sin
+    lanzar PowerShell. Los archivos dentro de carpetas borradas tambien se
+    listan, con su ruta original reconstruida.
+
+    Args:
+        name_filter: Texto parcial para filtrar por nombre (sin extension).
+        drives: Unidades a revisar (por defecto todas).
+
+    Returns:
+        Lista de dicts con nombre, ruta original, tamano, fecha de borrado
+        y `ruta_fuente` (el archivo $R desde el que se puede restaurar).
+    """
+    found = []
+    name_lower = name_filter.lower()
+
+    for index_path in _iter_index_files(drives if drives is not None else _get_drives()):
+        try:
+            with open(index_path, "rb") as f:
+                meta = parse_index_file(f.read())
+        except OSError:
+            continue
+        if not meta:
+            continue
+
+        folder, index_name = os.path.split(index_path)
+        data_path = os.path.join(folder, "$R" + index_name[2:])
+        original = meta["ruta_original"]
+
+        if os.path.isdir(data_path):
+            # Carpeta borrada: listar los Office que contiene
+            for dirpath, _, filenames in os.walk(data_path):
+                rel_dir = os.path.relpath(dirpath, data_path)
+                for fname in filenames:
+                    if _get_extension(fname) not in OFFICE_EXTENSIONS:
+                        continue
+                    if name_lower and name_lower not in fname.lower():
+                        continue
+                    source = os.path.join(dirpath, fname)
+                    try:
+                        size = os.path.getsize(source)
+                    except OSError:
+                        continue
+                    rel = fname if rel_dir == "." else os.path.join(rel_dir, fname)
+                    found.append(_result(fname, os.path.join(original, rel), source,
+                                         size, meta["borrado"]))
+            continue
+
+        item_name = original.rsplit("\\", 1)[-1]
+        if _get_extension(item_name) not in OFFICE_EXTENSIONS:
+            continue
+        if name_lower and name_lower not in item_name.lower():
+            continue
+        found.append(_result(item_name, original, data_path,
+                             meta["tamano_bytes"], meta["borrado"]))
+
+    found.sort(key=lambda r: r["mtime"] or 0, reverse=True)
+    return found
 
 
 def _get_extension(filename: str) -> str:
@@ -91,6 +91,8 @@ def search_shadow_copies(name_filter: str, original_path: str = "") -> list[dict
                         "tamano": _format_size(stat.st_size),
                         "fecha": shadow_date,
                         "origen": "Shadow Copy (VSS)",
+                        "tamano_bytes": stat.st_size,
+                        "mtime": stat.st_mtime,
                     })
                 except OSError:
                     pass
@@ -127,6 +129,8 @@ def search_shadow_copies(name_filter: str, original_path: str = "") -> list[dict
                                     "tamano": _format_size(stat.st_size),
                                     "fecha": shadow_date,
                                     "origen": "Shadow Copy (VSS)",
+                                    "tamano_bytes": stat.st_size,
+                                    "mtime": stat.st_mtime,
                                 })
                             except OSError:
                                 continue
@@ -58,6 +58,8 @@ def search_temp_files(name_filter: str = "") -> list[dict]:
                                 "%Y-%m-%d %H:%M"
                             ),
                             "origen": "Autorecuperacion / Temp",
+                            "tamano_bytes": stat.st_size,
+                            "mtime": stat.st_mtime,
                         })
                     except OSError:
                         continue
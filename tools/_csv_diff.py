@@ -0,0 +1,408 @@
+"""Motor de comparacion para CSV grandes (exportaciones de ERP de varios GB).
+
+Los dos archivos se mapean en memoria (mmap) y se recorren por bloques:
+cada bloque se parte en lineas con bytes.split, que corre en C, y solo
+se cuentan comillas cuando el bloque las tiene (un campo entre comillas
+puede traer saltos de linea). Primero se comparan los registros como
+bytes; unicamente los que difieren se decodifican y se separan en campos
+con el modulo csv.
+
+- Por posicion: registro N contra registro N, sin memoria extra.
+- Alineado: se guarda un hash de 64 bits y el offset de cada registro
+  (arrays tipados, 24 bytes por fila) y se alinea con patience diff.
+- Por clave: hash join sobre un digest de 16 bytes de la clave. Si la
+  tabla de claves pasa de CSV_JOIN_MEMORY se reparte en particiones en
+  disco (grace hash join) y se une una particion a la vez.
+"""
+
+import codecs
+import csv
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections import deque
+from itertools import chain, zip_longest
+
+from config import CSV_JOIN_MEMORY
+from tools._row_diff import (
+    KeyColumnError, aligned_diffs, cell_diffs, key_label, key_text,
+    longest_increasing, resolve_key_columns, row_entry,
+)
+
+
+# Bloque que se lee del mmap de una vez
+CSV_BLOCK = 8 * 1024 * 1024
+
+# Muestra para detectar codificacion y delimitador
+SNIFF_BYTES = 64 * 1024
+
+# Registros que se decodifican y parten juntos al extraer claves
+_PARSE_BATCH = 10_000
+
+# Bytes estimados por entrada de la tabla de claves en memoria (dict + tupla)
+_JOIN_ENTRY_BYTES = 200
+
+# Entrada de particion: digest de la clave, fila, offset, largo
+_PART_ENTRY = struct.Struct("<16sqqq")
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def detect_encoding(sample: bytes) -> str:
+    """BOM si lo hay; si no, UTF-8 cuando la muestra es valida y cp1252 si no."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # final=False: la muestra puede cortar un caracter multibyte a la mitad
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def detect_dialect(text: str):
+    """Delimitador y comillas por muestreo; si no se puede, el de Excel."""
+    try:
+        return csv.Sniffer().sniff(text, delimiters=",;\t|")
+    except csv.Error:
+        return csv.excel
+
+
+class CsvSource:
+    """Un CSV mapeado en memoria, recorrible por registros (bytes) con su offset."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._tmp = None
+        sample = self._file.read(SNIFF_BYTES)
+        self.encoding = detect_encoding(sample)
+
+        if self.encoding == "utf-16":
+            # Las lineas de UTF-16 no se pueden partir por b"\n": se pasa a UTF-8 una vez
+            self._tmp = tempfile.TemporaryFile()
+            self._file.seek(0)
+            reader = codecs.getreader("utf-16")(self._file)
+            while True:
+                text = reader.read(CSV_BLOCK)
+                if not text:
+                    break
+                self._tmp.write(text.encode("utf-8"))
+            self._file.close()
+            self._file = self._tmp
+            self._file.seek(0)
+            self.encoding = "utf-8"
+            sample = self._file.read(SNIFF_BYTES)
+
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm = (mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                    if self.size else b"")
+        self._start = len(codecs.BOM_UTF8) if self.encoding == "utf-8-sig" else 0
+        # Solo lineas completas: una linea cortada confunde al Sniffer
+        cut = sample.rfind(b"\n")
+        sample = sample[self._start:cut if cut > self._start else len(sample)]
+        self.dialect = detect_dialect(
+            sample.decode(self.encoding.replace("-sig", ""), "replace")
+        )
+        quote = getattr(self.dialect, "quotechar", '"') or ""
+        self._quote = quote.encode(self.encoding) if quote else None
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def records(self):
+        """Genera (offset, largo, bytes) de cada registro, sin el salto de linea final."""
+        mm, end, quote = self._mm, self.size, self._quote
+        pos = rec_start = self._start
+        buf = b""  # inicio del registro en curso (linea partida o comillas abiertas)
+        while pos < end:
+            block = mm[pos:pos + CSV_BLOCK]
+            pos += len(block)
+            lines = block.split(b"\n")
+            tail = lines.pop()
+            check_quotes = quote is not None and (quote in block or buf)
+            for line in lines:
+                if buf:
+                    line = buf + line
+                    buf = b""
+                if check_quotes and line.count(quote) & 1:
+                    # Comillas abiertas: el salto de linea es parte del campo
+                    buf = line + b"\n"
+                    continue
+                yield rec_start, len(line), line[:-1] if line.endswith(b"\r") else line
+                rec_start += len(line) + 1
+            buf += tail
+        if buf:
+            record = buf.rstrip(b"\n")
+            yield rec_start, len(record), record[:-1] if record.endswith(b"\r") else record
+
+    def record_at(self, offset: int, length: int) -> bytes:
+        record = self._mm[offset:offset + length]
+        return record[:-1] if record.endswith(b"\r") else record
+
+    def fields(self, record: bytes) -> tuple:
+        """Campos de un registro; los vacios como None (igual que una celda vacia)."""
+        text = record.decode(self.encoding, "replace")
+        row = next(csv.reader([text], self.dialect), [])
+        return tuple(v if v != "" else None for v in row)
+
+    def parsed(self, records):
+        """Como `records()` pero con los campos: (offset, largo, bytes, campos) por lotes."""
+        batch = []
+        for item in records:
+            batch.append(item)
+            if len(batch) >= _PARSE_BATCH:
+                yield from self._parse_batch(batch)
+                batch = []
+        yield from self._parse_batch(batch)
+
+    def _parse_batch(self, batch):
+        texts = [rec.decode(self.encoding, "replace") for _, _, rec in batch]
+        for item, row in zip(batch, csv.reader(texts, self.dialect)):
+            yield (*item, tuple(v if v != "" else None for v in row))
+
+
+# ─── Modos ────────────────────────────────────────────────────────
+
+
+def _diff_positional(src1: CsvSource, src2: CsvSource) -> list[dict]:
+    diffs = []
+    pairs = zip_longest(src1.records(), src2.records())
+    for row_num, (r1, r2) in enumerate(pairs, start=1):
+        if r1 is not None and r2 is not None and r1[2] == r2[2]:
+            continue
+        row1 = src1.fields(r1[2]) if r1 else ()
+        row2 = src2.fields(r2[2]) if r2 else ()
+        for diff in cell_diffs(row1, row2, row_num, row_num):
+            del diff["tipo"]
+            diffs.append(diff)
+    return diffs
+
+
+def _index_records(src: CsvSource) -> tuple[array, array, array]:
+    hashes, offsets, lengths = array("q"), array("q"), array("q")
+    for offset, length, record in src.records():
+        hashes.append(hash(record))
+        offsets.append(offset)
+        lengths.append(length)
+    return hashes, offsets, lengths
+
+
+def _diff_aligned(src1: CsvSource, src2: CsvSource) -> list[dict]:
+    h1, off1, len1 = _index_records(src1)
+    h2, off2, len2 = _index_records(src2)
+    return aligned_diffs(
+        h1, h2,
+        lambda i: src1.fields(src1.record_at(off1[i], len1[i])),
+        lambda j: src2.fields(src2.record_at(off2[j], len2[j])),
+    )
+
+
+def _key_digest(key: tuple) -> bytes:
+    return hashlib.blake2b("\x1f".join(key).encode("utf-8"), digest_size=16).digest()
+
+
+class _KeyTable:
+    """digest de clave -> entradas (fila, offset, largo) del archivo 1.
+
+    Las claves repetidas guardan una lista y se emparejan en orden.
+    """
+
+    def __init__(self):
+        self.table: dict[bytes, object] = {}
+        self.count = 0
+
+    def add(self, digest: bytes, entry: tuple) -> None:
+        current = self.table.get(digest)
+        if current is None:
+            self.table[digest] = entry
+        elif isinstance(current, deque):
+            current.append(entry)
+        else:
+            self.table[digest] = deque([current, entry])
+        self.count += 1
+
+    def take(self, digest: bytes):
+        current = self.table.get(digest)
+        if current is None:
+            return None
+        if isinstance(current, deque):
+            entry = current.popleft()
+            if not current:
+                del self.table[digest]
+            return entry
+        del self.table[digest]
+        return current
+
+    def leftovers(self):
+        for value in self.table.values():
+            yield from (value if isinstance(value, deque) else (value,))
+
+
+class _KeyedJoin:
+    """Hash join por clave, con particiones en disco si no cabe en memoria."""
+
+    def __init__(self, src1: CsvSource, src2: CsvSource, key_cols: list[int]):
+        self.src1, self.src2 = src1, src2
+        self.key_cols = key_cols
+        self.max_entries = max(CSV_JOIN_MEMORY // _JOIN_ENTRY_BYTES, 1)
+        self.diffs: list[dict] = []
+        # Parejas encontradas: fila 1, fila 2 y donde releer la fila 1
+        self.pairs_i = array("q")
+        self.pairs_j = array("q")
+        self.pairs_off = array("q")
+        self.pairs_len = array("q")
+
+    def _keyed(self, src: CsvSource):
+        """(digest, fila, offset, largo) desde la fila 2 (la 1 es encabezado)."""
+        records = src.records()
+        next(records, None)
+        for row_idx, (offset, length, _, row) in enumerate(src.parsed(records), start=2):
+            yield _key_digest(key_text(row, self.key_cols)), row_idx, offset, length
+
+    def _label(self, fields: tuple) -> str:
+        return key_label(key_text(fields, self.key_cols))
+
+    def run(self) -> list[dict]:
+        table = _KeyTable()
+        keyed1 = self._keyed(self.src1)
+        consumed = 0
+        for digest, row_idx, offset, length in keyed1:
+            table.add(digest, (row_idx, offset, length))
+            consumed = offset + length
+            if table.count > self.max_entries:
+                with tempfile.TemporaryDirectory(prefix="comparador_") as tmp:
+                    self._grace_join(table, keyed1, tmp, consumed)
+                self._report_moves(sort_pairs=True)
+                return self.diffs
+
+        self._probe(table, self._keyed(self.src2))
+        self._report_moves(sort_pairs=False)
+        return self.diffs
+
+    def _probe(self, table: _KeyTable, entries2) -> None:
+        src1, src2 = self.src1, self.src2
+        for digest, row2, off2, len2 in entries2:
+            hit = table.take(digest)
+            record2 = src2.record_at(off2, len2)
+            if hit is None:
+                fields2 = src2.fields(record2)
+                self.diffs.append(row_entry("agregada", fields2, None, row2, self._label(fields2)))
+                continue
+            row1, off1, len1 = hit
+            self.pairs_i.append(row1)
+            self.pairs_j.append(row2)
+            self.pairs_off.append(off1)
+            self.pairs_len.append(len1)
+            record1 = src1.record_at(off1, len1)
+            if record1 != record2:
+                fields1, fields2 = src1.fields(record1), src2.fields(record2)
+                if fields1 != fields2:
+                    self.diffs.extend(
+                        cell_diffs(fields1, fields2, row1, row2, self._label(fields1))
+                    )
+        for row1, off1, len1 in table.leftovers():
+            fields1 = src1.fields(src1.record_at(off1, len1))
+            self.diffs.append(row_entry("eliminada", fields1, row1, None, self._label(fields1)))
+
+    def _grace_join(self, table: _KeyTable, rest1, tmp: str, consumed: int) -> None:
+        """Reparte ambos lados por digest en particiones y une cada una en memoria."""
+        # Particiones suficientes para que cada una quepa, estimando por bytes leidos
+        estimate = table.count * self.src1.size / max(consumed, 1)
+        parts = min(max(int(estimate * 1.5) // self.max_entries + 1, 2), 256)
+
+        def spill(side: str, entries) -> None:
+            files = [open(os.path.join(tmp, f"{side}{k}.bin"), "wb") for k in range(parts)]
+            try:
+                for digest, row_idx, offset, length in entries:
+                    files[digest[0] % parts].write(
+                        _PART_ENTRY.pack(digest, row_idx, offset, length)
+                    )
+            finally:
+                for f in files:
+                    f.close()
+
+        def table_entries():
+            for digest, value in table.table.items():
+                for entry in (value if isinstance(value, deque) else (value,)):
+                    yield (digest, *entry)
+
+        spill("a", chain(table_entries(), rest1))
+        table.table.clear()
+        spill("b", self._keyed(self.src2))
+
+        for k in range(parts):
+            part_table = _KeyTable()
+            for digest, *entry in _read_part(os.path.join(tmp, f"a{k}.bin")):
+                part_table.add(digest, tuple(entry))
+            self._probe(part_table, _read_part(os.path.join(tmp, f"b{k}.bin")))
+
+    def _report_moves(self, sort_pairs: bool) -> None:
+        """Las parejas que rompen el orden relativo del archivo 1 se reportan movidas."""
+        count = len(self.pairs_j)
+        order = (sorted(range(count), key=self.pairs_j.__getitem__) if sort_pairs
+                 else range(count))
+        rows1 = [self.pairs_i[k] for k in order]
+        in_order = set(longest_increasing(rows1))
+        for pos, k in enumerate(order):
+            if pos in in_order:
+                continue
+            fields = self.src1.fields(self.src1.record_at(self.pairs_off[k], self.pairs_len[k]))
+            self.diffs.append(row_entry(
+                "movida", fields, self.pairs_i[k], self.pairs_j[k], self._label(fields)
+            ))
+
+
+def _read_part(path: str):
+    size = _PART_ENTRY.size
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(size * 4096)
+            if not data:
+                break
+            for k in range(0, len(data), size):
+                yield _PART_ENTRY.unpack_from(data, k)
+
+
+def compare_csv(path1: str, path2: str, mode: str, keys: str = "") -> tuple[list[dict], bool]:
+    """Compara dos CSV. `mode` es "posicion", "alinear" o "clave".
+
+    Returns:
+        (diffs, sin_clave): sin_clave es True si se pidio clave pero el
+        encabezado no la tiene (entonces se alinea por contenido).
+
+    Raises:
+        OSError: Si algun archivo no se puede leer.
+    """
+    with CsvSource(path1) as src1, CsvSource(path2) as src2:
+        if mode == "clave":
+            header = next(src1.records(), None)
+            try:
+                key_cols = resolve_key_columns(keys, src1.fields(header[2]) if header else ())
+            except KeyColumnError:
+                return _diff_aligned(src1, src2), True
+            header2 = next(src2.records(), None)
+            diffs = []
+            if header and header2 and header[2] != header2[2]:
+                diffs = cell_diffs(src1.fields(header[2]), src2.fields(header2[2]), 1, 1)
+            return diffs + _KeyedJoin(src1, src2, key_cols).run(), False
+        if mode == "alinear":
+            return _diff_aligned(src1, src2), False
+        return _diff_positional(src1, src2), False
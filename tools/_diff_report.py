@@ -0,0 +1,178 @@
+"""Reportes del comparador de Excel escritos en streaming.
+
+Ambos trabajan solo con el resultado de compare_files (la lista de
+diferencias), nunca con los libros comparados: no importa el tamano de
+los originales, en memoria solo esta la fila que se esta escribiendo.
+
+- Libro de diferencias: .xlsx write-only con una fila por diferencia
+  (hoja, celda, tipo, clave, valor anterior y nuevo).
+- HTML lado a lado: una tabla por hoja con el valor del archivo 1 y del
+  archivo 2 en columnas contiguas, para abrir en cualquier navegador.
+
+Si la comparacion fue con tolerancia, los dos llevan ademas los totales
+por columna de cada hoja.
+"""
+
+import html
+import os
+import re
+from datetime import datetime
+
+
+# Columnas del libro de diferencias (clave del diff, encabezado)
+REPORT_FIELDS = [
+    ("celda", "Celda"),
+    ("tipo", "Tipo"),
+    ("clave", "Clave"),
+    ("v1", "Archivo 1"),
+    ("v2", "Archivo 2"),
+]
+
+# Caracteres de control que Excel no acepta dentro de una celda
+_ILLEGAL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_HTML_STYLE = """\
+body { font-family: Segoe UI, Arial, sans-serif; font-size: 13px; margin: 24px; }
+h1 { font-size: 18px; } h2 { font-size: 15px; margin-top: 28px; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 3px 8px; vertical-align: top; white-space: pre-wrap; }
+th { background: #eee; text-align: left; }
+td.v1 { background: #fdd; } td.v2 { background: #dfd; }
+tr.descuadre td { color: #a00; font-weight: bold; }
+td.num { text-align: right; }
+td.agregada { color: #070; } td.eliminada { color: #a00; } td.movida { color: #05a; } td.formula { color: #850; }
+.nota { color: #666; }
+"""
+
+
+def _cell_text(diff: dict) -> str:
+    celda = diff["celda"]
+    if "celda2" in diff:
+        celda += f" -> {diff['celda2']}"
+    return celda
+
+
+def _report_row(sheet: str, diff: dict) -> list[str]:
+    values = {
+        "celda": _cell_text(diff),
+        "tipo": diff.get("tipo", "modificada"),
+        "clave": diff.get("clave", ""),
+        "v1": diff["v1"],
+        "v2": diff["v2"],
+    }
+    return [sheet] + [_ILLEGAL_CHARS.sub("", values[key]) for key, _ in REPORT_FIELDS]
+
+
+def _summary_lines(comparison: dict) -> list[str]:
+    lines = []
+    if comparison.get("sheets_only_v1"):
+        lines.append(f"Hojas solo en archivo 1: {', '.join(comparison['sheets_only_v1'])}")
+    if comparison.get("sheets_only_v2"):
+        lines.append(f"Hojas solo en archivo 2: {', '.join(comparison['sheets_only_v2'])}")
+    if comparison.get("identicas"):
+        lines.append(f"Hojas identicas (sin revisar celdas): {', '.join(comparison['identicas'])}")
+    if comparison.get("sin_clave"):
+        lines.append(
+            f"Sin columnas clave (alineadas por contenido): {', '.join(comparison['sin_clave'])}"
+        )
+    return lines
+
+
+def write_diff_workbook(comparison: dict, path1: str, path2: str, output: str,
+                        openpyxl) -> int:
+    """Escribe un .xlsx con una fila por diferencia, en modo write-only.
+
+    Returns:
+        Numero de diferencias escritas.
+
+    Raises:
+        OSError: Si no se puede guardar el archivo.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Diferencias")
+    ws.append(["Hoja"] + [header for _, header in REPORT_FIELDS])
+    count = 0
+    for sheet, diffs in comparison["common_diffs"].items():
+        for diff in diffs:
+            ws.append(_report_row(sheet, diff))
+            count += 1
+
+    if comparison.get("totales"):
+        totals = wb.create_sheet("Totales")
+        totals.append(["Hoja", "Columna", "Total archivo 1", "Total archivo 2",
+                       "Diferencia", "Cuadra"])
+        for sheet, columns in comparison["totales"].items():
+            for col in columns:
+                totals.append([sheet, col["columna"], col["total1"], col["total2"],
+                               col["diferencia"], "Si" if col["cuadra"] else "No"])
+
+    info = wb.create_sheet("Resumen")
+    info.append(["Archivo 1", path1])
+    info.append(["Archivo 2", path2])
+    info.append(["Generado", datetime.now().strftime("%Y-%m-%d %H:%M")])
+    info.append(["Diferencias", count])
+    for line in _summary_lines(comparison):
+        info.append([_ILLEGAL_CHARS.sub("", line)])
+
+    wb.save(output)
+    wb.close()
+    return count
+
+
+def write_diff_html(comparison: dict, path1: str, path2: str, output: str) -> int:
+    """Escribe un reporte HTML lado a lado, una tabla por hoja.
+
+    Returns:
+        Numero de diferencias escritas.
+
+    Raises:
+        OSError: Si no se puede crear el archivo.
+    """
+    esc = html.escape
+    name1, name2 = os.path.basename(path1), os.path.basename(path2)
+    count = 0
+    with open(output, "w", encoding="utf-8", newline="\n") as f:
+        f.write("<!DOCTYPE html>\n<html lang=\"es\">\n<head>\n<meta charset=\"utf-8\">\n")
+        f.write(f"<title>Comparacion: {esc(name1)} vs {esc(name2)}</title>\n")
+        f.write(f"<style>\n{_HTML_STYLE}</style>\n</head>\n<body>\n")
+        f.write(f"<h1>{esc(name1)} vs {esc(name2)}</h1>\n")
+        f.write(f"<p class=\"nota\">Archivo 1: {esc(path1)}<br>Archivo 2: {esc(path2)}<br>"
+                f"Generado: {datetime.now():%Y-%m-%d %H:%M}</p>\n")
+        for line in _summary_lines(comparison):
+            f.write(f"<p class=\"nota\">{esc(line)}</p>\n")
+
+        for sheet, columns in comparison.get("totales", {}).items():
+            f.write(f"<h2>Totales: {esc(sheet)}</h2>\n<table>\n")
+            f.write(
+                f"<tr><th>Columna</th><th>{esc(name1)}</th><th>{esc(name2)}</th>"
+                "<th>Diferencia</th></tr>\n"
+            )
+            for col in columns:
+                css = "" if col["cuadra"] else " class=\"descuadre\""
+                f.write(
+                    f"<tr{css}><td>{col['columna']}</td><td class=\"num\">{col['total1']:,.2f}</td>"
+                    f"<td class=\"num\">{col['total2']:,.2f}</td>"
+                    f"<td class=\"num\">{col['diferencia']:,.2f}</td></tr>\n"
+                )
+            f.write("</table>\n")
+
+        for sheet, diffs in comparison["common_diffs"].items():
+            f.write(f"<h2>Hoja: {esc(sheet)} ({len(diffs)} diferencia(s))</h2>\n<table>\n")
+            f.write(
+                "<tr><th>Celda</th><th>Tipo</th><th>Clave</th>"
+                f"<th>{esc(name1)}</th><th>{esc(name2)}</th></tr>\n"
+            )
+            for diff in diffs:
+                _, celda, tipo, clave, v1, v2 = _report_row(sheet, diff)
+                f.write(
+                    f"<tr><td>{esc(celda)}</td><td class=\"{tipo}\">{tipo}</td>"
+                    f"<td>{esc(clave)}</td><td class=\"v1\">{esc(v1)}</td>"
+                    f"<td class=\"v2\">{esc(v2)}</td></tr>\n"
+                )
+                count += 1
+            f.write("</table>\n")
+
+        if not count:
+            f.write("<p>Los archivos son identicos en las hojas comunes.</p>\n")
+        f.write("</body>\n</html>\n")
+    return count
@@ -0,0 +1,224 @@
+"""Host de PowerShell persistente compartido por todas las herramientas.
+
+Lanzar `powershell -NoProfile` cuesta ~1 segundo por llamada. Este modulo
+mantiene un solo proceso vivo y le envia scripts por stdin como JSON
+delimitado por lineas ({"id", "script"}); la respuesta regresa por stdout
+({"id", "ok", "stdout", "stderr"}). El proceso arranca en la primera
+llamada y se relanza solo si muere o si un script excede su timeout.
+
+El host ejecuta un script a la vez, asi que las peticiones de varios hilos
+hacen fila de este lado y se envian de una en una: el timeout de cada una
+cuenta desde que empieza a correr, y matar el proceso por un timeout solo
+afecta al script que lo causo.
+
+Los scripts no deben usar `exit` (terminaria el host); para reportar un
+fallo deben lanzar una excepcion con `throw`.
+"""
+
+import atexit
+import base64
+import itertools
+import json
+import subprocess
+import threading
+
+
+# Bucle del lado de PowerShell: lee una peticion por linea y responde otra
+_BOOTSTRAP = r"""
+$ErrorActionPreference = 'Continue'
+$ProgressPreference = 'SilentlyContinue'
+try {
+    $utf8 = New-Object System.Text.UTF8Encoding $false
+    [Console]::InputEncoding = $utf8
+    [Console]::OutputEncoding = $utf8
+} catch {}
+$reader = [Console]::In
+$writer = [Console]::Out
+while ($true) {
+    $line = $reader.ReadLine()
+    if ($null -eq $line) { break }
+    try { $req = $line | ConvertFrom-Json } catch { continue }
+    $ok = $true
+    $out = ''
+    $err = ''
+    try {
+        $res = & ([ScriptBlock]::Create($req.script)) 2>&1
+        $records = @($res | Where-Object { $_ -is [System.Management.Automation.ErrorRecord] })
+        $out = (@($res | Where-Object { $_ -isnot [System.Management.Automation.ErrorRecord] }) |
+            Out-String -Width 4096).TrimEnd()
+        if ($records.Count -gt 0) {
+            $ok = $false
+            $err = ($records | Out-String -Width 4096).TrimEnd()
+        }
+    } catch {
+        $ok = $false
+        $err = $_.Exception.Message
+    }
+    $resp = @{ id = $req.id; ok = $ok; stdout = $out; stderr = $err } | ConvertTo-Json -Compress
+    $writer.WriteLine($resp)
+    $writer.Flush()
+}
+"""
+
+
+def _default_command() -> list[str]:
+    encoded = base64.b64encode(_BOOTSTRAP.encode("utf-16-le")).decode("ascii")
+    return ["powershell", "-NoProfile", "-NonInteractive",
+            "-ExecutionPolicy", "Bypass", "-EncodedCommand", encoded]
+
+
+class _Request:
+    __slots__ = ("proc", "done", "response", "error")
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class PowerShellHost:
+    """Proceso de PowerShell de larga vida, seguro para usar desde varios hilos.
+
+    Args:
+        command: Comando del interprete. Por defecto PowerShell con el
+            bucle de arriba; cualquier programa que hable el mismo
+            protocolo (p. ej. un script de Python) sirve como sustituto.
+    """
+
+    def __init__(self, command: list[str] | None = None):
+        self._command = command or _default_command()
+        self._lock = threading.Lock()
+        # Una peticion en el host a la vez (la fila espera aqui, sin timeout)
+        self._run_lock = threading.Lock()
+        self._proc = None
+        self._pending: dict[int, _Request] = {}
+        self._ids = itertools.count(1)
+
+    def _ensure_started(self) -> subprocess.Popen:
+        """Arranca el proceso si no existe o si murio. Requiere tener el lock."""
+        if self._proc is not None and self._proc.poll() is None:
+            return self._proc
+        proc = subprocess.Popen(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        self._proc = proc
+        threading.Thread(target=self._read_loop, args=(proc,), daemon=True).start()
+        return proc
+
+    def _read_loop(self, proc: subprocess.Popen) -> None:
+        """Despacha cada respuesta a la peticion que la espera."""
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                req = self._pending.pop(msg.get("id"), None)
+            if req:
+                req.response = msg
+                req.done.set()
+        # EOF: el proceso termino (crash o kill); fallan sus peticiones pendientes
+        self._fail_pending(proc, "El proceso de PowerShell termino inesperadamente")
+
+    def _fail_pending(self, proc: subprocess.Popen, message: str) -> None:
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+            orphaned = [rid for rid, req in self._pending.items() if req.proc is proc]
+            reqs = [self._pending.pop(rid) for rid in orphaned]
+        for req in reqs:
+            req.error = message
+            req.done.set()
+
+    @staticmethod
+    def _kill(proc: subprocess.Popen) -> None:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+    def run(self, script: str, timeout: float = 30) -> subprocess.CompletedProcess:
+        """Ejecuta un script y espera su resultado.
+
+        Si otro hilo tiene un script corriendo, espera su turno; `timeout`
+        cuenta desde que el script se envia al host.
+
+        Returns:
+            CompletedProcess con returncode 0 si no hubo errores, 1 si los hubo.
+
+        Raises:
+            subprocess.TimeoutExpired: Si el script excede `timeout`; el host
+                se reinicia para no quedar bloqueado.
+            OSError: Si PowerShell no se pudo iniciar o murio a mitad de la peticion.
+        """
+        with self._run_lock:
+            with self._lock:
+                proc = self._ensure_started()
+                rid = next(self._ids)
+                req = _Request(proc)
+                self._pending[rid] = req
+                try:
+                    proc.stdin.write(json.dumps({"id": rid, "script": script}) + "\n")
+                    proc.stdin.flush()
+                except (OSError, ValueError) as e:
+                    self._pending.pop(rid, None)
+                    self._kill(proc)
+                    raise OSError(f"No se pudo enviar el script a PowerShell: {e}") from e
+
+            if not req.done.wait(timeout):
+                with self._lock:
+                    self._pending.pop(rid, None)
+                    if self._proc is proc:
+                        self._proc = None
+                self._kill(proc)
+                raise subprocess.TimeoutExpired(script, timeout)
+            if req.error:
+                raise OSError(req.error)
+
+        msg = req.response
+        return subprocess.CompletedProcess(
+            args=script,
+            returncode=0 if msg.get("ok") else 1,
+            stdout=msg.get("stdout") or "",
+            stderr=msg.get("stderr") or "",
+        )
+
+    def close(self) -> None:
+        """Termina el proceso (cerrar stdin hace que el bucle salga limpio)."""
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self._kill(proc)
+
+
+_host: PowerShellHost | None = None
+_host_lock = threading.Lock()
+
+
+def get_host() -> PowerShellHost:
+    """Host compartido del proceso (se crea en el primer uso)."""
+    global _host
+    with _host_lock:
+        if _host is None:
+            _host = PowerShellHost()
+            atexit.register(_host.close)
+        return _host
+
+
+def run_powershell(script: str, timeout: float = 30) -> subprocess.CompletedProcess:
+    """Ejecuta un script en el host compartido (ver `PowerShellHost.run`)."""
+    return get_host().run(script, timeout)
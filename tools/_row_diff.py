@@ -0,0 +1,415 @@
+"""Emparejamiento de filas para el comparador: por columnas clave o por contenido.
+
+Comparar por posicion reporta como cambiada cada celda debajo de una fila
+insertada. Aqui primero se emparejan las filas y despues se comparan las
+celdas de cada pareja:
+
+- Con clave (RFC, numero de empleado...): hash join. Las filas de la
+  version 1 quedan en un dict clave -> filas y la version 2 se recorre una
+  sola vez. Lo que no encuentra pareja es agregado o eliminado, y las
+  parejas fuera de la subsecuencia creciente mas larga se marcan movidas.
+- Sin clave: patience diff sobre las filas completas. Las filas que son
+  unicas en ambas versiones sirven de anclas; los huecos entre anclas se
+  resuelven igual, y los que no tienen anclas y son chicos con difflib.
+
+Todo es O(n log n) salvo esos huecos chicos, con tope de tamano.
+"""
+
+import re
+from bisect import bisect_left
+from collections import deque
+from difflib import SequenceMatcher
+
+
+# Tope de len(a) * len(b) para resolver con difflib un hueco sin anclas
+_SMALL_GAP = 250_000
+
+_COLUMN_RE = re.compile(r"^[A-Za-z]{1,3}$")
+
+# Largo maximo del resumen de una fila agregada o eliminada
+_SUMMARY_LEN = 80
+
+# Indice -> letra de columna, ya calculadas
+_COLUMN_LETTERS: dict[int, str] = {}
+
+
+def column_letter(col: int) -> str:
+    """Letra de columna (1 -> A, 28 -> AB), cacheada: se pide por cada diff."""
+    letter = _COLUMN_LETTERS.get(col)
+    if letter is None:
+        letter = ""
+        n = col
+        while n:
+            n, rem = divmod(n - 1, 26)
+            letter = chr(65 + rem) + letter
+        _COLUMN_LETTERS[col] = letter
+    return letter
+
+
+def format_value(value) -> str:
+    return str(value) if value is not None else "(vacio)"
+
+
+class FormulaRow(tuple):
+    """Fila de valores que ademas trae la formula de cada celda.
+
+    `formulas` va alineada con los valores (None donde no hay formula) y
+    sin Nones al final. Se compara y se hashea como (valores, formulas):
+    una formula cambiada hace distinta la fila aunque de el mismo valor,
+    asi los tres modos de emparejar la tratan como fila modificada.
+    """
+
+    def __new__(cls, values, formulas: tuple):
+        row = super().__new__(cls, values)
+        row.formulas = formulas
+        return row
+
+    def __eq__(self, other):
+        return (tuple.__eq__(self, other) is True
+                and self.formulas == getattr(other, "formulas", ()))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((tuple(self), self.formulas))
+
+
+def trim_row(row: tuple) -> tuple:
+    """Quita las celdas vacias al final (dos filas iguales pueden venir de distinto largo)."""
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    if end == len(row):
+        return row
+    formulas = getattr(row, "formulas", None)
+    if formulas is None:
+        return tuple(row[:end])
+    # Una formula sin valor calculado tambien cuenta como celda ocupada
+    return FormulaRow(row[:max(end, len(formulas))], formulas)
+
+
+def _summary(row: tuple) -> str:
+    text = " | ".join(str(v) for v in row if v is not None)
+    if len(text) > _SUMMARY_LEN:
+        text = text[:_SUMMARY_LEN - 3] + "..."
+    return text or "(fila vacia)"
+
+
+def cell_diffs(row1: tuple, row2: tuple, row_num1: int, row_num2: int,
+               key: str | None = None, tol=None) -> list[dict]:
+    """Diffs celda por celda de dos filas ya emparejadas.
+
+    "celda" es la coordenada en el archivo 1; si la fila cambio de lugar,
+    "celda2" trae la del archivo 2. Con `tol` (tools._tolerance.Tolerance)
+    los numeros dentro de la tolerancia cuentan como iguales.
+    """
+    diffs = []
+    for col in range(max(len(row1), len(row2))):
+        v1 = row1[col] if col < len(row1) else None
+        v2 = row2[col] if col < len(row2) else None
+        if v1 != v2 and (tol is None or not tol.equal(v1, v2)):
+            letter = column_letter(col + 1)
+            diff = {
+                "celda": f"{letter}{row_num1}",
+                "v1": format_value(v1),
+                "v2": format_value(v2),
+                "tipo": "modificada",
+            }
+            if row_num2 != row_num1:
+                diff["celda2"] = f"{letter}{row_num2}"
+            if key is not None:
+                diff["clave"] = key
+            diffs.append(diff)
+    diffs.extend(formula_diffs(row1, row2, row_num1, row_num2, key))
+    return diffs
+
+
+def formula_diffs(row1: tuple, row2: tuple, row_num1: int, row_num2: int,
+                  key: str | None = None) -> list[dict]:
+    """Diffs de formula (tipo "formula") entre dos filas emparejadas.
+
+    Solo hay algo que comparar si las filas son FormulaRow; las demas no
+    tienen formulas.
+    """
+    f1 = getattr(row1, "formulas", ())
+    f2 = getattr(row2, "formulas", ())
+    if f1 == f2:
+        return []
+    diffs = []
+    for col in range(max(len(f1), len(f2))):
+        a = f1[col] if col < len(f1) else None
+        b = f2[col] if col < len(f2) else None
+        if a == b:
+            continue
+        letter = column_letter(col + 1)
+        diff = {
+            "celda": f"{letter}{row_num1}",
+            "v1": a or "(sin formula)",
+            "v2": b or "(sin formula)",
+            "tipo": "formula",
+        }
+        if row_num2 != row_num1:
+            diff["celda2"] = f"{letter}{row_num2}"
+        if key is not None:
+            diff["clave"] = key
+        diffs.append(diff)
+    return diffs
+
+
+def row_entry(kind: str, row: tuple, row_num1: int | None, row_num2: int | None,
+              key: str | None = None) -> dict:
+    """Diff de fila completa: agregada, eliminada o movida."""
+    if kind == "agregada":
+        diff = {"celda": f"Fila {row_num2}", "v1": "(no existe)", "v2": _summary(row)}
+    elif kind == "eliminada":
+        diff = {"celda": f"Fila {row_num1}", "v1": _summary(row), "v2": "(no existe)"}
+    else:
+        text = _summary(row)
+        diff = {"celda": f"Fila {row_num1} -> {row_num2}", "v1": text, "v2": text}
+    diff["tipo"] = kind
+    if key is not None:
+        diff["clave"] = key
+    return diff
+
+
+def longest_increasing(values: list) -> list[int]:
+    """Posiciones (en `values`) de una subsecuencia estrictamente creciente mas larga."""
+    tails: list = []
+    tail_pos: list[int] = []
+    prev = [-1] * len(values)
+    for i, v in enumerate(values):
+        k = bisect_left(tails, v)
+        if k == len(tails):
+            tails.append(v)
+            tail_pos.append(i)
+        else:
+            tails[k] = v
+            tail_pos[k] = i
+        prev[i] = tail_pos[k - 1] if k else -1
+    out = []
+    i = tail_pos[-1] if tail_pos else -1
+    while i >= 0:
+        out.append(i)
+        i = prev[i]
+    return out[::-1]
+
+
+# ─── Por clave ────────────────────────────────────────────────────
+
+
+class KeyColumnError(ValueError):
+    """La hoja no tiene las columnas clave pedidas."""
+
+
+def resolve_key_columns(spec: str, header: tuple) -> list[int]:
+    """Traduce "RFC" o "A,C" a indices de columna (base 0).
+
+    Primero se busca el nombre en el encabezado (sin distinguir
+    mayusculas); si no esta y parece letra de columna, se usa la letra.
+
+    Raises:
+        KeyColumnError: Si alguna columna no existe en la hoja.
+    """
+    names = [str(h).strip().lower() if h is not None else "" for h in header]
+    cols = []
+    for token in (t.strip() for t in spec.split(",")):
+        if not token:
+            continue
+        if token.lower() in names:
+            cols.append(names.index(token.lower()))
+            continue
+        if _COLUMN_RE.match(token):
+            col = 0
+            for ch in token.upper():
+                col = col * 26 + ord(ch) - 64
+            if col <= max(len(header), 1):
+                cols.append(col - 1)
+                continue
+        raise KeyColumnError(f"Columna clave no encontrada: {token}")
+    if not cols:
+        raise KeyColumnError("No se indicaron columnas clave")
+    return cols
+
+
+def key_label(key: tuple) -> str:
+    return "=".join(key) if len(key) == 1 else ", ".join(key)
+
+
+def key_text(row: tuple, key_cols: list[int]) -> tuple:
+    # Texto normalizado: 123 y "123 " son la misma clave
+    return tuple(
+        "" if c >= len(row) or row[c] is None else str(row[c]).strip()
+        for c in key_cols
+    )
+
+
+def diff_keyed(rows1, rows2, key_cols: list[int], first_row: int = 1,
+               tol=None) -> list[dict]:
+    """Empareja filas por columnas clave (hash join) y las compara.
+
+    Solo las filas de `rows1` se guardan en memoria; `rows2` se recorre una
+    vez. Las claves repetidas se emparejan en orden de aparicion.
+
+    Args:
+        rows1, rows2: Iterables de tuplas de valores.
+        key_cols: Indices (base 0) de las columnas que forman la clave.
+        first_row: Numero de fila en la hoja de la primera tupla.
+        tol: Tolerancia numerica opcional para comparar las celdas.
+
+    Returns:
+        Diffs con "tipo": modificada, agregada, eliminada o movida.
+    """
+    index: dict[tuple, deque] = {}
+    for i, row in enumerate(rows1):
+        index.setdefault(key_text(row, key_cols), deque()).append((i, trim_row(row)))
+
+    diffs = []
+    pairs = []  # (i, j, fila1, etiqueta) en orden de rows2
+    for j, row2 in enumerate(rows2):
+        row2 = trim_row(row2)
+        key = key_text(row2, key_cols)
+        label = key_label(key)
+        bucket = index.get(key)
+        if not bucket:
+            diffs.append(row_entry("agregada", row2, None, first_row + j, label))
+            continue
+        i, row1 = bucket.popleft()
+        if not bucket:
+            del index[key]
+        pairs.append((i, j, row1, label))
+        if row1 != row2:
+            diffs.extend(cell_diffs(row1, row2, first_row + i, first_row + j, label, tol))
+
+    for key, bucket in index.items():
+        label = key_label(key)
+        for i, row1 in bucket:
+            diffs.append(row_entry("eliminada", row1, first_row + i, None, label))
+
+    # Movidas: parejas que rompen el orden relativo de la version 1
+    in_order = set(longest_increasing([i for i, _, _, _ in pairs]))
+    for pos, (i, j, row1, label) in enumerate(pairs):
+        if pos not in in_order:
+            diffs.append(row_entry("movida", row1, first_row + i, first_row + j, label))
+    return diffs
+
+
+# ─── Sin clave: alineacion por contenido ─────────────────────────
+
+
+def _unique_anchors(a: list, b: list, alo: int, ahi: int, blo: int, bhi: int) -> list:
+    """Parejas (i, j) de filas unicas en ambos rangos, en orden creciente en los dos."""
+    count_a: dict = {}
+    for i in range(alo, ahi):
+        count_a[a[i]] = -1 if a[i] in count_a else i
+    count_b: dict = {}
+    for j in range(blo, bhi):
+        row = b[j]
+        if count_a.get(row, -1) >= 0:
+            count_b[row] = -1 if row in count_b else j
+    candidates = sorted(
+        (count_a[row], j) for row, j in count_b.items() if j >= 0
+    )
+    keep = longest_increasing([j for _, j in candidates])
+    return [candidates[k] for k in keep]
+
+
+def align(a: list, b: list) -> list[tuple[int, int]]:
+    """Parejas (i, j) de elementos iguales, crecientes en ambas listas (patience diff)."""
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            matches.extend(anchors)
+            prev_a, prev_b = alo, blo
+            for i, j in anchors:
+                stack.append((prev_a, i, prev_b, j))
+                prev_a, prev_b = i + 1, j + 1
+            stack.append((prev_a, ahi, prev_b, bhi))
+        elif (ahi - alo) * (bhi - blo) <= _SMALL_GAP:
+            matcher = SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for block in matcher.get_matching_blocks():
+                matches.extend(
+                    (alo + block.a + k, blo + block.b + k) for k in range(block.size)
+                )
+    matches.sort()
+    return matches
+
+
+def diff_aligned(rows1, rows2, first_row: int = 1, tol=None) -> list[dict]:
+    """Alinea filas por contenido y reporta agregadas, eliminadas, movidas y modificadas.
+
+    Dentro de cada hueco entre filas iguales, las eliminadas y agregadas
+    se emparejan en orden como filas modificadas (diff por celda). Una
+    fila agregada identica a una eliminada en otro lugar se reporta movida.
+    """
+    a = [trim_row(r) for r in rows1]
+    b = [trim_row(r) for r in rows2]
+    return aligned_diffs(a, b, a.__getitem__, b.__getitem__, first_row, tol)
+
+
+def aligned_diffs(keys1, keys2, row1, row2, first_row: int = 1, tol=None) -> list[dict]:
+    """Como `diff_aligned`, pero alineando `keys1`/`keys2` (las filas o sus hashes).
+
+    `row1(i)` y `row2(j)` devuelven la fila completa; solo se piden las
+    que no quedaron emparejadas, asi el llamador puede tener en memoria
+    unicamente los hashes y leer las filas de disco bajo demanda.
+    """
+    a, b = keys1, keys2
+    matches = align(a, b)
+
+    gaps = []
+    prev_i = prev_j = 0
+    for i, j in matches + [(len(a), len(b))]:
+        if prev_i < i or prev_j < j:
+            gaps.append((range(prev_i, i), range(prev_j, j)))
+        prev_i, prev_j = i + 1, j + 1
+
+    # Movidas: misma fila eliminada en un hueco y agregada en otro
+    removed: dict = {}
+    for dels, _ in gaps:
+        for i in dels:
+            removed.setdefault(a[i], deque()).append(i)
+    moved_from: dict[int, int] = {}  # j -> i
+    for dels, ins in gaps:
+        for j in ins:
+            bucket = removed.get(b[j])
+            if not bucket:
+                continue
+            for k, i in enumerate(bucket):
+                if i not in dels:
+                    del bucket[k]
+                    moved_from[j] = i
+                    break
+    moved_a = set(moved_from.values())
+
+    diffs = []
+    for dels, ins in gaps:
+        dels = [i for i in dels if i not in moved_a]
+        rest = []
+        for j in ins:
+            if j in moved_from:
+                i = moved_from[j]
+                diffs.append(row_entry("movida", row1(i), first_row + i, first_row + j))
+            else:
+                rest.append(j)
+        for i, j in zip(dels, rest):
+            diffs.extend(cell_diffs(row1(i), row2(j), first_row + i, first_row + j, tol=tol))
+        for i in dels[len(rest):]:
+            diffs.append(row_entry("eliminada", row1(i), first_row + i, None))
+        for j in rest[len(dels):]:
+            diffs.append(row_entry("agregada", row2(j), None, first_row + j))
+    return diffs
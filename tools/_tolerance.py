@@ -0,0 +1,275 @@
+"""Comparacion numerica con tolerancia y totales por columna.
+
+En libros financieros 0.1 + 0.2 no es 0.3: un recalculo deja ruido en el
+ultimo decimal y la comparacion exacta lo reporta como cambio. Aqui dos
+numeros son iguales si |a - b| <= max(tolerancia absoluta, tolerancia
+relativa * max(|a|, |b|)), como math.isclose. Opcionalmente el texto que
+es un numero ("1,250.00") cuenta como ese numero.
+
+Con NumPy (opcional) las filas se juntan en bloques de COMPARE_BLOCK y se
+comparan como arreglos float64; sin NumPy se hace lo mismo celda por
+celda. Los totales por columna de cada archivo salen de los mismos
+bloques, para cuadrar las hojas aunque las filas no coincidan.
+"""
+
+import math
+from itertools import islice, zip_longest
+
+from tools._row_diff import column_letter, format_value, formula_diffs
+
+
+# Filas por bloque al convertir a arreglos
+COMPARE_BLOCK = 4096
+
+_NUMERIC = {int, float}
+_NAN = math.nan
+# Enteros mas alla de esto no caben exactos en float64
+_FLOAT_SAFE_INT = 2 ** 53
+# Columnas que np.array(..., dtype=float) convierte bien (None -> NaN)
+_ARRAY_SAFE = {int, float, type(None)}
+
+
+def _get_numpy():
+    """Import lazy de numpy; sin el se usa la version en Python puro."""
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+
+def parse_number(text: str) -> float:
+    """Numero escrito como texto ("$1,250.50", " 12 "); NaN si no lo es."""
+    text = text.strip().replace(",", "").replace("$", "")
+    if not text:
+        return _NAN
+    try:
+        return float(text)
+    except ValueError:
+        return _NAN
+
+
+class Tolerance:
+    """Criterio de igualdad numerica (se manda tal cual a los procesos del pool)."""
+
+    def __init__(self, abs_tol: float = 0.0, rel_tol: float = 0.0,
+                 text_numbers: bool = False):
+        self.abs_tol = abs_tol
+        self.rel_tol = rel_tol
+        self.text_numbers = text_numbers
+
+    def with_text_numbers(self) -> "Tolerance":
+        return Tolerance(self.abs_tol, self.rel_tol, True)
+
+    def number(self, value):
+        """El valor como numero, o None si no cuenta como numero."""
+        cls = value.__class__
+        if cls in _NUMERIC:
+            return value
+        if cls is str and self.text_numbers:
+            n = parse_number(value)
+            return None if n != n else n
+        return None
+
+    def equal(self, v1, v2) -> bool:
+        if v1 == v2:
+            return True
+        n1, n2 = self.number(v1), self.number(v2)
+        if n1 is None or n2 is None:
+            return False
+        # Con enteros la resta es exacta (importa en claves de 16+ digitos)
+        return abs(n1 - n2) <= max(self.abs_tol, self.rel_tol * max(abs(n1), abs(n2)))
+
+
+def _float_block(np, rows: list, width: int, tol: Tolerance):
+    """Bloque de filas como (float64 con NaN donde no hay numero, mascara exacta).
+
+    Se trabaja por columna: una columna solo de numeros y vacios (lo comun)
+    pasa directo a NumPy, una de puro texto se queda en NaN y solo las
+    mezcladas se convierten celda por celda. La mascara marca lo que no
+    cabe exacto en float64 (enteros de 16+ digitos): cuenta para los
+    totales, pero al comparar va por Tolerance.equal con el valor original.
+    """
+    pad = (None,) * width
+    columns = zip(*[row if len(row) == width else (*row, *pad[len(row):])
+                    for row in rows])
+    numbers = np.full((len(rows), width), _NAN)
+    for col, values in enumerate(columns):
+        kinds = set(map(type, values))
+        if kinds <= _ARRAY_SAFE:
+            if kinds & _NUMERIC:
+                numbers[:, col] = np.array(values, dtype=float)
+        elif kinds & _NUMERIC or (tol.text_numbers and str in kinds):
+            numbers[:, col] = _float_values(values, tol.text_numbers)
+    with np.errstate(invalid="ignore"):
+        exact = np.abs(numbers) >= _FLOAT_SAFE_INT
+    return numbers, exact
+
+
+def _float_values(values, text_numbers: bool) -> list[float]:
+    if text_numbers:
+        return [v if v.__class__ in _NUMERIC
+                else parse_number(v) if v.__class__ is str else _NAN
+                for v in values]
+    return [v if v.__class__ in _NUMERIC else _NAN for v in values]
+
+
+class ColumnTotals:
+    """Suma y cuenta de los valores numericos de cada columna de una hoja."""
+
+    def __init__(self, tol: Tolerance):
+        self.tol = tol
+        self._np = _get_numpy()
+        self.sums: list[float] = []
+        self.counts: list[int] = []
+
+    def _grow(self, width: int) -> None:
+        if width > len(self.sums):
+            self.sums.extend([0.0] * (width - len(self.sums)))
+            self.counts.extend([0] * (width - len(self.counts)))
+
+    def add_array(self, numbers) -> None:
+        """Suma un bloque ya convertido (arreglo de NumPy filas x columnas)."""
+        np = self._np
+        self._grow(numbers.shape[1])
+        sums = np.nansum(numbers, axis=0)
+        counts = np.count_nonzero(~np.isnan(numbers), axis=0)
+        for col in np.flatnonzero(counts):
+            self.sums[col] += float(sums[col])
+            self.counts[col] += int(counts[col])
+
+    def add_rows(self, rows: list) -> None:
+        if not rows:
+            return
+        width = max(map(len, rows))
+        if self._np is not None:
+            self.add_array(_float_block(self._np, rows, width, self.tol)[0])
+            return
+        self._grow(width)
+        sums, counts, number = self.sums, self.counts, self.tol.number
+        for row in rows:
+            for col, value in enumerate(row):
+                n = number(value)
+                if n is not None and n == n:
+                    sums[col] += n
+                    counts[col] += 1
+
+    def track(self, rows):
+        """Deja pasar las filas tal cual y las va sumando por bloques."""
+        rows = iter(rows)
+        while True:
+            block = list(islice(rows, COMPARE_BLOCK))
+            if not block:
+                return
+            self.add_rows(block)
+            yield from block
+
+
+def totals_summary(totals1: ColumnTotals, totals2: ColumnTotals) -> list[dict]:
+    """Una entrada por columna con numeros en alguno de los dos archivos."""
+    width = max(len(totals1.sums), len(totals2.sums))
+    totals1._grow(width)
+    totals2._grow(width)
+    summary = []
+    for col in range(width):
+        if not totals1.counts[col] and not totals2.counts[col]:
+            continue
+        t1, t2 = totals1.sums[col], totals2.sums[col]
+        summary.append({
+            "columna": column_letter(col + 1),
+            "total1": t1,
+            "total2": t2,
+            "diferencia": t2 - t1,
+            "cuadra": totals1.tol.equal(t1, t2),
+        })
+    return summary
+
+
+def _cell_diff(row_idx: int, col: int, v1, v2) -> dict:
+    return {
+        "celda": f"{column_letter(col + 1)}{row_idx}",
+        "v1": format_value(v1),
+        "v2": format_value(v2),
+    }
+
+
+def compare_rows_tolerant(rows1, rows2, tol: Tolerance,
+                          totals1: ColumnTotals | None = None,
+                          totals2: ColumnTotals | None = None) -> list[dict]:
+    """Como compare_rows (por posicion), pero con tolerancia numerica.
+
+    Las filas identicas se saltan sin convertir nada; solo se usan para
+    los totales.
+    """
+    np = _get_numpy()
+    pairs = zip_longest(rows1, rows2, fillvalue=())
+    diffs = []
+    first = 1
+    while True:
+        block = list(islice(pairs, COMPARE_BLOCK))
+        if not block:
+            return diffs
+        if np is not None:
+            _compare_block_numpy(np, block, first, tol, totals1, totals2, diffs)
+        else:
+            if totals1 is not None:
+                totals1.add_rows([r1 for r1, _ in block])
+                totals2.add_rows([r2 for _, r2 in block])
+            for offset, (row1, row2) in enumerate(block):
+                if row1 == row2:
+                    continue
+                for col in range(max(len(row1), len(row2))):
+                    v1 = row1[col] if col < len(row1) else None
+                    v2 = row2[col] if col < len(row2) else None
+                    if not tol.equal(v1, v2):
+                        diffs.append(_cell_diff(first + offset, col, v1, v2))
+                diffs.extend(formula_diffs(row1, row2, first + offset, first + offset))
+        first += len(block)
+
+
+def _compare_block_numpy(np, block: list, first: int, tol: Tolerance,
+                         totals1, totals2, diffs: list) -> None:
+    differ = [k for k, (row1, row2) in enumerate(block) if row1 != row2]
+    if not differ and totals1 is None:
+        return
+    if totals1 is None:
+        block = [block[k] for k in differ]
+        rows_at = differ
+        differ = range(len(block))
+    else:
+        rows_at = range(len(block))
+
+    rows1 = [r1 for r1, _ in block]
+    rows2 = [r2 for _, r2 in block]
+    width = max(max(map(len, rows1)), max(map(len, rows2))) or 1
+    n1, exact1 = _float_block(np, rows1, width, tol)
+    n2, exact2 = _float_block(np, rows2, width, tol)
+    if totals1 is not None:
+        totals1.add_array(n1)
+        totals2.add_array(n2)
+    if not differ:
+        return
+
+    idx = np.asarray(differ)
+    a, b = n1[idx], n2[idx]
+    both = ~np.isnan(a) & ~np.isnan(b) & ~exact1[idx] & ~exact2[idx]
+    with np.errstate(invalid="ignore"):
+        limit = np.maximum(tol.abs_tol, tol.rel_tol * np.maximum(np.abs(a), np.abs(b)))
+        close = (np.abs(a - b) <= limit) | (a == b)
+    numeric_bad = both & ~close
+
+    for pos, k in enumerate(differ):
+        row1, row2 = block[k]
+        row_idx = first + rows_at[k]
+        bad = set(np.flatnonzero(numeric_bad[pos]).tolist())
+        # Las celdas que no son numero en los dos lados se comparan como valores
+        for col in np.flatnonzero(~both[pos]).tolist():
+            v1 = row1[col] if col < len(row1) else None
+            v2 = row2[col] if col < len(row2) else None
+            if v1 != v2 and not tol.equal(v1, v2):
+                bad.add(col)
+        for col in sorted(bad):
+            v1 = row1[col] if col < len(row1) else None
+            v2 = row2[col] if col < len(row2) else None
+            diffs.append(_cell_diff(row_idx, col, v1, v2))
+        diffs.extend(formula_diffs(row1, row2, row_idx, row_idx))
@@ -0,0 +1,383 @@
+"""Cache en disco de hojas .xlsx/.xlsm ya leidas.
+
+Limpiar, comparar y consolidar vuelven a abrir los mismos libros grandes
+y casi todo el tiempo se va en parsear el XML. La primera lectura de cada
+hoja (con tools._xlsx_stream) se guarda en WORKBOOK_CACHE_DIR en bloques
+de CACHE_BLOCK filas, cada uno en pickle comprimido con zlib; la siguiente
+operacion sobre el mismo archivo lee esos bloques sin abrir el .xlsx.
+
+Un libro se reconoce por ruta, tamano, mtime y el SHA-256 del primer y el
+ultimo bloque de READ_CHUNK (el directorio del zip esta al final: una
+copia que conserva el mtime pero no el contenido casi siempre lo cambia).
+Las entradas de una version anterior del mismo archivo se borran al
+registrar la nueva.
+
+El indice (SQLite) guarda el tamano y el ultimo uso de cada hoja; al pasar
+de WORKBOOK_CACHE_BYTES se borran las usadas hace mas tiempo. Si la cache
+no se puede usar (carpeta sin permisos, disco lleno, bloque danado) se lee
+el original.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from itertools import islice
+
+from config import WORKBOOK_CACHE_BYTES, WORKBOOK_CACHE_DIR
+from tools._xlsx_package import READ_CHUNK
+from tools._xlsx_stream import XlsxCellReader
+
+
+# Filas por bloque comprimido
+CACHE_BLOCK = 4096
+
+_INDEX_NAME = "indice.sqlite"
+_SHEET_SUFFIX = ".hoja"
+_LENGTH = struct.Struct("<I")
+
+# Lo que puede lanzar un bloque danado al leerlo
+_CORRUPT_ERRORS = (zlib.error, pickle.UnpicklingError, EOFError, struct.error)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS libros (
+    clave TEXT PRIMARY KEY,
+    ruta TEXT NOT NULL,
+    hojas TEXT NOT NULL,
+    estilos BLOB,
+    usado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hojas (
+    clave TEXT NOT NULL,
+    hoja TEXT NOT NULL,
+    archivo TEXT NOT NULL,
+    con_estilos INTEGER NOT NULL,
+    anchos TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    usado REAL NOT NULL,
+    PRIMARY KEY (clave, hoja)
+);
+CREATE INDEX IF NOT EXISTS hojas_usado ON hojas (usado);
+"""
+
+
+def workbook_key(path: str) -> tuple[str, str]:
+    """(ruta absoluta, clave del contenido actual del archivo).
+
+    Raises:
+        OSError: Si no se puede leer el archivo.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    digest = hashlib.sha256(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"))
+    with open(path, "rb") as f:
+        digest.update(f.read(READ_CHUNK))
+        if st.st_size > READ_CHUNK:
+            f.seek(max(READ_CHUNK, st.st_size - READ_CHUNK))
+            digest.update(f.read(READ_CHUNK))
+    return path, digest.hexdigest()
+
+
+def _open_index(cache_dir: str) -> sqlite3.Connection:
+    os.makedirs(cache_dir, exist_ok=True)
+    # Varios procesos del comparador pueden usar la cache a la vez
+    conn = sqlite3.connect(os.path.join(cache_dir, _INDEX_NAME), timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _pack(obj) -> bytes:
+    return zlib.compress(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), 1)
+
+
+def _unpack(data: bytes):
+    return pickle.loads(zlib.decompress(data))
+
+
+def _write_block(f, rows: list) -> int:
+    data = _pack(rows)
+    f.write(_LENGTH.pack(len(data)))
+    f.write(data)
+    return _LENGTH.size + len(data)
+
+
+def _read_blocks(f):
+    while True:
+        head = f.read(_LENGTH.size)
+        if not head:
+            return
+        (size,) = _LENGTH.unpack(head)
+        yield from _unpack(f.read(size))
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        # En Windows no se puede borrar si otro proceso lo esta leyendo
+        return False
+    return True
+
+
+class CachedWorkbook:
+    """Libro .xlsx/.xlsm leido desde la cache; lo que falta se lee del original.
+
+    Misma interfaz que XlsxCellReader (sheetnames, rows, column_widths,
+    cell_styles, close). El original solo se abre si alguna hoja pedida no
+    esta en la cache, y esa hoja se guarda mientras se lee.
+
+    Raises:
+        Alguno de tools._xlsx_package.PACKAGE_ERRORS si hay que leer el
+        original y no es un paquete legible.
+    """
+
+    def __init__(self, path: str, cache_dir: str = WORKBOOK_CACHE_DIR,
+                 max_bytes: int = WORKBOOK_CACHE_BYTES):
+        self.path = path
+        self._dir = cache_dir
+        self._max_bytes = max_bytes
+        self._reader = None
+        self._widths: dict[str, dict] = {}
+        self._conn = None
+        row = None
+        try:
+            self._ruta, self._key = workbook_key(path)
+            self._conn = _open_index(cache_dir)
+            row = self._conn.execute(
+                "SELECT hojas FROM libros WHERE clave = ?", (self._key,)
+            ).fetchone()
+        except (OSError, sqlite3.Error):
+            self._drop_index()
+        if row is not None:
+            self.sheetnames = json.loads(row[0])
+            self._touch("UPDATE libros SET usado = ? WHERE clave = ?", (self._key,))
+        else:
+            self.sheetnames = self._source().sheetnames
+            self._register()
+
+    def _source(self) -> XlsxCellReader:
+        if self._reader is None:
+            self._reader = XlsxCellReader(self.path)
+        return self._reader
+
+    def _drop_index(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _touch(self, sql: str, params: tuple) -> None:
+        try:
+            self._conn.execute(sql, (time.time(), *params))
+            self._conn.commit()
+        except sqlite3.Error:
+            self._drop_index()
+
+    def _register(self) -> None:
+        """Alta del libro; borra lo guardado de versiones anteriores del archivo."""
+        if self._conn is None:
+            return
+        conn = self._conn
+        try:
+            stale = conn.execute(
+                "SELECT h.archivo FROM hojas h JOIN libros l ON h.clave = l.clave "
+                "WHERE l.ruta = ? AND l.clave != ?", (self._ruta, self._key)
+            ).fetchall()
+            for (archivo,) in stale:
+                _remove(os.path.join(self._dir, archivo))
+            conn.execute(
+                "DELETE FROM hojas WHERE clave IN "
+                "(SELECT clave FROM libros WHERE ruta = ? AND clave != ?)",
+                (self._ruta, self._key),
+            )
+            conn.execute("DELETE FROM libros WHERE ruta = ?", (self._ruta,))
+            conn.execute(
+                "INSERT INTO libros (clave, ruta, hojas, usado) VALUES (?, ?, ?, ?)",
+                (self._key, self._ruta, json.dumps(self.sheetnames), time.time()),
+            )
+            conn.commit()
+        except sqlite3.Error:
+            self._drop_index()
+
+    def rows(self, name: str, styles: bool = False):
+        """Genera (valores, formulas[, estilos]) por fila, como XlsxCellReader.rows."""
+        cached = self._open_cached(name, styles)
+        if cached is None:
+            yield from self._fill(name, styles)
+            return
+        done = 0
+        try:
+            with cached as f:
+                for row in _read_blocks(f):
+                    yield row if styles else row[:2]
+                    done += 1
+            return
+        except _CORRUPT_ERRORS:
+            self._discard(name)
+        # Cada bloque se descomprime entero antes de entregar sus filas: lo
+        # que falta sale del original, saltando las filas ya entregadas
+        yield from islice(self._fill(name, styles), done, None)
+
+    def _discard(self, name: str) -> None:
+        """Borra la hoja de la cache (archivo e indice)."""
+        if self._conn is None:
+            return
+        try:
+            row = self._conn.execute(
+                "SELECT archivo FROM hojas WHERE clave = ? AND hoja = ?", (self._key, name)
+            ).fetchone()
+            if row is not None:
+                _remove(os.path.join(self._dir, row[0]))
+            self._conn.execute(
+                "DELETE FROM hojas WHERE clave = ? AND hoja = ?", (self._key, name)
+            )
+            self._conn.commit()
+        except sqlite3.Error:
+            self._drop_index()
+
+    def _open_cached(self, name: str, styles: bool):
+        """Archivo de la hoja en la cache, o None si no esta (o le faltan estilos)."""
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT archivo, con_estilos, anchos, bytes FROM hojas "
+                "WHERE clave = ? AND hoja = ?", (self._key, name)
+            ).fetchone()
+        except sqlite3.Error:
+            self._drop_index()
+            return None
+        if row is None or (styles and not row[1]):
+            return None
+        archivo, _, anchos, size = row
+        try:
+            f = open(os.path.join(self._dir, archivo), "rb")
+        except OSError:
+            return None
+        # Un archivo truncado (corte de luz, antivirus) se vuelve a generar
+        if os.fstat(f.fileno()).st_size != size:
+            f.close()
+            return None
+        self._widths[name] = json.loads(anchos)
+        self._touch("UPDATE hojas SET usado = ? WHERE clave = ? AND hoja = ?",
+                    (self._key, name))
+        return f
+
+    def _fill(self, name: str, styles: bool):
+        """Lee la hoja del original y la va guardando en un temporal."""
+        reader = self._source()
+        rows = reader.rows(name, styles)
+        f = tmp = None
+        if self._conn is not None:
+            try:
+                fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self._dir)
+                f = os.fdopen(fd, "wb")
+            except OSError:
+                tmp = None
+        size = 0
+        complete = False
+        try:
+            while True:
+                block = list(islice(rows, CACHE_BLOCK))
+                if not block:
+                    complete = True
+                    break
+                if f is not None:
+                    try:
+                        size += _write_block(f, block)
+                    except OSError:
+                        size = self._max_bytes + 1
+                    if size > self._max_bytes:
+                        # Hoja mas grande que toda la cache: solo se lee
+                        f.close()
+                        f = None
+                yield from block
+        finally:
+            self._widths[name] = reader.column_widths(name)
+            if f is not None:
+                f.close()
+                # Solo si se leyo completa (el que consume puede parar antes)
+                if complete:
+                    self._store(name, styles, tmp, size)
+                    tmp = None
+            if tmp is not None:
+                _remove(tmp)
+
+    def _store(self, name: str, styles: bool, tmp: str, size: int) -> None:
+        archivo = hashlib.sha256(f"{self._key}|{name}".encode("utf-8")).hexdigest()
+        archivo += _SHEET_SUFFIX
+        try:
+            os.replace(tmp, os.path.join(self._dir, archivo))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hojas "
+                "(clave, hoja, archivo, con_estilos, anchos, bytes, usado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key, name, archivo, int(styles),
+                 json.dumps(self._widths[name]), size, time.time()),
+            )
+            self._conn.commit()
+            self._evict()
+        except OSError:
+            _remove(tmp)
+        except sqlite3.Error:
+            self._drop_index()
+
+    def _evict(self) -> None:
+        """Borra las hojas usadas hace mas tiempo hasta quedar en el limite."""
+        conn = self._conn
+        (total,) = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM hojas").fetchone()
+        if total <= self._max_bytes:
+            return
+        oldest = conn.execute(
+            "SELECT clave, hoja, archivo, bytes FROM hojas ORDER BY usado"
+        ).fetchall()
+        for clave, hoja, archivo, size in oldest:
+            if total <= self._max_bytes:
+                break
+            if not _remove(os.path.join(self._dir, archivo)):
+                continue
+            conn.execute("DELETE FROM hojas WHERE clave = ? AND hoja = ?", (clave, hoja))
+            total -= size
+        conn.execute(
+            "DELETE FROM libros WHERE clave != ? AND clave NOT IN (SELECT clave FROM hojas)",
+            (self._key,),
+        )
+        conn.commit()
+
+    def column_widths(self, name: str) -> dict[str, float]:
+        """Anchos de columna de la hoja (ya leida con rows) por letra."""
+        return self._widths.get(name, {})
+
+    def cell_styles(self) -> list[dict]:
+        """Estilos por indice, como XlsxCellReader.cell_styles (tambien en cache)."""
+        if self._conn is not None:
+            try:
+                row = self._conn.execute(
+                    "SELECT estilos FROM libros WHERE clave = ?", (self._key,)
+                ).fetchone()
+            except sqlite3.Error:
+                self._drop_index()
+                row = None
+            if row is not None and row[0] is not None:
+                return _unpack(row[0])
+        styles = self._source().cell_styles()
+        if self._conn is not None:
+            try:
+                self._conn.execute("UPDATE libros SET estilos = ? WHERE clave = ?",
+                                   (_pack(styles), self._key))
+                self._conn.commit()
+            except sqlite3.Error:
+                self._drop_index()
+        return styles
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._drop_index()
@@ -0,0 +1,187 @@
+"""Lectura directa del paquete ZIP de un .xlsx, sin openpyxl.
+
+Sirve para saber que hojas cambiaron entre dos versiones sin parsear
+celdas. Cada hoja es una parte XML (xl/worksheets/sheetN.xml) y su huella
+es el SHA-256 de esos bytes mas el de los textos de sharedStrings que
+referencia (celdas t="s"), asi dos hojas con la misma huella tienen los
+mismos valores y formulas aunque el resto del libro haya cambiado.
+
+El directorio central del ZIP ya trae CRC-32 y tamano de cada parte: si
+no coinciden, la hoja cambio y no hace falta ni descomprimirla.
+"""
+
+import hashlib
+import posixpath
+import re
+import zipfile
+import zlib
+from xml.etree.ElementTree import ParseError
+from xml.parsers.expat import ExpatError
+from xml.sax.saxutils import unescape
+
+
+READ_CHUNK = 1024 * 1024
+
+XLSX_PACKAGE_EXTENSIONS = {".xlsx", ".xlsm"}
+
+_REL_OFFICE_DOCUMENT = "/officeDocument"
+_REL_WORKSHEET = "/worksheet"
+_REL_SHARED_STRINGS = "/sharedStrings"
+
+# Celda de texto compartido: <c r="B2" t="s" s="1"><v>17</v></c>
+_SST_REF = re.compile(rb"""<c\b[^>]*?\bt=["']s["'][^>]*>\s*<v>(\d+)</v>""")
+_SST_ITEM = re.compile(rb"<si\b[^>]*/>|<si\b.*?</si>", re.S)
+
+# Errores de un paquete que no se puede leer (se cae a la comparacion normal);
+# incluye XML de una parte truncado o mal formado
+PACKAGE_ERRORS = (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile, zlib.error,
+                  ExpatError, ParseError)
+
+
+def _attrs(tag: bytes) -> dict[str, str]:
+    return {
+        key.decode(): unescape(value.decode("utf-8", "replace"), {"&quot;": '"', "&apos;": "'"})
+        for key, value in re.findall(rb'([\w:]+)="([^"]*)"', tag)
+    }
+
+
+def relationships(zf: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    """Id -> (tipo, ruta de la parte destino) de las relaciones internas de `part`."""
+    folder, name = posixpath.split(part)
+    rels_name = posixpath.join(folder, "_rels", name + ".rels")
+    try:
+        data = zf.read(rels_name)
+    except KeyError:
+        return {}
+    rels = {}
+    for tag in re.findall(rb"<Relationship\b[^>]*>", data):
+        attrs = _attrs(tag)
+        if attrs.get("TargetMode") == "External" or "Id" not in attrs:
+            continue
+        target = attrs.get("Target", "")
+        path = (target[1:] if target.startswith("/")
+                else posixpath.normpath(posixpath.join(folder, target)))
+        rels[attrs["Id"]] = (attrs.get("Type", ""), path)
+    return rels
+
+
+def workbook_part(zf: zipfile.ZipFile) -> str:
+    for rel_type, path in relationships(zf, "").values():
+        if rel_type.endswith(_REL_OFFICE_DOCUMENT):
+            return path
+    return "xl/workbook.xml"
+
+
+def sheet_parts(zf: zipfile.ZipFile) -> tuple[dict[str, str], str | None]:
+    """({nombre de hoja: parte}, parte de sharedStrings o None), en orden del libro."""
+    workbook = workbook_part(zf)
+    rels = relationships(zf, workbook)
+    sheets = {}
+    for tag in re.findall(rb"<sheet\b[^>]*>", zf.read(workbook)):
+        attrs = _attrs(tag)
+        rid = next((v for k, v in attrs.items() if k.endswith(":id")), "")
+        rel = rels.get(rid)
+        if rel and rel[0].endswith(_REL_WORKSHEET) and "name" in attrs:
+            sheets[attrs["name"]] = rel[1]
+    shared = next((path for rel_type, path in rels.values()
+                   if rel_type.endswith(_REL_SHARED_STRINGS)), None)
+    if shared is not None and shared not in zf.NameToInfo:
+        shared = None
+    return sheets, shared
+
+
+def _shared_string_items(zf: zipfile.ZipFile, part: str | None) -> list[bytes]:
+    """XML crudo de cada <si>; comparar los bytes basta para saber si un texto cambio."""
+    if part is None:
+        return []
+    return _SST_ITEM.findall(zf.read(part))
+
+
+def _hash_sheet(zf: zipfile.ZipFile, part: str, strings: list[bytes] | None) -> str:
+    """SHA-256 del XML de la hoja y, si se pasan `strings`, de los textos que usa."""
+    digest = hashlib.sha256()
+    refs = hashlib.sha256()
+    tail = b""
+
+    def scan(block: bytes) -> None:
+        for m in _SST_REF.finditer(block):
+            idx = int(m.group(1))
+            refs.update(strings[idx] if idx < len(strings) else b"?")
+            refs.update(b"\0")
+
+    with zf.open(part) as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            if strings is None:
+                continue
+            # Solo se escanea hasta la ultima celda cerrada; el resto espera al siguiente bloque
+            block = tail + chunk
+            cut = block.rfind(b"</c>")
+            if cut < 0:
+                tail = block
+                continue
+            cut += len(b"</c>")
+            scan(block[:cut])
+            tail = block[cut:]
+    if strings is not None:
+        scan(tail)
+        digest.update(refs.digest())
+    return digest.hexdigest()
+
+
+def sheet_fingerprints(path: str) -> dict[str, str]:
+    """Huella por hoja: {nombre: sha256 del XML + textos compartidos referenciados}.
+
+    Raises:
+        Alguno de PACKAGE_ERRORS si el archivo no es un paquete legible.
+    """
+    with zipfile.ZipFile(path) as zf:
+        sheets, shared = sheet_parts(zf)
+        strings = _shared_string_items(zf, shared)
+        return {name: _hash_sheet(zf, part, strings) for name, part in sheets.items()}
+
+
+def _same_header(a: zipfile.ZipInfo, b: zipfile.ZipInfo) -> bool:
+    return a.CRC == b.CRC and a.file_size == b.file_size
+
+
+def identical_sheets(path1: str, path2: str) -> set[str]:
+    """Nombres de las hojas que son identicas byte a byte en ambos libros.
+
+    Primero filtra por CRC y tamano del directorio central; solo las
+    candidatas se descomprimen y se les saca SHA-256. Si sharedStrings es
+    igual en los dos, basta con comparar el XML de la hoja; si no, tambien
+    se comparan los textos a los que apunta cada celda. Ante cualquier
+    problema con el paquete devuelve un conjunto vacio (se compara todo).
+    """
+    try:
+        with zipfile.ZipFile(path1) as z1, zipfile.ZipFile(path2) as z2:
+            sheets1, shared1 = sheet_parts(z1)
+            sheets2, shared2 = sheet_parts(z2)
+            candidates = [
+                name for name, part in sheets1.items()
+                if name in sheets2 and _same_header(z1.getinfo(part), z2.getinfo(sheets2[name]))
+            ]
+            if not candidates:
+                return set()
+
+            if shared1 is None and shared2 is None:
+                strings1 = strings2 = None
+            elif (shared1 and shared2
+                  and _same_header(z1.getinfo(shared1), z2.getinfo(shared2))
+                  and _hash_sheet(z1, shared1, None) == _hash_sheet(z2, shared2, None)):
+                strings1 = strings2 = None
+            else:
+                strings1 = _shared_string_items(z1, shared1)
+                strings2 = _shared_string_items(z2, shared2)
+
+            return {
+                name for name in candidates
+                if _hash_sheet(z1, sheets1[name], strings1)
+                == _hash_sheet(z2, sheets2[name], strings2)
+            }
+    except PACKAGE_ERRORS:
+        return set()
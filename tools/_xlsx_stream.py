@@ -0,0 +1,320 @@
+"""Lector en streaming de hojas .xlsx que entrega valor y formula de cada celda.
+
+openpyxl solo da una de las dos vistas por carga: con data_only=True el
+valor en cache (<v>) y sin el la formula (<f>). Para comparar las dos
+habria que abrir cada libro dos veces. Aqui el XML de la hoja se pasa por
+expat una sola vez, sin armar arbol ni objetos celda, y por cada fila
+salen dos tuplas: valores y formulas.
+
+Los valores se convierten igual que openpyxl (texto compartido, numeros,
+booleanos, fechas segun el formato de la celda) para que el resultado se
+pueda comparar con el de los otros lectores. A pedido, cada fila trae
+tambien el indice de estilo de sus celdas y la hoja sus anchos de columna.
+"""
+
+import re
+import zipfile
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+from tools._xlsx_package import READ_CHUNK, relationships, sheet_parts, workbook_part
+
+
+_REL_STYLES = "/styles"
+
+_DATE1904 = re.compile(rb"""<(?:\w+:)?workbookPr\b[^>]*\bdate1904=["'](?:1|true)["']""")
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _shared_strings(zf: zipfile.ZipFile, part: str | None) -> list[str]:
+    """Texto de cada <si> (runs concatenados, sin la guia fonetica <rPh>)."""
+    if part is None:
+        return []
+    strings = []
+    with zf.open(part) as f:
+        for _, elem in ElementTree.iterparse(f):
+            if _local(elem.tag) != "si":
+                continue
+            parts = []
+            for child in elem:
+                name = _local(child.tag)
+                if name == "t":
+                    parts.append(child.text or "")
+                elif name == "r":
+                    parts.extend(t.text or "" for t in child if _local(t.tag) == "t")
+            strings.append("".join(parts))
+            elem.clear()
+    return strings
+
+
+def _styles_part(zf: zipfile.ZipFile, workbook: str) -> str | None:
+    part = next((path for rel_type, path in relationships(zf, workbook).values()
+                 if rel_type.endswith(_REL_STYLES)), None)
+    return part if part is not None and part in zf.NameToInfo else None
+
+
+def _date_styles(zf: zipfile.ZipFile, part: str | None) -> set[int]:
+    """Indices de estilo de celda (atributo s) cuyo formato de numero es fecha."""
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+    if part is None:
+        return set()
+    root = ElementTree.fromstring(zf.read(part))
+    formats = dict(BUILTIN_FORMATS)
+    dates = set()
+    for child in root:
+        name = _local(child.tag)
+        if name == "numFmts":
+            for fmt in child:
+                if fmt.get("numFmtId", "").isdigit():
+                    formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode", "")
+        elif name == "cellXfs":
+            for idx, xf in enumerate(child):
+                fmt_id = xf.get("numFmtId", "0")
+                if fmt_id.isdigit() and is_date_format(formats.get(int(fmt_id), "")):
+                    dates.add(idx)
+    return dates
+
+
+def _epoch(zf: zipfile.ZipFile, workbook: str):
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+    head = zf.read(workbook)[:READ_CHUNK]
+    return CALENDAR_MAC_1904 if _DATE1904.search(head) else CALENDAR_WINDOWS_1900
+
+
+# Letras de columna -> indice, ya calculados (se pide por cada celda)
+_COLUMN_INDEX: dict[str, int] = {}
+
+
+def _column_index(ref: str) -> int:
+    """Columna (base 1) de una referencia "AB12", cacheada por letras."""
+    letters = ref.rstrip("0123456789")
+    col = _COLUMN_INDEX.get(letters)
+    if col is None:
+        col = 0
+        for ch in letters:
+            col = col * 26 + ord(ch) - 64
+        _COLUMN_INDEX[letters] = col
+    return col
+
+
+def _trimmed(cells: list) -> tuple:
+    """Tupla sin los None del final (la mayoria de las filas quedan en ())."""
+    end = len(cells)
+    while end and cells[end - 1] is None:
+        end -= 1
+    return tuple(cells[:end])
+
+
+class _SheetParser:
+    """Estado de expat para una hoja: arma filas (valores, formulas[, estilos])."""
+
+    def __init__(self, strings: list[str], date_styles: set[int], epoch,
+                 with_styles: bool = False):
+        from openpyxl.utils.cell import get_column_letter
+        from openpyxl.utils.datetime import from_ISO8601, from_excel
+
+        self._strings = strings
+        self._date_styles = date_styles
+        self._epoch = epoch
+        self._from_excel = from_excel
+        self._from_iso = from_ISO8601
+        self._letter = get_column_letter
+        self.rows: list[tuple] = []
+        self.widths: dict[str, float] = {}
+        self._with_styles = with_styles
+        self._next_row = 1
+        self._values: list = []
+        self._formulas: list = []
+        self._styles: list = []
+        self._shared: dict = {}  # si -> Translator de la formula compartida
+        self._text: list[str] | None = None
+        self._cell = None
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self._start
+        parser.EndElementHandler = self._end
+        parser.CharacterDataHandler = self._data
+        self.parser = parser
+
+    def _start(self, name: str, attrs: dict) -> None:
+        if ":" in name:
+            name = name.rpartition(":")[2]
+        if name == "c":
+            ref = attrs.get("r")
+            col = _column_index(ref) if ref else len(self._values) + 1
+            self._cell = [col, ref, attrs.get("t", "n"), attrs.get("s"), None, None, None]
+        elif name == "v" or name == "t":
+            self._text = []
+        elif name == "f" and self._cell is not None:
+            self._text = []
+            self._cell[6] = attrs
+        elif name == "row":
+            num = attrs.get("r")
+            num = int(num) if num else self._next_row
+            # Filas que no vienen en el XML son filas vacias (igual que openpyxl)
+            empty = ((), (), ()) if self._with_styles else ((), ())
+            while self._next_row < num:
+                self.rows.append(empty)
+                self._next_row += 1
+            self._values = []
+            self._formulas = []
+            self._styles = []
+        elif name == "col":
+            # Ancho por grupo de columnas, con la letra de la primera (como openpyxl)
+            first, width = attrs.get("min", ""), attrs.get("width")
+            if first.isdigit() and width:
+                self.widths[self._letter(int(first))] = float(width)
+
+    def _data(self, data: str) -> None:
+        if self._text is not None:
+            self._text.append(data)
+
+    def _end(self, name: str) -> None:
+        if ":" in name:
+            name = name.rpartition(":")[2]
+        cell = self._cell
+        if name == "v":
+            if cell is not None:
+                cell[4] = "".join(self._text)
+            self._text = None
+        elif name == "t":
+            # Texto de <is> en celdas inlineStr
+            if cell is not None:
+                cell[4] = (cell[4] or "") + "".join(self._text)
+            self._text = None
+        elif name == "f":
+            if cell is not None:
+                cell[5] = self._formula("".join(self._text), cell)
+            self._text = None
+        elif name == "c":
+            self._store(cell)
+            self._cell = None
+        elif name == "row":
+            row = (tuple(self._values), _trimmed(self._formulas))
+            if self._with_styles:
+                row += (_trimmed(self._styles),)
+            self.rows.append(row)
+            self._next_row += 1
+
+    def _formula(self, text: str, cell: list) -> str | None:
+        attrs = cell[6]
+        if attrs.get("t") != "shared" or "si" not in attrs:
+            return "=" + text if text else None
+        ref = cell[1] or f"{self._letter(cell[0])}{self._next_row}"
+        si = attrs["si"]
+        if text:
+            from openpyxl.formula.translate import Translator
+            self._shared[si] = Translator("=" + text, origin=ref)
+            return "=" + text
+        translator = self._shared.get(si)
+        return translator.translate_formula(ref) if translator else None
+
+    def _store(self, cell: list) -> None:
+        col, _, kind, style, raw, formula, _ = cell
+        if not raw:
+            # Sin <v> o vacio (formula nunca calculada): celda vacia
+            value = None
+        elif kind == "n":
+            value = float(raw) if ("." in raw or "E" in raw or "e" in raw) else int(raw)
+            if style is not None and int(style) in self._date_styles:
+                value = self._from_excel(value, self._epoch)
+        elif kind == "s":
+            value = self._strings[int(raw)]
+        elif kind == "b":
+            value = raw == "1" or raw == "true"
+        elif kind == "d":
+            value = self._from_iso(raw)
+        else:
+            # str (resultado de formula), inlineStr y e (#N/A, #DIV/0!...)
+            value = raw
+
+        values = self._values
+        if col > len(values):
+            values.extend([None] * (col - len(values)))
+            self._formulas.extend([None] * (col - len(self._formulas)))
+            self._styles.extend([None] * (col - len(self._styles)))
+        values[col - 1] = value
+        self._formulas[col - 1] = formula
+        if style is not None and style != "0":
+            self._styles[col - 1] = int(style)
+
+
+class XlsxCellReader:
+    """Libro .xlsx/.xlsm abierto para leer sus hojas con valor y formula.
+
+    Raises:
+        Alguno de tools._xlsx_package.PACKAGE_ERRORS si no es un paquete legible.
+    """
+
+    def __init__(self, path: str):
+        self._zf = zipfile.ZipFile(path)
+        try:
+            self._sheets, shared = sheet_parts(self._zf)
+            workbook = workbook_part(self._zf)
+            self._strings = _shared_strings(self._zf, shared)
+            self._styles_part = _styles_part(self._zf, workbook)
+            self._date_styles = _date_styles(self._zf, self._styles_part)
+            self._epoch = _epoch(self._zf, workbook)
+        except Exception:
+            self._zf.close()
+            raise
+        self.sheetnames = list(self._sheets)
+        self._widths: dict[str, dict] = {}
+
+    def rows(self, name: str, styles: bool = False):
+        """Genera (valores, formulas) por fila; formulas con "=" o None.
+
+        Con `styles` cada fila trae ademas el indice de estilo de cada celda
+        (None si no tiene), que se resuelve con cell_styles().
+        """
+        parser = _SheetParser(self._strings, self._date_styles, self._epoch, styles)
+        self._widths[name] = parser.widths
+        with self._zf.open(self._sheets[name]) as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                parser.parser.Parse(chunk, not chunk)
+                if parser.rows:
+                    yield from parser.rows
+                    parser.rows.clear()
+                if not chunk:
+                    break
+
+    def column_widths(self, name: str) -> dict[str, float]:
+        """Anchos de columna de la hoja (ya leida con rows) por letra."""
+        return self._widths.get(name, {})
+
+    def cell_styles(self) -> list[dict]:
+        """Por indice de estilo: font, fill, number_format y alignment.
+
+        Usa el lector de estilos de openpyxl; los objetos se pueden copiar
+        tal cual a celdas de otro libro.
+        """
+        from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_MAX_SIZE
+        from openpyxl.styles.stylesheet import Stylesheet
+
+        if self._styles_part is None:
+            return []
+        sheet = Stylesheet.from_tree(ElementTree.fromstring(self._zf.read(self._styles_part)))
+        styles = []
+        for xf in sheet.cell_styles:
+            fmt = xf.numFmtId
+            if fmt < BUILTIN_FORMATS_MAX_SIZE:
+                number_format = BUILTIN_FORMATS.get(fmt, "General")
+            else:
+                number_format = sheet.number_formats[fmt - BUILTIN_FORMATS_MAX_SIZE]
+            styles.append({
+                "font": sheet.fonts[xf.fontId],
+                "fill": sheet.fills[xf.fillId],
+                "number_format": number_format,
+                "alignment": sheet.alignments[xf.alignmentId],
+            })
+        return styles
+
+    def close(self) -> None:
+        self._zf.close()
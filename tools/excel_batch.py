@@ -0,0 +1,478 @@
+"""Comparacion de carpetas de Excel: todos los libros de un mes contra el anterior.
+
+Los archivos se emparejan por nombre o por un patron con comodines
+("Sucursal_*_sep.xlsx" contra "Sucursal_*_oct.xlsx": lo que cubre el *
+es la clave) y cada pareja se compara con compare_files en un pool de
+procesos.
+
+En COMPARE_CACHE_PATH (SQLite) se guardan dos cosas:
+- La huella de cada hoja (ver tools._xlsx_package) por (ruta, tamano,
+  mtime): un archivo que no cambio no se vuelve a leer.
+- El resumen de cada pareja ya comparada, por huellas y opciones: si
+  ninguno de los dos archivos cambio, la siguiente corrida reutiliza el
+  resumen sin abrirlos.
+
+Dos archivos con las mismas huellas se dan por identicos sin comparar
+celdas. Al final se escribe un libro resumen con una fila por pareja y
+otra por hoja con cambios.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from rich.prompt import Prompt
+from rich.table import Table
+
+from config import BATCH_COMPARE_WORKERS, COMPARE_CACHE_PATH, EXCEL_EXTENSIONS
+from tools._xlsx_package import (
+    PACKAGE_ERRORS, READ_CHUNK, XLSX_PACKAGE_EXTENSIONS, sheet_fingerprints,
+)
+from tools.excel_comparator import ask_compare_options, compare_files
+from utils import get_openpyxl as _get_openpyxl, console
+
+
+# Tipos de diferencia que se cuentan por separado en el resumen
+DIFF_KINDS = ["modificada", "agregada", "eliminada", "movida", "formula"]
+
+STATUS_IDENTICAL = "Identico"
+STATUS_NO_DIFFS = "Sin diferencias"
+STATUS_CHANGED = "Con diferencias"
+STATUS_ERROR = "Error"
+STATUS_ONLY1 = "Solo en carpeta 1"
+STATUS_ONLY2 = "Solo en carpeta 2"
+
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS huellas (
+    ruta TEXT PRIMARY KEY,
+    tamano INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    hojas TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resumenes (
+    clave TEXT PRIMARY KEY,
+    resumen TEXT NOT NULL,
+    usado REAL NOT NULL
+);
+"""
+
+
+# ─── Emparejar archivos ───────────────────────────────────────────
+
+
+def list_workbooks(folder: str) -> list[str]:
+    """Rutas relativas de los libros (EXCEL_EXTENSIONS) bajo `folder`, ordenadas."""
+    found = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in files:
+            # ~$Libro.xlsx es el archivo de bloqueo de Excel, no un libro
+            if name.startswith("~$"):
+                continue
+            if os.path.splitext(name)[1].lower() in EXCEL_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(root, name), folder))
+    return sorted(found, key=str.casefold)
+
+
+def compile_pattern(pattern: str) -> re.Pattern:
+    """Patron de nombre con * y ? a regex; cada comodin es un grupo de la clave."""
+    parts = []
+    for ch in pattern:
+        if ch == "*":
+            parts.append("(.*)")
+        elif ch == "?":
+            parts.append("(.)")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.IGNORECASE)
+
+
+def _keyed(names: list[str], pattern: re.Pattern | None) -> tuple[dict, list[str]]:
+    """{clave: nombre} y los nombres con clave repetida.
+
+    Los que no cumplen el patron se emparejan por nombre.
+    """
+    keyed, rest = {}, []
+    for name in names:
+        m = pattern.fullmatch(os.path.basename(name)) if pattern is not None else None
+        if m is None:
+            key = name.casefold()
+        else:
+            key = (os.path.dirname(name).casefold(),
+                   *(group.casefold() for group in m.groups()))
+        if key in keyed:
+            rest.append(name)
+        else:
+            keyed[key] = name
+    return keyed, rest
+
+
+def pair_workbooks(folder1: str, folder2: str, pattern1: str = "",
+                   pattern2: str = "") -> tuple[list[tuple[str, str]], list[str], list[str]]:
+    """Empareja los libros de dos carpetas.
+
+    Por ruta relativa (sin distinguir mayusculas) o, para los nombres que
+    cumplen los patrones, por lo que cubren sus comodines: "ventas_*.xlsx"
+    y "ventas_*_v2.xlsx" emparejan ventas_norte.xlsx con ventas_norte_v2.xlsx.
+
+    Returns:
+        (parejas de rutas relativas, solo en carpeta 1, solo en carpeta 2)
+    """
+    regex1 = compile_pattern(pattern1) if pattern1 else None
+    regex2 = compile_pattern(pattern2 or pattern1) if pattern1 else None
+    keyed1, rest1 = _keyed(list_workbooks(folder1), regex1)
+    keyed2, rest2 = _keyed(list_workbooks(folder2), regex2)
+    pairs = [(name, keyed2[key]) for key, name in keyed1.items() if key in keyed2]
+    only1 = rest1 + [name for key, name in keyed1.items() if key not in keyed2]
+    only2 = rest2 + [name for key, name in keyed2.items() if key not in keyed1]
+    return pairs, sorted(only1, key=str.casefold), sorted(only2, key=str.casefold)
+
+
+# ─── Huellas y cache ──────────────────────────────────────────────
+
+
+def file_fingerprints(path: str) -> dict[str, str]:
+    """Huella por hoja de un .xlsx/.xlsm; de otros formatos, una del archivo ("")."""
+    if os.path.splitext(path)[1].lower() in XLSX_PACKAGE_EXTENSIONS:
+        try:
+            return sheet_fingerprints(path)
+        except PACKAGE_ERRORS:
+            # Paquete ilegible: la huella del archivo completo sigue sirviendo
+            pass
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(chunk)
+    return {"": digest.hexdigest()}
+
+
+def _open_cache(cache_path: str) -> sqlite3.Connection:
+    folder = os.path.dirname(cache_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(cache_path)
+    conn.executescript(_CACHE_SCHEMA)
+    return conn
+
+
+def _stat(path: str) -> tuple[int, float] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def _cached_fingerprints(conn: sqlite3.Connection, path: str) -> dict | None:
+    stat = _stat(path)
+    if stat is None:
+        return None
+    row = conn.execute(
+        "SELECT tamano, mtime, hojas FROM huellas WHERE ruta = ?", (path,)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != stat:
+        return None
+    return json.loads(row[2])
+
+
+def _store_fingerprints(conn: sqlite3.Connection, path: str, prints: dict) -> None:
+    stat = _stat(path)
+    if stat is None:
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO huellas (ruta, tamano, mtime, hojas) VALUES (?, ?, ?, ?)",
+        (path, *stat, json.dumps(prints)),
+    )
+
+
+def _options_text(mode: str, keys: str, tolerance, formulas: bool) -> str:
+    tol = vars(tolerance) if tolerance is not None else None
+    return json.dumps([mode, keys, tol, formulas], sort_keys=True)
+
+
+def _summary_key(prints1: dict, prints2: dict, options: str) -> str:
+    data = json.dumps([prints1, prints2, options], sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+# ─── Comparar una pareja ─────────────────────────────────────────
+
+
+def summarize(result: dict) -> dict:
+    """Resumen serializable (JSON) de un resultado de compare_files."""
+    sheets = []
+    for name, diffs in result["common_diffs"].items():
+        kinds = Counter(d.get("tipo", "modificada") for d in diffs)
+        sheets.append({"hoja": name, "diferencias": len(diffs),
+                       **{kind: kinds.get(kind, 0) for kind in DIFF_KINDS}})
+    unbalanced = {
+        name: [col["columna"] for col in columns if not col["cuadra"]]
+        for name, columns in result.get("totales", {}).items()
+    }
+    for sheet in sheets:
+        sheet["descuadres"] = ", ".join(unbalanced.get(sheet["hoja"], []))
+    changed = bool(sheets or result["sheets_only_v1"] or result["sheets_only_v2"])
+    return {
+        "estado": STATUS_CHANGED if changed else STATUS_NO_DIFFS,
+        "detalle": "",
+        "hojas": sheets,
+        "solo1": result["sheets_only_v1"],
+        "solo2": result["sheets_only_v2"],
+        "identicas": len(result.get("identicas", [])),
+        "sin_clave": result.get("sin_clave", []),
+    }
+
+
+def _plain_summary(status: str, detail: str = "") -> dict:
+    return {"estado": status, "detalle": detail, "hojas": [], "solo1": [], "solo2": [],
+            "identicas": 0, "sin_clave": []}
+
+
+def _compare_pair_job(args: tuple) -> tuple[dict | None, dict | None, dict]:
+    """Trabajo del pool: (huellas1, huellas2, resumen) de una pareja."""
+    path1, path2, prints1, prints2, mode, keys, tolerance, formulas = args
+    try:
+        prints1 = prints1 or file_fingerprints(path1)
+        prints2 = prints2 or file_fingerprints(path2)
+        if prints1 == prints2:
+            return prints1, prints2, _plain_summary(STATUS_IDENTICAL)
+        # Las parejas ya van en paralelo: cada una compara sus hojas en serie
+        result = compare_files(path1, path2, mode, keys, tolerance=tolerance,
+                               formulas=formulas, max_workers=1)
+        if not result:
+            return prints1, prints2, _plain_summary(STATUS_ERROR, "Falta una dependencia")
+        return prints1, prints2, summarize(result)
+    except Exception as e:  # un libro roto no debe tumbar el resto del lote
+        return None, None, _plain_summary(STATUS_ERROR, f"{type(e).__name__}: {e}")
+
+
+def compare_folders(folder1: str, folder2: str, mode: str, keys: str = "",
+                    tolerance=None, formulas: bool = False, pattern1: str = "",
+                    pattern2: str = "", progress_callback=None,
+                    cache_path: str = COMPARE_CACHE_PATH) -> list[dict]:
+    """Compara cada pareja de libros de dos carpetas.
+
+    Args:
+        mode, keys, tolerance, formulas: Como en compare_files.
+        pattern1, pattern2: Patrones para emparejar (ver pair_workbooks).
+        progress_callback: Funcion opcional (parejas listas, total).
+        cache_path: SQLite con huellas y resumenes de corridas anteriores.
+
+    Returns:
+        Una entrada por archivo: {archivo1, archivo2, origen, **resumen};
+        origen es "comparado", "cache" o "" (sin pareja).
+
+    Raises:
+        sqlite3.Error, OSError: Si no se puede abrir o escribir la cache.
+    """
+    pairs, only1, only2 = pair_workbooks(folder1, folder2, pattern1, pattern2)
+    options = _options_text(mode, keys, tolerance, formulas)
+    entries: list[dict | None] = [None] * len(pairs)
+    total = len(pairs)
+    done = 0
+    if progress_callback:
+        progress_callback(0, total)
+
+    conn = _open_cache(cache_path)
+    pool = None
+    try:
+        jobs = {}
+        for idx, (rel1, rel2) in enumerate(pairs):
+            path1, path2 = os.path.join(folder1, rel1), os.path.join(folder2, rel2)
+            prints1 = _cached_fingerprints(conn, path1)
+            prints2 = _cached_fingerprints(conn, path2)
+            base = {"archivo1": rel1, "archivo2": rel2}
+            if prints1 is not None and prints2 is not None:
+                if prints1 == prints2:
+                    entries[idx] = {**base, "origen": "cache", **_plain_summary(STATUS_IDENTICAL)}
+                    continue
+                row = conn.execute(
+                    "SELECT resumen FROM resumenes WHERE clave = ?",
+                    (_summary_key(prints1, prints2, options),),
+                ).fetchone()
+                if row is not None:
+                    entries[idx] = {**base, "origen": "cache", **json.loads(row[0])}
+                    continue
+            jobs[idx] = (path1, path2, prints1, prints2, mode, keys, tolerance, formulas)
+
+        done = total - len(jobs)
+        if progress_callback:
+            progress_callback(done, total)
+
+        workers = min(os.cpu_count() or 1, BATCH_COMPARE_WORKERS, len(jobs))
+        if workers < 2:
+            outcomes = ((idx, _compare_pair_job(args)) for idx, args in jobs.items())
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = {pool.submit(_compare_pair_job, args): idx for idx, args in jobs.items()}
+            outcomes = ((futures[f], f.result()) for f in as_completed(futures))
+
+        for idx, (prints1, prints2, summary) in outcomes:
+            path1, path2 = jobs[idx][:2]
+            rel1, rel2 = pairs[idx]
+            entries[idx] = {"archivo1": rel1, "archivo2": rel2, "origen": "comparado", **summary}
+            if prints1 is not None:
+                _store_fingerprints(conn, path1, prints1)
+                _store_fingerprints(conn, path2, prints2)
+                if summary["estado"] != STATUS_ERROR:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO resumenes (clave, resumen, usado) VALUES (?, ?, ?)",
+                        (_summary_key(prints1, prints2, options), json.dumps(summary),
+                         datetime.now().timestamp()),
+                    )
+            conn.commit()
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        conn.commit()
+        conn.close()
+
+    entries += [{"archivo1": rel, "archivo2": "", "origen": "", **_plain_summary(STATUS_ONLY1)}
+                for rel in only1]
+    entries += [{"archivo1": "", "archivo2": rel, "origen": "", **_plain_summary(STATUS_ONLY2)}
+                for rel in only2]
+    return entries
+
+
+# ─── Libro resumen ────────────────────────────────────────────────
+
+
+def write_batch_summary(entries: list[dict], folder1: str, folder2: str, output: str,
+                        openpyxl) -> None:
+    """Libro resumen (write-only): una fila por archivo y otra por hoja con cambios.
+
+    Raises:
+        OSError: Si no se puede guardar el archivo.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    files = wb.create_sheet("Archivos")
+    files.append(["Archivo 1", "Archivo 2", "Estado", "Diferencias",
+                  *(kind.capitalize() + "s" for kind in DIFF_KINDS),
+                  "Hojas con cambios", "Hojas identicas", "Hojas solo en 1",
+                  "Hojas solo en 2", "Origen", "Detalle"])
+    sheets = wb.create_sheet("Hojas")
+    sheets.append(["Archivo 1", "Hoja", "Diferencias",
+                   *(kind.capitalize() + "s" for kind in DIFF_KINDS), "Columnas sin cuadrar"])
+
+    for entry in entries:
+        totals = Counter()
+        for sheet in entry["hojas"]:
+            totals.update({kind: sheet[kind] for kind in DIFF_KINDS})
+            totals["diferencias"] += sheet["diferencias"]
+            sheets.append([entry["archivo1"], sheet["hoja"], sheet["diferencias"],
+                           *(sheet[kind] for kind in DIFF_KINDS), sheet["descuadres"]])
+        files.append([
+            entry["archivo1"], entry["archivo2"], entry["estado"], totals["diferencias"],
+            *(totals[kind] for kind in DIFF_KINDS),
+            len(entry["hojas"]), entry["identicas"],
+            ", ".join(entry["solo1"]), ", ".join(entry["solo2"]),
+            entry["origen"], entry["detalle"],
+        ])
+
+    info = wb.create_sheet("Resumen")
+    info.append(["Carpeta 1", folder1])
+    info.append(["Carpeta 2", folder2])
+    info.append(["Generado", datetime.now().strftime("%Y-%m-%d %H:%M")])
+    for status, count in sorted(Counter(e["estado"] for e in entries).items()):
+        info.append([status, count])
+
+    wb.save(output)
+    wb.close()
+
+
+# ─── Menu ─────────────────────────────────────────────────────────
+
+
+def batch_compare_menu() -> None:
+    """Menu de comparacion de carpetas de Excel."""
+    console.print("\n[bold cyan]Comparar Carpetas de Excel[/bold cyan]\n")
+
+    folders = []
+    for label in ("anterior", "nueva"):
+        folder = Prompt.ask(f"[bold]Carpeta {label}[/bold]").strip().strip('"')
+        if not os.path.isdir(folder):
+            console.print("[red]Carpeta no encontrada.[/red]")
+            return
+        folders.append(folder)
+    folder1, folder2 = folders
+
+    pattern1 = pattern2 = ""
+    how = Prompt.ask(
+        "[bold]Emparejar archivos por[/bold] ([bold]n[/bold]ombre / [bold]p[/bold]atron)",
+        choices=["n", "p"], default="n",
+    )
+    if how == "p":
+        pattern1 = Prompt.ask(
+            "[bold]Patron en la carpeta anterior[/bold] [dim](* = parte que empareja, "
+            "ej. Sucursal_*_sep.xlsx)[/dim]"
+        ).strip()
+        pattern2 = Prompt.ask(
+            "[bold]Patron en la carpeta nueva[/bold]", default=pattern1
+        ).strip()
+
+    mode, keys, tolerance, formulas = ask_compare_options(offer_formulas=True)
+
+    try:
+        with console.status("[bold green]Comparando carpetas...") as status:
+            def progress(done, total):
+                status.update(f"[bold green]Comparando libros...[/bold green] {done}/{total}")
+            entries = compare_folders(folder1, folder2, mode, keys, tolerance, formulas,
+                                      pattern1, pattern2, progress)
+    except (sqlite3.Error, OSError) as e:
+        console.print(f"[red]No se pudo usar la cache de comparaciones:[/red] {e}")
+        return
+
+    if not entries:
+        console.print("[yellow]No se encontraron libros de Excel en las carpetas.[/yellow]")
+        return
+
+    counts = Counter(e["estado"] for e in entries)
+    cached = sum(1 for e in entries if e["origen"] == "cache")
+    console.print("\n" + "  ".join(f"[bold]{status}:[/bold] {n}" for status, n in counts.items()))
+    if cached:
+        console.print(f"[dim]{cached} pareja(s) sin cambios desde la ultima corrida (cache).[/dim]")
+
+    changed = sorted(
+        (e for e in entries if e["estado"] in (STATUS_CHANGED, STATUS_ERROR)),
+        key=lambda e: -sum(s["diferencias"] for s in e["hojas"]),
+    )
+    if changed:
+        table = Table(title="Archivos con cambios")
+        table.add_column("Archivo", style="bold cyan")
+        table.add_column("Estado")
+        table.add_column("Diferencias", justify="right")
+        table.add_column("Hojas", style="dim")
+        for entry in changed[:20]:
+            table.add_row(
+                entry["archivo1"], entry["estado"],
+                str(sum(s["diferencias"] for s in entry["hojas"])),
+                entry["detalle"] or ", ".join(s["hoja"] for s in entry["hojas"]),
+            )
+        if len(changed) > 20:
+            table.add_row("...", "", "", f"+{len(changed) - 20} mas")
+        console.print(table)
+
+    openpyxl = _get_openpyxl()
+    if not openpyxl:
+        return
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Junto a las carpetas, no dentro: si no, el mes siguiente lo tomaria como libro
+    parent = os.path.dirname(os.path.abspath(folder2))
+    output = Prompt.ask(
+        "[bold]Libro resumen[/bold]",
+        default=os.path.join(parent, f"comparacion_{stamp}.xlsx"),
+    ).strip().strip('"')
+    try:
+        write_batch_summary(entries, folder1, folder2, output, openpyxl)
+    except OSError as e:
+        console.print(f"[red]No se pudo guardar el resumen:[/red] {e}")
+        return
+    console.print(f"\n[bold green]Resumen guardado: {output}[/bold green]")
@@ -1,4 +1,9 @@
-"""Limpiador de celdas Excel: elimina espacios dobles, invisibles y NBSP."""
+"""Limpiador de celdas Excel: elimina espacios dobles, invisibles y NBSP.
+
+El analisis lee las hojas con la cache de tools._workbook_cache (un libro
+ya revisado no se vuelve a parsear); openpyxl solo carga el libro completo
+si hay cambios y se decide guardar.
+"""
 
 import os
 import re
@@ -6,6 +11,9 @@ import re
 from rich.prompt import Prompt
 from rich.table import Table
 
+from tools._row_diff import column_letter as _column_letter
+from tools._workbook_cache import CachedWorkbook
+from tools._xlsx_package import PACKAGE_ERRORS
 from utils import get_openpyxl as _get_openpyxl, console
 
 
@@ -31,38 +39,63 @@ def _clean_cell_value(value: str) -> str:
 
 
 def clean_file(filepath: str) -> dict:
-    """Limpia celdas de texto en un archivo Excel.
+    """Busca celdas de texto por limpiar en un archivo Excel (sin modificarlo).
+
+    Como openpyxl al abrir el libro para editarlo, una celda con formula
+    cuenta como su texto ("=A1  &  B1").
 
     Returns:
         dict con total_cells, cleaned_cells, changes (lista de diffs)
     """
-    openpyxl = _get_openpyxl()
-    if not openpyxl:
+    if not _get_openpyxl():
         return {"total_cells": 0, "cleaned_cells": 0, "changes": []}
 
-    wb = openpyxl.load_workbook(filepath)
+    book = CachedWorkbook(filepath)
     total = 0
-    cleaned = 0
     changes = []
-
-    for ws in wb.worksheets:
-        for row in ws.iter_rows():
-            for cell in row:
-                if isinstance(cell.value, str):
+    try:
+        for name in book.sheetnames:
+            for row_idx, (values, formulas) in enumerate(book.rows(name), 1):
+                # Una formula puede ir mas alla de la ultima celda con valor
+                for col in range(max(len(values), len(formulas))):
+                    value = formulas[col] if col < len(formulas) else None
+                    if value is None and col < len(values):
+                        value = values[col]
+                    if not isinstance(value, str):
+                        continue
                     total += 1
-                    new_val = _clean_cell_value(cell.value)
-                    if new_val != cell.value:
+                    new_val = _clean_cell_value(value)
+                    if new_val != value:
                         changes.append({
-                            "hoja": ws.title,
-                            "celda": cell.coordinate,
-                            "antes": repr(cell.value),
+                            "hoja": name,
+                            "celda": f"{_column_letter(col + 1)}{row_idx}",
+                            "antes": repr(value),
                             "despues": repr(new_val),
                         })
-                        cell.value = new_val
-                        cleaned += 1
+    finally:
+        book.close()
+
+    return {"total_cells": total, "cleaned_cells": len(changes), "changes": changes}
 
-    return {"total_cells": total, "cleaned_cells": cleaned,
-            "changes": changes, "_wb": wb}
+
+def save_cleaned(filepath: str, changes: list[dict], output: str) -> None:
+    """Aplica los cambios de clean_file y guarda el libro en `output`.
+
+    Raises:
+        OSError: Si no se puede guardar el archivo.
+    """
+    openpyxl = _get_openpyxl()
+    if not openpyxl:
+        return
+    wb = openpyxl.load_workbook(filepath)
+    try:
+        for change in changes:
+            cell = wb[change["hoja"]][change["celda"]]
+            if isinstance(cell.value, str):
+                cell.value = _clean_cell_value(cell.value)
+        wb.save(output)
+    finally:
+        wb.close()
 
 
 def cell_cleaner_menu() -> None:
@@ -79,16 +112,17 @@ def cell_cleaner_menu() -> None:
         return
 
     with console.status("[bold green]Analizando celdas..."):
-        result = clean_file(filepath)
+        try:
+            result = clean_file(filepath)
+        except PACKAGE_ERRORS as e:
+            console.print(f"[red]No se pudo leer el archivo: {e}[/red]")
+            return
 
-    wb = result.pop("_wb", None)
     console.print(f"\n  Celdas de texto analizadas: [bold]{result['total_cells']}[/bold]")
     console.print(f"  Celdas con cambios: [bold]{result['cleaned_cells']}[/bold]")
 
     if not result["changes"]:
         console.print("\n[bold green]No se encontraron celdas por limpiar.[/bold green]")
-        if wb:
-            wb.close()
         return
 
     # Preview de cambios
@@ -110,15 +144,11 @@ def cell_cleaner_menu() -> None:
         "\n[bold]Guardar archivo limpio?[/bold]",
         choices=["s", "n"], default="s",
     )
-    if confirm != "s" or not wb:
-        if wb:
-            wb.close()
+    if confirm != "s":
         return
 
     base, ext = os.path.splitext(filepath)
     output = f"{base}_limpio{ext}"
-    try:
-        wb.save(output)
-        console.print(f"\n[bold green]Archivo guardado: {output}[/bold green]")
-    finally:
-        wb.close()
+    with console.status("[bold green]Guardando archivo limpio..."):
+        save_cleaned(filepath, result["changes"], output)
+    console.print(f"\n[bold green]Archivo guardado: {output}[/bold green]")
@@ -1,72 +1,456 @@
-"""Comparador de Excel: diferencias celda por celda entre dos archivos."""
+"""Comparador de Excel: diferencias celda por celda entre dos archivos.
+
+Acepta todo EXCEL_EXTENSIONS: .xlsx/.xlsm con el lector propio (con cache
+de hojas ya leidas), .xls con xlrd y .xlsb con pyxlsb (opcionales), y
+.csv. Dos CSV se comparan con el motor de tools._csv_diff; un CSV contra
+un libro se compara con la primera hoja.
+
+Tres modos para emparejar filas antes de comparar celdas:
+- posicion: fila N contra fila N (lo mas rapido, sin memoria extra).
+- alinear: por contenido; una fila insertada no desplaza el resto.
+- clave: por columnas clave (RFC, numero de empleado...), detecta filas
+  agregadas, eliminadas, movidas y los cambios por columna.
+"""
 
 import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
 
 from rich.prompt import Prompt
 from rich.table import Table
 
+from config import EXCEL_EXTENSIONS
+from tools._csv_diff import CsvSource as _CsvSource, compare_csv as _compare_csv
+from tools._diff_report import write_diff_html, write_diff_workbook
+from tools._tolerance import (
+    ColumnTotals, Tolerance, compare_rows_tolerant, totals_summary,
+)
+from tools._xlsx_package import (
+    PACKAGE_ERRORS, XLSX_PACKAGE_EXTENSIONS, identical_sheets as _identical_sheets,
+)
+from tools._workbook_cache import CachedWorkbook as _CachedWorkbook
+from tools._row_diff import (
+    FormulaRow,
+    KeyColumnError,
+    column_letter as _column_letter,
+    diff_aligned as _diff_aligned,
+    diff_keyed as _diff_keyed,
+    format_value as _format_value,
+    formula_diffs as _formula_diffs,
+    resolve_key_columns,
+)
 from utils import get_openpyxl as _get_openpyxl, console
 
 
+MODE_POSITION = "posicion"
+MODE_ALIGN = "alinear"
+MODE_KEY = "clave"
+
+# Desde cuantas hojas comunes conviene repartirlas en procesos
+POOL_MIN_SHEETS = 2
+
+
+def _sheet_rows(ws):
+    """Filas de valores de una hoja, en streaming.
+
+    En modo read_only se ignora la dimension declarada en el XML (muchos
+    programas la escriben mal y openpyxl recortaria filas y columnas).
+    """
+    if hasattr(ws, "reset_dimensions"):
+        ws.reset_dimensions()
+    return ws.iter_rows(values_only=True)
+
+
+def compare_rows(rows1, rows2) -> list[dict]:
+    """Compara dos secuencias de filas (tuplas de valores) por posicion.
 
-def compare_sheets(ws1, ws2) -> list[dict]:
-    """Compara dos hojas celda por celda.
+    Solo hay en memoria una fila de cada lado mas la lista de diffs. Las
+    filas pueden tener largo distinto: lo que falta cuenta como vacio.
 
     Returns:
-        Lista de diffs: [{celda, v1, v2}]
+        Lista de diffs: [{celda, v1, v2}]; si las filas son FormulaRow,
+        los cambios de formula van aparte con tipo "formula".
     """
     diffs = []
-    max_row = max(ws1.max_row or 1, ws2.max_row or 1)
-    max_col = max(ws1.max_column or 1, ws2.max_column or 1)
-
-    for row in range(1, max_row + 1):
-        for col in range(1, max_col + 1):
-            v1 = ws1.cell(row=row, column=col).value
-            v2 = ws2.cell(row=row, column=col).value
+    for row_idx, (row1, row2) in enumerate(zip_longest(rows1, rows2, fillvalue=()), start=1):
+        if row1 == row2:
+            continue
+        width = max(len(row1), len(row2))
+        for col in range(width):
+            v1 = row1[col] if col < len(row1) else None
+            v2 = row2[col] if col < len(row2) else None
             if v1 != v2:
-                cell_ref = ws1.cell(row=row, column=col).coordinate
                 diffs.append({
-                    "celda": cell_ref,
-                    "v1": str(v1) if v1 is not None else "(vacio)",
-                    "v2": str(v2) if v2 is not None else "(vacio)",
+                    "celda": f"{_column_letter(col + 1)}{row_idx}",
+                    "v1": _format_value(v1),
+                    "v2": _format_value(v2),
                 })
+        diffs.extend(_formula_diffs(row1, row2, row_idx, row_idx))
     return diffs
 
 
-def compare_files(path1: str, path2: str) -> dict:
-    """Compara dos archivos Excel.
+def compare_sheets(ws1, ws2, mode: str = MODE_POSITION, keys: str = "",
+                   tolerance: Tolerance | None = None) -> list[dict]:
+    """Compara dos hojas recorriendo sus filas en streaming.
+
+    Funciona con hojas normales o read_only; con read_only no se crean
+    objetos celda para posiciones vacias.
+
+    Args:
+        mode: MODE_POSITION, MODE_ALIGN o MODE_KEY.
+        keys: Columnas clave para MODE_KEY ("RFC" o "A,C"); la primera
+            fila se toma como encabezado.
+        tolerance: Si se da, los numeros dentro de la tolerancia (y, si
+            se pide, el texto numerico) cuentan como iguales.
 
     Returns:
-        dict con sheets_only_v1, sheets_only_v2, common_diffs {sheet: [diffs]}
+        Lista de diffs: [{celda, v1, v2}] y, salvo por posicion, "tipo"
+        (modificada, agregada, eliminada, movida).
+
+    Raises:
+        KeyColumnError: En MODE_KEY, si la hoja no tiene las columnas clave.
     """
-    openpyxl = _get_openpyxl()
-    if not openpyxl:
-        return {}
+    return _compare_streams(_sheet_rows(ws1), _sheet_rows(ws2), mode, keys, tolerance)
+
+
+def _compare_streams(rows1, rows2, mode: str, keys: str, tol: Tolerance | None = None,
+                     totals: tuple | None = None) -> list[dict]:
+    """Compara dos flujos de filas; `totals` (ColumnTotals, ColumnTotals) suma los datos."""
+    if mode == MODE_KEY:
+        header1, header2 = next(rows1, ()), next(rows2, ())
+        key_cols = resolve_key_columns(keys, header1)
+        if totals:
+            rows1, rows2 = totals[0].track(rows1), totals[1].track(rows2)
+        return compare_rows([header1], [header2]) + _diff_keyed(
+            rows1, rows2, key_cols, first_row=2, tol=tol
+        )
+    if mode == MODE_ALIGN:
+        if totals:
+            rows1, rows2 = totals[0].track(rows1), totals[1].track(rows2)
+        return _diff_aligned(rows1, rows2, tol=tol)
+    if tol is not None:
+        return compare_rows_tolerant(rows1, rows2, tol, *(totals or (None, None)))
+    return compare_rows(rows1, rows2)
+
+
+# ─── Lectores por formato ─────────────────────────────────────────
+
+
+def _get_xlrd():
+    """Import lazy de xlrd (opcional, solo para .xls)."""
+    try:
+        import xlrd
+        return xlrd
+    except ImportError:
+        console.print(
+            "[bold red]xlrd no esta instalado.[/bold red]\n"
+            "[dim]Ejecuta: pip install xlrd[/dim]\n"
+            "[dim]Esta dependencia es opcional y solo se necesita para comparar .xls.[/dim]"
+        )
+        return None
+
+
+def _get_pyxlsb():
+    """Import lazy de pyxlsb (opcional, solo para .xlsb)."""
+    try:
+        import pyxlsb
+        return pyxlsb
+    except ImportError:
+        console.print(
+            "[bold red]pyxlsb no esta instalado.[/bold red]\n"
+            "[dim]Ejecuta: pip install pyxlsb[/dim]\n"
+            "[dim]Esta dependencia es opcional y solo se necesita para comparar .xlsb.[/dim]"
+        )
+        return None
+
+
+class _XlsxBook:
+    """.xlsx/.xlsm via la cache de hojas; con `formulas` las filas son FormulaRow."""
+
+    def __init__(self, path: str, formulas: bool):
+        self._book = _CachedWorkbook(path)
+        self._formulas = formulas
+        self.sheetnames = self._book.sheetnames
+
+    def rows(self, name: str):
+        if not self._formulas:
+            for values, _ in self._book.rows(name):
+                yield values
+            return
+        for values, formulas in self._book.rows(name):
+            yield FormulaRow(values, formulas) if formulas else values
+
+    def close(self) -> None:
+        self._book.close()
+
+
+class _XlrdBook:
+    def __init__(self, path: str, xlrd):
+        self._wb = xlrd.open_workbook(path, on_demand=True)
+        self.sheetnames = self._wb.sheet_names()
+
+    def rows(self, name: str):
+        sheet = self._wb.sheet_by_name(name)
+        for r in range(sheet.nrows):
+            yield tuple(v if v != "" else None for v in sheet.row_values(r))
+
+    def close(self) -> None:
+        self._wb.release_resources()
+
+
+class _PyxlsbBook:
+    def __init__(self, path: str, pyxlsb):
+        self._wb = pyxlsb.open_workbook(path)
+        self.sheetnames = list(self._wb.sheets)
+
+    def rows(self, name: str):
+        with self._wb.get_sheet(name) as sheet:
+            for row in sheet.rows():
+                yield tuple(cell.v for cell in row)
+
+    def close(self) -> None:
+        self._wb.close()
+
+
+class _CsvBook:
+    """Un CSV visto como libro de una sola hoja (nombre del archivo)."""
+
+    def __init__(self, path: str):
+        self._src = _CsvSource(path)
+        self.sheetnames = [os.path.splitext(os.path.basename(path))[0]]
+
+    def rows(self, name: str):
+        return (fields for *_, fields in self._src.parsed(self._src.records()))
 
-    wb1 = openpyxl.load_workbook(path1, data_only=True)
-    wb2 = openpyxl.load_workbook(path2, data_only=True)
+    def close(self) -> None:
+        self._src.close()
 
-    names1 = set(wb1.sheetnames)
-    names2 = set(wb2.sheetnames)
 
-    result = {
-        "sheets_only_v1": sorted(names1 - names2),
-        "sheets_only_v2": sorted(names2 - names1),
-        "common_diffs": {},
-        "_wb1": wb1,
-        "_wb2": wb2,
+def _open_book(path: str, formulas: bool = False):
+    """Abre `path` con el lector de su extension; None si falta la dependencia.
+
+    Los .xlsx/.xlsm se leen con el lector propio (tools._xlsx_stream) a
+    traves de la cache de hojas: un libro sin cambios no se vuelve a
+    parsear. Con `formulas` se compara tambien la formula de cada celda.
+
+    Raises:
+        ValueError: Si la extension no esta en EXCEL_EXTENSIONS.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _CsvBook(path)
+    if ext == ".xls":
+        xlrd = _get_xlrd()
+        return _XlrdBook(path, xlrd) if xlrd else None
+    if ext == ".xlsb":
+        pyxlsb = _get_pyxlsb()
+        return _PyxlsbBook(path, pyxlsb) if pyxlsb else None
+    if ext in XLSX_PACKAGE_EXTENSIONS:
+        # El lector usa las conversiones de fechas y formulas de openpyxl
+        if not _get_openpyxl():
+            return None
+        return _XlsxBook(path, formulas)
+    raise ValueError(f"Formato no soportado: {ext or '(sin extension)'}")
+
+
+def _open_pair(path1: str, path2: str, formulas: bool = False):
+    """(libro1, libro2), o None si falta una dependencia."""
+    book1 = _open_book(path1, formulas)
+    if book1 is None:
+        return None
+    try:
+        book2 = _open_book(path2, formulas)
+    except Exception:
+        book1.close()
+        raise
+    if book2 is None:
+        book1.close()
+        return None
+    return book1, book2
+
+
+def _sheet_pairs(book1, book2, path1: str, path2: str) -> tuple[list, list, list]:
+    """(parejas (hoja1, hoja2), solo en 1, solo en 2).
+
+    Las hojas se emparejan por nombre; un CSV se empareja con la primera
+    hoja del otro archivo.
+    """
+    if _is_csv(path1) or _is_csv(path2):
+        if not book1.sheetnames or not book2.sheetnames:
+            return [], list(book1.sheetnames), list(book2.sheetnames)
+        return [(book1.sheetnames[0], book2.sheetnames[0])], [], []
+    names2 = set(book2.sheetnames)
+    names1 = set(book1.sheetnames)
+    pairs = [(name, name) for name in book1.sheetnames if name in names2]
+    return pairs, sorted(names1 - names2), sorted(names2 - names1)
+
+
+def _is_csv(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() == ".csv"
+
+
+def _compare_sheet(book1, book2, name1: str, name2: str, mode: str, keys: str,
+                   tol: Tolerance | None = None) -> tuple[list[dict], bool, list | None]:
+    """(diffs, sin_clave, totales por columna) de una pareja de hojas.
+
+    Los totales solo se calculan con tolerancia; si no, van en None.
+    """
+    for attempt in (mode, MODE_ALIGN):
+        totals = (ColumnTotals(tol), ColumnTotals(tol)) if tol else None
+        try:
+            diffs = _compare_streams(
+                book1.rows(name1), book2.rows(name2), attempt, keys, tol, totals
+            )
+        except KeyColumnError:
+            continue
+        return diffs, attempt != mode, totals_summary(*totals) if totals else None
+
+
+# Libros abiertos por cada proceso del pool, reutilizados entre hojas
+_WORKER_BOOKS: dict = {}
+
+
+def _compare_sheet_job(args: tuple) -> tuple[list[dict], bool]:
+    """Trabajo del pool: compara una pareja de hojas abriendo los libros una vez por proceso."""
+    path1, path2, name1, name2, mode, keys, tol, formulas = args
+    if _WORKER_BOOKS.get("paths") != (path1, path2, formulas):
+        for book in _WORKER_BOOKS.get("books", ()):
+            book.close()
+        _WORKER_BOOKS["books"] = _open_pair(path1, path2, formulas)
+        _WORKER_BOOKS["paths"] = (path1, path2, formulas)
+    book1, book2 = _WORKER_BOOKS["books"]
+    return _compare_sheet(book1, book2, name1, name2, mode, keys, tol)
+
+
+def _compare_csv_files(path1: str, path2: str, mode: str, keys: str,
+                       progress_callback=None) -> dict:
+    """Dos CSV: una sola "hoja" comparada con el motor de tools._csv_diff."""
+    name = os.path.splitext(os.path.basename(path1))[0]
+    if progress_callback:
+        progress_callback(0, 1)
+    diffs, keyless = _compare_csv(path1, path2, mode, keys)
+    if progress_callback:
+        progress_callback(1, 1)
+    return {
+        "sheets_only_v1": [],
+        "sheets_only_v2": [],
+        "common_diffs": {name: diffs} if diffs else {},
+        "identicas": [],
+        "sin_clave": [name] if keyless else [],
     }
 
-    for name in sorted(names1 & names2):
-        diffs = compare_sheets(wb1[name], wb2[name])
-        if diffs:
-            result["common_diffs"][name] = diffs
+
+def compare_files(path1: str, path2: str, mode: str = MODE_POSITION,
+                  keys: str = "", progress_callback=None,
+                  tolerance: Tolerance | None = None, formulas: bool = False,
+                  max_workers: int | None = None) -> dict:
+    """Compara dos archivos Excel (o CSV).
+
+    Antes de leer celdas, las hojas identicas byte a byte en el ZIP se dan
+    por iguales sin parsearlas (ver tools._xlsx_package). El resto se lee
+    fila por fila con el lector de cada formato. Con POOL_MIN_SHEETS hojas
+    comunes o mas y varios nucleos, las hojas se reparten en un pool de
+    procesos (cada uno abre los archivos y recorre solo sus hojas) y los
+    resultados se juntan en el orden de las hojas. En MODE_KEY, las hojas
+    sin las columnas clave se alinean por contenido.
+
+    Con `tolerance` los numeros se comparan con tolerancia (ver
+    tools._tolerance) y se suman los totales por columna de cada hoja
+    comparada. En un CSV todo es texto, asi que ahi el texto numerico
+    siempre cuenta como numero y se lee por la ruta general, no por el
+    motor de bytes de tools._csv_diff.
+
+    Con `formulas` (solo si los dos son .xlsx/.xlsm) se compara tambien la
+    formula de cada celda, leida en la misma pasada que el valor (ver
+    tools._xlsx_stream); un cambio de formula sale con tipo "formula"
+    aunque el valor calculado sea el mismo.
+
+    Args:
+        progress_callback: Funcion opcional (hojas comparadas, total).
+        tolerance: Tolerancia numerica opcional.
+        formulas: Comparar tambien las formulas.
+        max_workers: Tope de procesos para repartir hojas (1 = sin pool);
+            por defecto uno por nucleo.
+
+    Returns:
+        dict con sheets_only_v1, sheets_only_v2, common_diffs {sheet: [diffs]},
+        identicas (hojas saltadas por huella), sin_clave (hojas que no
+        tenian la clave) y, con tolerancia, totales {sheet: [por columna]};
+        vacio si falta una dependencia.
+
+    Raises:
+        ValueError: Si alguno de los archivos no tiene un formato soportado.
+    """
+    if tolerance is None and _is_csv(path1) and _is_csv(path2):
+        return _compare_csv_files(path1, path2, mode, keys, progress_callback)
+    if tolerance is not None and (_is_csv(path1) or _is_csv(path2)):
+        tolerance = tolerance.with_text_numbers()
+
+    both_xlsx = all(
+        os.path.splitext(p)[1].lower() in XLSX_PACKAGE_EXTENSIONS for p in (path1, path2)
+    )
+    formulas = formulas and both_xlsx
+    same = _identical_sheets(path1, path2) if both_xlsx else set()
+
+    books = _open_pair(path1, path2, formulas)
+    if books is None:
+        return {}
+    book1, book2 = books
+    pool = None
+    try:
+        pairs, only1, only2 = _sheet_pairs(book1, book2, path1, path2)
+        result = {
+            "sheets_only_v1": only1,
+            "sheets_only_v2": only2,
+            "common_diffs": {},
+            "identicas": [name1 for name1, _ in pairs if name1 in same],
+            "sin_clave": [],
+        }
+        if tolerance is not None:
+            result["totales"] = {}
+        pairs = [pair for pair in pairs if pair[0] not in same]
+        total = len(pairs)
+        if progress_callback:
+            progress_callback(0, total)
+
+        workers = min(max_workers or os.cpu_count() or 1, total)
+        if total < POOL_MIN_SHEETS or workers < 2:
+            outcomes = (_compare_sheet(book1, book2, n1, n2, mode, keys, tolerance)
+                        for n1, n2 in pairs)
+        else:
+            # Cada proceso abre su copia; aqui ya no hacen falta
+            book1.close()
+            book2.close()
+            pool = ProcessPoolExecutor(max_workers=workers)
+            jobs = [(path1, path2, n1, n2, mode, keys, tolerance, formulas)
+                    for n1, n2 in pairs]
+            outcomes = pool.map(_compare_sheet_job, jobs)
+
+        for done, ((name, _), (diffs, keyless, totals)) in enumerate(zip(pairs, outcomes), 1):
+            if keyless:
+                result["sin_clave"].append(name)
+            if totals:
+                result["totales"][name] = totals
+            if diffs:
+                result["common_diffs"][name] = diffs
+            if progress_callback:
+                progress_callback(done, total)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        book1.close()
+        book2.close()
 
     return result
 
 
 def _generate_diff_report(path1: str, path2: str, comparison: dict, output: str) -> None:
-    """Genera un reporte .xlsx con las diferencias marcadas en rojo."""
+    """Genera una copia del archivo 1 con las celdas modificadas en rojo.
+
+    A diferencia de write_diff_workbook, carga el libro completo para
+    conservar su formato; en libros grandes conviene el libro de diferencias.
+    """
     openpyxl = _get_openpyxl()
     if not openpyxl:
         return
@@ -75,11 +459,15 @@ def _generate_diff_report(path1: str, path2: str, comparison: dict, output: str)
 
     red_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
 
-    wb1 = comparison["_wb1"]
+    # El reporte conserva el formato del original: aqui si se carga completo
+    wb1 = openpyxl.load_workbook(path1)
     # Marcar las celdas diferentes en rojo
     for sheet_name, diffs in comparison["common_diffs"].items():
         ws = wb1[sheet_name]
         for diff in diffs:
+            # Filas agregadas, eliminadas o movidas no son una celda del original
+            if diff.get("tipo", "modificada") not in ("modificada", "formula"):
+                continue
             cell = ws[diff["celda"]]
             cell.fill = red_fill
 
@@ -91,69 +479,206 @@ def comparator_menu() -> None:
     """Menu del comparador de Excel."""
     console.print("\n[bold cyan]Comparador de Excel[/bold cyan]\n")
 
-    path1 = Prompt.ask("[bold]Ruta del primer archivo[/bold]").strip().strip('"')
-    if not os.path.isfile(path1):
-        console.print("[red]Archivo no encontrado.[/red]")
-        return
-
-    path2 = Prompt.ask("[bold]Ruta del segundo archivo[/bold]").strip().strip('"')
-    if not os.path.isfile(path2):
-        console.print("[red]Archivo no encontrado.[/red]")
-        return
-
-    with console.status("[bold green]Comparando archivos..."):
-        result = compare_files(path1, path2)
+    paths = []
+    for label in ("primer", "segundo"):
+        path = Prompt.ask(f"[bold]Ruta del {label} archivo[/bold]").strip().strip('"')
+        if not os.path.isfile(path):
+            console.print("[red]Archivo no encontrado.[/red]")
+            return
+        if os.path.splitext(path)[1].lower() not in EXCEL_EXTENSIONS:
+            console.print(
+                f"[red]Formato no soportado. Usa: {', '.join(sorted(EXCEL_EXTENSIONS))}[/red]"
+            )
+            return
+        paths.append(path)
+    path1, path2 = paths
+
+    mode, keys, tolerance, formulas = ask_compare_options(
+        all(os.path.splitext(p)[1].lower() in XLSX_PACKAGE_EXTENSIONS for p in paths)
+    )
+
+    with console.status("[bold green]Comparando archivos...") as status:
+        def progress(done, total):
+            status.update(f"[bold green]Comparando hojas...[/bold green] {done}/{total}")
+        try:
+            result = compare_files(path1, path2, mode, keys, progress, tolerance, formulas)
+        except PACKAGE_ERRORS as e:
+            console.print(f"[red]No se pudo leer uno de los archivos: {e}[/red]")
+            return
 
     if not result:
         return
 
-    wb1 = result.pop("_wb1", None)
-    wb2 = result.pop("_wb2", None)
-
-    try:
-        # Hojas exclusivas
-        if result["sheets_only_v1"]:
-            console.print(f"\n[yellow]Hojas solo en archivo 1:[/yellow] {', '.join(result['sheets_only_v1'])}")
-        if result["sheets_only_v2"]:
-            console.print(f"[yellow]Hojas solo en archivo 2:[/yellow] {', '.join(result['sheets_only_v2'])}")
-
-        # Diferencias
-        total_diffs = sum(len(d) for d in result["common_diffs"].values())
-
-        if total_diffs == 0:
-            console.print("\n[bold green]Los archivos son identicos en las hojas comunes.[/bold green]")
-            return
+    # Hojas exclusivas
+    if result["sheets_only_v1"]:
+        console.print(f"\n[yellow]Hojas solo en archivo 1:[/yellow] {', '.join(result['sheets_only_v1'])}")
+    if result["sheets_only_v2"]:
+        console.print(f"[yellow]Hojas solo en archivo 2:[/yellow] {', '.join(result['sheets_only_v2'])}")
+    if result.get("identicas"):
+        console.print(
+            f"[dim]{len(result['identicas'])} hoja(s) identicas en el archivo, "
+            f"sin revisar celdas: {', '.join(result['identicas'])}[/dim]"
+        )
+    if result.get("sin_clave"):
+        console.print(
+            f"[yellow]Sin columnas clave (alineadas por contenido):[/yellow] "
+            f"{', '.join(result['sin_clave'])}"
+        )
 
-        console.print(f"\n[bold yellow]{total_diffs} diferencia(s) encontrada(s):[/bold yellow]")
+    _print_totals(result.get("totales", {}))
 
-        for sheet_name, diffs in result["common_diffs"].items():
-            table = Table(title=f"Hoja: {sheet_name}")
-            table.add_column("Celda", style="bold cyan")
-            table.add_column("Archivo 1", style="red")
-            table.add_column("Archivo 2", style="green")
+    # Diferencias
+    total_diffs = sum(len(d) for d in result["common_diffs"].values())
 
-            for diff in diffs[:30]:
-                table.add_row(diff["celda"], diff["v1"], diff["v2"])
+    if total_diffs == 0:
+        console.print("\n[bold green]Los archivos son identicos en las hojas comunes.[/bold green]")
+        return
 
-            if len(diffs) > 30:
-                table.add_row("...", f"+{len(diffs) - 30} mas", "")
+    console.print(f"\n[bold yellow]{total_diffs} diferencia(s) encontrada(s):[/bold yellow]")
+
+    # Por posicion solo hay celdas modificadas, salvo que tambien se comparen formulas
+    show_kind = mode != MODE_POSITION or formulas
+    for sheet_name, diffs in result["common_diffs"].items():
+        kinds = Counter(d.get("tipo", "modificada") for d in diffs)
+        table = Table(title=f"Hoja: {sheet_name}", caption=", ".join(
+            f"{count} {kind}(s)" for kind, count in sorted(kinds.items())
+        ) if show_kind else None)
+        table.add_column("Celda", style="bold cyan")
+        if show_kind:
+            table.add_column("Tipo")
+        if mode == MODE_KEY:
+            table.add_column("Clave", style="dim")
+        table.add_column("Archivo 1", style="red")
+        table.add_column("Archivo 2", style="green")
+
+        for diff in diffs[:30]:
+            celda = diff["celda"]
+            if "celda2" in diff:
+                celda += f" -> {diff['celda2']}"
+            row = [celda]
+            if show_kind:
+                row.append(diff.get("tipo", "modificada"))
+            if mode == MODE_KEY:
+                row.append(diff.get("clave", ""))
+            table.add_row(*row, diff["v1"], diff["v2"])
+
+        if len(diffs) > 30:
+            filler = [""] * (len(table.columns) - 2)
+            table.add_row("...", *filler, f"+{len(diffs) - 30} mas")
+
+        console.print(table)
+
+    _offer_report(path1, path2, result)
+
+
+def ask_compare_options(offer_formulas: bool) -> tuple[str, str, Tolerance | None, bool]:
+    """Pregunta como comparar: (modo, columnas clave, tolerancia, formulas).
+
+    Lo usan este menu y el de comparacion de carpetas (tools.excel_batch).
+    """
+    mode = Prompt.ask(
+        "[bold]Emparejar filas por[/bold] ([bold]p[/bold]osicion / "
+        "[bold]a[/bold]linear contenido / [bold]c[/bold]olumnas clave)",
+        # Por posicion es en streaming; alinear tiene las dos hojas en memoria
+        choices=["p", "a", "c"], default="p",
+    )
+    mode = {"p": MODE_POSITION, "a": MODE_ALIGN, "c": MODE_KEY}[mode]
+    keys = ""
+    if mode == MODE_KEY:
+        keys = Prompt.ask(
+            "[bold]Columnas clave[/bold] [dim](encabezado o letra, ej. RFC o A,C)[/dim]"
+        ).strip()
+        if not keys:
+            mode = MODE_ALIGN
+    tolerance = _ask_tolerance()
+    formulas = False
+    if offer_formulas:
+        formulas = Prompt.ask(
+            "[bold]Comparar tambien formulas?[/bold] [dim](una formula distinta con el mismo resultado)[/dim]",
+            choices=["s", "n"], default="n",
+        ) == "s"
+    return mode, keys, tolerance, formulas
+
+
+def _ask_tolerance() -> Tolerance | None:
+    """Pregunta si comparar numeros con tolerancia; None para comparacion exacta."""
+    use = Prompt.ask(
+        "[bold]Ignorar diferencias numericas minimas?[/bold] [dim](redondeos, 0.1+0.2)[/dim]",
+        choices=["s", "n"], default="n",
+    )
+    if use == "n":
+        return None
+    while True:
+        try:
+            abs_tol = float(Prompt.ask("[bold]Tolerancia absoluta[/bold]", default="0.005"))
+            rel_pct = float(Prompt.ask("[bold]Tolerancia relativa (%)[/bold]", default="0"))
+        except ValueError:
+            console.print("[red]Escribe un numero, ej. 0.01[/red]")
+            continue
+        if abs_tol < 0 or rel_pct < 0:
+            console.print("[red]La tolerancia no puede ser negativa.[/red]")
+            continue
+        break
+    text_numbers = Prompt.ask(
+        "[bold]Tratar texto numerico (\"1,250.00\") igual que el numero?[/bold]",
+        choices=["s", "n"], default="s",
+    )
+    return Tolerance(abs_tol, rel_pct / 100, text_numbers == "s")
+
+
+def _print_totals(totals: dict) -> None:
+    """Tabla de totales por columna; primero las columnas que no cuadran."""
+    for sheet_name, columns in totals.items():
+        columns = sorted(columns, key=lambda c: c["cuadra"])
+        table = Table(title=f"Totales: {sheet_name}")
+        table.add_column("Columna", style="bold cyan")
+        table.add_column("Archivo 1", justify="right")
+        table.add_column("Archivo 2", justify="right")
+        table.add_column("Diferencia", justify="right")
+        for col in columns[:20]:
+            table.add_row(
+                col["columna"], f"{col['total1']:,.2f}", f"{col['total2']:,.2f}",
+                f"{col['diferencia']:,.2f}", style=None if col["cuadra"] else "red",
+            )
+        if len(columns) > 20:
+            table.add_row("...", "", "", f"+{len(columns) - 20} mas")
+        console.print(table)
+
+
+def _offer_report(path1: str, path2: str, result: dict) -> None:
+    """Ofrece guardar las diferencias: libro de diferencias, HTML o copia marcada."""
+    # Marcar en rojo solo se puede sobre un .xlsx/.xlsm y carga el archivo 1 completo
+    can_mark = os.path.splitext(path1)[1].lower() in XLSX_PACKAGE_EXTENSIONS
+    choices = ["d", "h", "m", "n"] if can_mark else ["d", "h", "n"]
+    choice = Prompt.ask(
+        "\n[bold]Generar reporte?[/bold] ([bold]d[/bold]iferencias .xlsx / "
+        "[bold]h[/bold]tml lado a lado"
+        + (" / [bold]m[/bold]arcar en copia del archivo 1" if can_mark else "")
+        + " / [bold]n[/bold]o)",
+        choices=choices, default="d",
+    )
+    if choice == "n":
+        return
 
-            console.print(table)
+    base = os.path.splitext(path1)[0]
+    default = {
+        "d": f"{base}_diferencias.xlsx",
+        "h": f"{base}_diferencias.html",
+        "m": f"{base}_comparado{os.path.splitext(path1)[1]}",
+    }[choice]
+    output = Prompt.ask("[bold]Ruta del reporte[/bold]", default=default).strip().strip('"')
 
-        # Ofrecer generar reporte
-        gen_report = Prompt.ask(
-            "\n[bold]Generar reporte con diferencias marcadas?[/bold]",
-            choices=["s", "n"], default="s",
-        )
-        if gen_report == "s":
-            base, ext = os.path.splitext(path1)
-            output = f"{base}_comparado{ext}"
-            output = Prompt.ask("[bold]Ruta del reporte[/bold]", default=output).strip().strip('"')
-            result["_wb1"] = wb1
+    try:
+        if choice == "h":
+            write_diff_html(result, path1, path2, output)
+        elif choice == "d":
+            openpyxl = _get_openpyxl()
+            if not openpyxl:
+                return
+            write_diff_workbook(result, path1, path2, output, openpyxl)
+        else:
             _generate_diff_report(path1, path2, result, output)
-            console.print(f"\n[bold green]Reporte guardado: {output}[/bold green]")
-    finally:
-        if wb1:
-            wb1.close()
-        if wb2:
-            wb2.close()
+    except OSError as e:
+        console.print(f"[red]No se pudo guardar el reporte:[/red] {e}")
+        return
+    console.print(f"\n[bold green]Reporte guardado: {output}[/bold green]")
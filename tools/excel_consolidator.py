@@ -1,12 +1,18 @@
-"""Consolidador de libros Excel: unir archivos o unir hojas."""
+"""Consolidador de libros Excel: unir archivos o unir hojas.
+
+Los libros de origen se leen con la cache de tools._workbook_cache
+(valores, y estilos al unir archivos): volver a consolidar los mismos
+archivos sin cambios no los vuelve a parsear.
+"""
 
 import os
-import zipfile
 
 from rich.prompt import Prompt
 from rich.panel import Panel
 from rich import box
 
+from tools._workbook_cache import CachedWorkbook
+from tools._xlsx_package import PACKAGE_ERRORS
 from utils import get_openpyxl as _get_openpyxl, console
 
 
@@ -29,42 +35,60 @@ def _merge_files(paths: list[str], output: str) -> int:
 
     for path in paths:
         try:
-            src_wb = openpyxl.load_workbook(path, data_only=True)
-        except (OSError, KeyError, zipfile.BadZipFile) as e:
+            src_wb = CachedWorkbook(path)
+        except PACKAGE_ERRORS as e:
             console.print(f"  [red]No se pudo abrir {os.path.basename(path)}: {e}[/red]")
             continue
-        base = os.path.splitext(os.path.basename(path))[0]
-
-        for ws in src_wb.worksheets:
-            # Nombre unico para la hoja (max 31 chars, limite de Excel)
-            sheet_name = f"{base}_{ws.title}"[:31]
-            existing = {s.title for s in dest_wb.worksheets}
-            if sheet_name in existing:
-                # Agregar sufijo numerico si el nombre truncado ya existe
-                for n in range(2, 100):
-                    suffix = f"_{n}"
-                    candidate = f"{base}_{ws.title}"[:31 - len(suffix)] + suffix
-                    if candidate not in existing:
-                        sheet_name = candidate
-                        break
-            dest_ws = dest_wb.create_sheet(title=sheet_name)
-
-            for row in ws.iter_rows():
-                for cell in row:
-                    dest_cell = dest_ws.cell(row=cell.row, column=cell.column, value=cell.value)
-                    if cell.has_style:
-                        dest_cell.font = copy(cell.font)
-                        dest_cell.fill = copy(cell.fill)
-                        dest_cell.number_format = cell.number_format
-                        dest_cell.alignment = copy(cell.alignment)
-
-            # Copiar anchos de columna
-            for col_letter, dim in ws.column_dimensions.items():
-                dest_ws.column_dimensions[col_letter].width = dim.width
-
-            total_sheets += 1
-
-        src_wb.close()
+        added = []
+        try:
+            styles = src_wb.cell_styles()
+            base = os.path.splitext(os.path.basename(path))[0]
+
+            for title in src_wb.sheetnames:
+                # Nombre unico para la hoja (max 31 chars, limite de Excel)
+                sheet_name = f"{base}_{title}"[:31]
+                existing = {s.title for s in dest_wb.worksheets}
+                if sheet_name in existing:
+                    # Agregar sufijo numerico si el nombre truncado ya existe
+                    for n in range(2, 100):
+                        suffix = f"_{n}"
+                        candidate = f"{base}_{title}"[:31 - len(suffix)] + suffix
+                        if candidate not in existing:
+                            sheet_name = candidate
+                            break
+                dest_ws = dest_wb.create_sheet(title=sheet_name)
+                added.append(dest_ws)
+
+                for row_num, (values, _, style_ids) in enumerate(src_wb.rows(title, styles=True), 1):
+                    for col in range(1, max(len(values), len(style_ids)) + 1):
+                        value = values[col - 1] if col <= len(values) else None
+                        style_id = style_ids[col - 1] if col <= len(style_ids) else None
+                        if value is None and style_id is None:
+                            continue
+                        dest_cell = dest_ws.cell(row=row_num, column=col, value=value)
+                        if style_id is not None and style_id < len(styles):
+                            style = styles[style_id]
+                            dest_cell.font = copy(style["font"])
+                            dest_cell.fill = copy(style["fill"])
+                            dest_cell.number_format = style["number_format"]
+                            dest_cell.alignment = copy(style["alignment"])
+
+                # Copiar anchos de columna
+                for col_letter, width in src_wb.column_widths(title).items():
+                    dest_ws.column_dimensions[col_letter].width = width
+        except PACKAGE_ERRORS as e:
+            # Hoja danada a media lectura: no dejar ese archivo a medias
+            console.print(f"  [red]No se pudo leer {os.path.basename(path)}: {e}[/red]")
+            for ws in added:
+                dest_wb.remove(ws)
+            added = []
+        finally:
+            src_wb.close()
+        total_sheets += len(added)
+
+    if not total_sheets:
+        dest_wb.close()
+        return 0
 
     dest_wb.save(output)
     dest_wb.close()
@@ -82,8 +106,8 @@ def _merge_sheets(filepath: str, output: str) -> int:
         return 0
 
     try:
-        src_wb = openpyxl.load_workbook(filepath, data_only=True)
-    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        src_wb = CachedWorkbook(filepath)
+    except PACKAGE_ERRORS as e:
         console.print(f"  [red]No se pudo abrir el archivo: {e}[/red]")
         return 0
     dest_wb = openpyxl.Workbook()
@@ -91,16 +115,21 @@ def _merge_sheets(filepath: str, output: str) -> int:
     dest_ws.title = "Consolidado"
 
     current_row = 1
-    for idx, ws in enumerate(src_wb.worksheets):
-        for row_num, row in enumerate(ws.iter_rows(values_only=True), 1):
-            # Skip header en hojas 2+ (fila 1)
-            if idx > 0 and row_num == 1:
-                continue
-            for col, value in enumerate(row, 1):
-                dest_ws.cell(row=current_row, column=col, value=value)
-            current_row += 1
-
-    src_wb.close()
+    try:
+        for idx, title in enumerate(src_wb.sheetnames):
+            for row_num, (row, _) in enumerate(src_wb.rows(title), 1):
+                # Skip header en hojas 2+ (fila 1)
+                if idx > 0 and row_num == 1:
+                    continue
+                for col, value in enumerate(row, 1):
+                    dest_ws.cell(row=current_row, column=col, value=value)
+                current_row += 1
+    except PACKAGE_ERRORS as e:
+        console.print(f"  [red]No se pudo leer el archivo: {e}[/red]")
+        dest_wb.close()
+        return 0
+    finally:
+        src_wb.close()
     dest_wb.save(output)
     dest_wb.close()
     return current_row - 1
@@ -161,6 +190,9 @@ def consolidator_menu() -> None:
         if not os.path.isfile(filepath):
             console.print("[red]Archivo no encontrado.[/red]")
             return
+        if not filepath.lower().endswith((".xlsx", ".xlsm")):
+            console.print("[red]Solo se soportan archivos .xlsx y .xlsm[/red]")
+            return
 
         base, ext = os.path.splitext(filepath)
         output = Prompt.ask(
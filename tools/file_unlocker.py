@@ -8,6 +8,7 @@ import subprocess
 from rich.prompt import Prompt
 from rich.table import Table
 
+from tools._powershell import run_powershell
 from utils import ps_escape, console
 
 
@@ -115,11 +116,7 @@ def _fallback_find_locking(filepath: str) -> list[dict]:
             f'Get-Process | Where-Object {{ $_.Modules.FileName -contains "{abs_path}" }} '
             f"| Select-Object Id, ProcessName | ConvertTo-Json -Compress"
         )
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command", cmd],
-            capture_output=True, text=True, timeout=15,
-            creationflags=subprocess.CREATE_NO_WINDOW,
-        )
+        result = run_powershell(cmd, timeout=15)
         if result.stdout.strip():
             data = json.loads(result.stdout)
             if isinstance(data, dict):
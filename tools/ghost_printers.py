@@ -8,6 +8,7 @@ from rich.prompt import Prompt
 from rich.table import Table
 
 from tools import is_admin
+from tools._powershell import run_powershell
 from utils import ps_escape, console
 
 
@@ -15,12 +16,10 @@ from utils import ps_escape, console
 def _get_printers() -> list[dict]:
     """Obtiene la lista de impresoras instaladas via PowerShell."""
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command",
-             "Get-Printer | Select-Object Name, DriverName, PortName, Shared, PrinterStatus "
-             "| ConvertTo-Json -Compress"],
-            capture_output=True, text=True, timeout=30,
-            creationflags=subprocess.CREATE_NO_WINDOW,
+        result = run_powershell(
+            "Get-Printer | Select-Object Name, DriverName, PortName, Shared, PrinterStatus "
+            "| ConvertTo-Json -Compress",
+            timeout=30,
         )
         if result.returncode != 0:
             return []
@@ -48,12 +47,7 @@ def _identify_ghosts(printers: list[dict]) -> list[dict]:
 def _remove_printer(name: str) -> bool:
     """Elimina una impresora por nombre (requiere admin)."""
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command",
-             f'Remove-Printer -Name "{ps_escape(name)}"'],
-            capture_output=True, text=True, timeout=15,
-            creationflags=subprocess.CREATE_NO_WINDOW,
-        )
+        result = run_powershell(f'Remove-Printer -Name "{ps_escape(name)}"', timeout=15)
         return result.returncode == 0
     except (subprocess.TimeoutExpired, OSError):
         return False
@@ -0,0 +1,438 @@
+"""Carving de documentos Office en USBs/SD formateadas o imagenes crudas.
+
+Recorre el dispositivo de forma secuencial buscando firmas ZIP (xlsx, docx,
+pptx) y OLE2 (xls, doc, ppt), reconstruye la extension de cada archivo
+usando su estructura interna y lo escribe en la carpeta destino.
+"""
+
+import mmap
+import os
+import re
+import struct
+
+from rich.progress import Progress, BarColumn, DownloadColumn, TextColumn, TransferSpeedColumn
+from rich.prompt import Prompt
+from rich.table import Table
+
+from tools import is_admin
+from utils import format_size, raw_device_path, read_aligned, console
+
+
+# Firmas buscadas
+ZIP_LOCAL = b"PK\x03\x04"
+ZIP_CENTRAL = b"PK\x01\x02"
+ZIP_DESCRIPTOR = b"PK\x07\x08"
+ZIP_EOCD = b"PK\x05\x06"
+ZIP64_EOCD = b"PK\x06\x06"
+ZIP64_LOCATOR = b"PK\x06\x07"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# La firma mas larga: cuanto puede cruzar el limite de un bloque
+_MAX_SIG = len(OLE_MAGIC)
+
+# Los archivos empiezan al inicio de un cluster: solo aceptar firmas alineadas
+SECTOR_SIZE = 512
+
+# Lectura secuencial en bloques grandes (cercano a la velocidad del disco)
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Limite por archivo recuperado (evita seguir estructuras corruptas sin fin)
+MAX_FILE_SIZE = 512 * 1024 * 1024
+
+# Sectores especiales de la FAT de OLE2
+_FREESECT = 0xFFFFFFFF
+_ENDOFCHAIN = 0xFFFFFFFE
+_FATSECT = 0xFFFFFFFD
+_MAXREGSECT = 0xFFFFFFFA
+
+# Stream principal de cada tipo de documento OLE2
+_OLE_MAIN_STREAMS = {
+    "workbook": ".xls",
+    "book": ".xls",
+    "worddocument": ".doc",
+    "powerpoint document": ".ppt",
+}
+
+
+class _RawImage:
+    """Acceso de solo lectura a un dispositivo o imagen cruda.
+
+    Usa mmap cuando es posible (archivos de imagen) y lecturas en bloques
+    alineados cuando no (volumenes crudos de Windows).
+    """
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb", buffering=0)
+        self._mm = None
+        self._buf_start = -1
+        self._buf = b""
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                self._mm.madvise(mmap.MADV_SEQUENTIAL)
+            self.size = len(self._mm)
+        except (OSError, ValueError):
+            self._mm = None
+            try:
+                self.size = self._f.seek(0, os.SEEK_END) or None
+            except OSError:
+                self.size = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        self._f.close()
+
+    def read(self, offset: int, size: int) -> bytes:
+        if self._mm is not None:
+            return self._mm[offset:offset + size]
+        return read_aligned(self._f, offset, size)
+
+    def _window(self, pos: int) -> tuple[int, bytes]:
+        """Devuelve el bloque (alineado) que contiene `pos`, reutilizando el ultimo leido."""
+        start = pos - pos % CHUNK_SIZE
+        if start != self._buf_start:
+            # Leer un sector extra para firmas que cruzan el limite del bloque
+            self._buf = read_aligned(self._f, start, CHUNK_SIZE + 4096)
+            self._buf_start = start
+        return start, self._buf
+
+    def search(self, pattern: re.Pattern, start: int, end: int | None = None) -> int:
+        """Busca `pattern` desde `start`; devuelve el offset absoluto o -1.
+
+        Cada byte se revisa una sola vez: todas las firmas van en la misma
+        regex y el bloque leido se reutiliza mientras `start` caiga en el.
+        """
+        if self._mm is not None:
+            match = pattern.search(self._mm, start, end if end is not None else len(self._mm))
+            return match.start() if match else -1
+        pos = start
+        while end is None or pos < end:
+            base, buf = self._window(pos)
+            if len(buf) <= pos - base:
+                return -1
+            limit = min(CHUNK_SIZE, len(buf))
+            match = pattern.search(buf, pos - base, limit + _MAX_SIG - 1)
+            if match:
+                hit = base + match.start()
+                return hit if end is None or hit < end else -1
+            if len(buf) < CHUNK_SIZE:
+                return -1
+            pos = base + CHUNK_SIZE
+        return -1
+
+
+def _signatures(*sigs: bytes) -> re.Pattern:
+    """Regex que encuentra cualquiera de las firmas en una sola pasada."""
+    return re.compile(b"|".join(re.escape(s) for s in sigs))
+
+
+# Inicio de archivo a recuperar / siguiente header dentro de un ZIP
+_FILE_START = _signatures(ZIP_LOCAL, OLE_MAGIC)
+_NEXT_ZIP_HEADER = _signatures(ZIP_LOCAL, ZIP_CENTRAL)
+
+
+def _zip64_sizes(extra: bytes) -> tuple[int, int] | None:
+    """Extrae (tamano, tamano_comprimido) del campo extra Zip64 (0x0001)."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<HH", extra, pos)
+        if tag == 0x0001 and length >= 16 and pos + 20 <= len(extra):
+            return struct.unpack_from("<QQ", extra, pos + 4)
+        pos += 4 + length
+    return None
+
+
+def _zip_extent(image: _RawImage, start: int) -> tuple[int, list[str]] | None:
+    """Recorre un ZIP desde su primer local header hasta el fin del directorio central.
+
+    Returns:
+        (tamano_total, nombres_de_miembros) o None si la estructura no cierra.
+    """
+    pos = start
+    limit = start + MAX_FILE_SIZE
+    names = []
+    while pos < limit:
+        sig = image.read(pos, 4)
+        if sig == ZIP_LOCAL:
+            hdr = image.read(pos, 30)
+            if len(hdr) < 30:
+                return None
+            flags, = struct.unpack_from("<H", hdr, 6)
+            csize, = struct.unpack_from("<I", hdr, 18)
+            nlen, xlen = struct.unpack_from("<HH", hdr, 26)
+            names.append(image.read(pos + 30, nlen).decode("utf-8", "replace"))
+            data_start = pos + 30 + nlen + xlen
+            if csize == 0xFFFFFFFF:
+                sizes = _zip64_sizes(image.read(pos + 30 + nlen, xlen))
+                if sizes is None:
+                    return None
+                csize = sizes[1]
+            if flags & 0x08 and csize == 0:
+                # Tamano desconocido (data descriptor): saltar al siguiente header
+                pos = image.search(_NEXT_ZIP_HEADER, data_start, limit)
+                if pos == -1:
+                    return None
+                continue
+            pos = data_start + csize
+            if flags & 0x08:
+                pos += 16 if image.read(pos, 4) == ZIP_DESCRIPTOR else 12
+        elif sig == ZIP_CENTRAL:
+            hdr = image.read(pos, 46)
+            if len(hdr) < 46:
+                return None
+            nlen, xlen, clen = struct.unpack_from("<HHH", hdr, 28)
+            pos += 46 + nlen + xlen + clen
+        elif sig == ZIP64_EOCD:
+            raw = image.read(pos + 4, 8)
+            if len(raw) < 8:
+                return None
+            record_size, = struct.unpack_from("<Q", raw)
+            pos += 12 + record_size
+        elif sig == ZIP64_LOCATOR:
+            pos += 20
+        elif sig == ZIP_EOCD:
+            hdr = image.read(pos, 22)
+            if len(hdr) < 22:
+                return None
+            clen, = struct.unpack_from("<H", hdr, 20)
+            return pos + 22 + clen - start, names
+        else:
+            return None
+    return None
+
+
+def _office_zip_extension(names: list[str]) -> str | None:
+    """Identifica el tipo de documento OOXML por sus partes internas."""
+    if "[Content_Types].xml" not in names:
+        return None
+    has_macros = any(n.endswith("vbaProject.bin") for n in names)
+    for prefix, plain, macro in (("xl/", ".xlsx", ".xlsm"),
+                                 ("word/", ".docx", ".docm"),
+                                 ("ppt/", ".pptx", ".pptm")):
+        if any(n.startswith(prefix) for n in names):
+            return macro if has_macros else plain
+    return None
+
+
+def _ole_extent(image: _RawImage, start: int) -> tuple[int, str] | None:
+    """Calcula el tamano de un documento OLE2 a partir de su FAT.
+
+    Returns:
+        (tamano_total, extension) o None si no es un documento Office valido.
+    """
+    header = image.read(start, 512)
+    if len(header) < 512:
+        return None
+    sector_shift, = struct.unpack_from("<H", header, 0x1E)
+    if sector_shift not in (9, 12):
+        return None
+    ssize = 1 << sector_shift
+    num_fat, first_dir = struct.unpack_from("<II", header, 0x2C)
+    first_difat, num_difat = struct.unpack_from("<II", header, 0x44)
+    # Sectores que caben despues del header (sin pasarse del final de la imagen)
+    max_sectors = MAX_FILE_SIZE // ssize
+    if image.size is not None:
+        max_sectors = min(max_sectors, (image.size - start) // ssize - 1)
+    if not 0 < num_fat <= max_sectors // (ssize // 4) + 1:
+        return None
+
+    def sector(n: int) -> bytes:
+        return image.read(start + (n + 1) * ssize, ssize)
+
+    # Lista de sectores de la FAT: 109 en el header + cadena DIFAT
+    fat_sectors = [s for s in struct.unpack_from("<109I", header, 0x4C) if s <= _MAXREGSECT]
+    next_difat = first_difat
+    per_difat = ssize // 4 - 1
+    for _ in range(num_difat):
+        if next_difat >= max_sectors:
+            return None
+        data = sector(next_difat)
+        if len(data) < ssize:
+            return None
+        entries = struct.unpack(f"<{per_difat + 1}I", data)
+        fat_sectors.extend(s for s in entries[:per_difat] if s <= _MAXREGSECT)
+        next_difat = entries[-1]
+    fat_sectors = fat_sectors[:num_fat]
+    if len(fat_sectors) != num_fat or max(fat_sectors) >= max_sectors:
+        return None
+
+    fat = []
+    for s in fat_sectors:
+        data = sector(s)
+        if len(data) < ssize:
+            return None
+        fat.extend(struct.unpack(f"<{ssize // 4}I", data))
+    # Los sectores de la FAT deben estar marcados como FATSECT en la propia FAT
+    if any(fat[s] != _FATSECT for s in fat_sectors if s < len(fat)):
+        return None
+
+    last_used = max((i for i, v in enumerate(fat) if v != _FREESECT), default=-1)
+    if last_used < 0:
+        return None
+
+    # Identificar el tipo por los nombres del directorio
+    ext = None
+    current, visited = first_dir, set()
+    while current <= _MAXREGSECT and current < len(fat) and current not in visited:
+        visited.add(current)
+        data = sector(current)
+        for off in range(0, len(data) - 127, 128):
+            name_len, = struct.unpack_from("<H", data, off + 64)
+            if 2 <= name_len <= 64:
+                name = data[off:off + name_len - 2].decode("utf-16-le", "replace").lower()
+                ext = ext or _OLE_MAIN_STREAMS.get(name)
+        current = fat[current]
+    if ext is None:
+        return None
+    return (last_used + 2) * ssize, ext
+
+
+def _safe_extent(extent_fn, image: _RawImage, start: int):
+    """Extension de un hit; una estructura truncada o pisada no es documento."""
+    try:
+        return extent_fn(image, start)
+    except struct.error:
+        return None
+
+
+def _copy_range(image: _RawImage, start: int, length: int, dest: str) -> None:
+    """Escribe un rango del dispositivo a un archivo, en bloques."""
+    with open(dest, "wb") as out:
+        pos = start
+        end = start + length
+        while pos < end:
+            n = min(CHUNK_SIZE, end - pos)
+            out.write(image.read(pos, n))
+            pos += n
+
+
+def carve_image(source: str, dest_dir: str, progress_callback=None) -> list[dict]:
+    """Recupera documentos Office de un dispositivo o imagen cruda.
+
+    Args:
+        source: Ruta de la imagen (.img/.dd) o del volumen crudo (\\\\.\\E:).
+        dest_dir: Carpeta donde se escriben los archivos recuperados.
+        progress_callback: Funcion opcional que recibe el offset actual.
+
+    Returns:
+        Lista de dicts con nombre, ruta, tamano, tamano_bytes y offset.
+    """
+    recovered = []
+    os.makedirs(dest_dir, exist_ok=True)
+
+    with _RawImage(source) as image:
+        pos = 0
+        while True:
+            hit = image.search(_FILE_START, pos, image.size)
+            if hit == -1:
+                break
+            if progress_callback:
+                progress_callback(hit)
+            if hit % SECTOR_SIZE:
+                pos = hit + 1
+                continue
+
+            found = None
+            if image.read(hit, 4) == ZIP_LOCAL:
+                extent = _safe_extent(_zip_extent, image, hit)
+                if extent:
+                    length, names = extent
+                    # Saltar el ZIP completo aunque no sea Office: sus miembros
+                    # contienen mas local headers que no son inicios de archivo
+                    pos = hit + length
+                    ext = _office_zip_extension(names)
+                    if ext:
+                        found = (length, ext)
+            else:
+                extent = _safe_extent(_ole_extent, image, hit)
+                if extent:
+                    found = extent
+                    pos = hit + extent[0]
+
+            if not found:
+                pos = max(pos, hit + 1)
+                continue
+
+            length, ext = found
+            name = f"recuperado_{hit:012X}{ext}"
+            out_path = os.path.join(dest_dir, name)
+            try:
+                _copy_range(image, hit, length, out_path)
+            except OSError:
+                continue
+            recovered.append({
+                "nombre": name,
+                "ruta": out_path,
+                "tamano": format_size(length),
+                "tamano_bytes": length,
+                "offset": hit,
+            })
+
+    return recovered
+
+
+def carver_menu() -> None:
+    """Menu de recuperacion de documentos en USB/SD formateada."""
+    console.print("\n[bold cyan]Recuperar Office de USB/SD formateada[/bold cyan]\n")
+    console.print(
+        "[dim]Escribe la letra de la unidad (ej: E:) o la ruta de una imagen (.img, .dd).[/dim]"
+    )
+
+    source = Prompt.ask("[bold]Unidad o imagen[/bold]").strip().strip('"')
+    if not source:
+        return
+    source = raw_device_path(source)
+    if source.startswith("\\\\.\\") and not is_admin():
+        console.print("[red]Se requieren permisos de administrador para leer la unidad directamente.[/red]")
+        return
+    if not source.startswith("\\\\.\\") and not os.path.isfile(source):
+        console.print("[red]Archivo no encontrado.[/red]")
+        return
+
+    dest_dir = Prompt.ask(
+        "[bold]Carpeta destino[/bold]",
+        default=os.path.join(os.path.expanduser("~"), "Desktop", "Recuperados"),
+    ).strip().strip('"')
+    if source.startswith("\\\\.\\") and os.path.splitdrive(dest_dir)[0].upper() == source[4:].upper():
+        console.print("[red]La carpeta destino no puede estar en la misma unidad que se analiza.[/red]")
+        return
+
+    try:
+        with Progress(
+            TextColumn("[bold cyan]Analizando..."),
+            BarColumn(),
+            DownloadColumn(),
+            TransferSpeedColumn(),
+            console=console,
+        ) as progress:
+            task = progress.add_task("carving", total=None)
+            if not source.startswith("\\\\.\\"):
+                progress.update(task, total=os.path.getsize(source))
+            results = carve_image(
+                source, dest_dir,
+                progress_callback=lambda off: progress.update(task, completed=off),
+            )
+    except OSError as e:
+        console.print(f"[red]No se pudo leer {source}: {e}[/red]")
+        return
+
+    if not results:
+        console.print("\n[yellow]No se encontraron documentos Office recuperables.[/yellow]")
+        return
+
+    table = Table(title=f"Documentos recuperados en {dest_dir}")
+    table.add_column("#", style="bold cyan", width=4, justify="right")
+    table.add_column("Archivo", style="bold white")
+    table.add_column("Tamano", justify="right", style="green")
+    table.add_column("Offset", style="dim")
+    for i, r in enumerate(results, 1):
+        table.add_row(str(i), r["nombre"], r["tamano"], f"0x{r['offset']:X}")
+    console.print(table)
+    console.print(f"\n  [bold]Total: {len(results)} documento(s) recuperado(s)[/bold]\n")
@@ -0,0 +1,346 @@
+"""Verificacion de integridad de archivos Office candidatos a rescate.
+
+Responde "este archivo abre?" sin abrirlo en Office:
+
+- ZIP (xlsx, docx, pptx): el directorio central debe existir, cada
+  entrada debe tener su encabezado local dentro del archivo (detecta
+  truncados) y las partes clave ([Content_Types].xml, workbook.xml,
+  document.xml, hojas, diapositivas) deben descomprimir con CRC
+  correcto. Las partes grandes solo se descomprimen al inicio salvo que
+  se pida revision profunda.
+- OLE2 (xls, doc, ppt): se recorren la DIFAT, la FAT y las cadenas del
+  directorio y del stream principal buscando sectores fuera del archivo,
+  ciclos y cadenas mas cortas que el stream.
+
+La revision corre en un pool de procesos (es CPU: descompresion y CRC) y
+los veredictos se guardan en cache por (ruta, tamano, mtime).
+"""
+
+import os
+import struct
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from config import OFFICE_EXTENSIONS
+
+
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_LOCAL = b"PK\x03\x04"
+
+# Estados posibles de la columna "Salud"
+OK = "OK"
+DAMAGED = "Danado"
+UNCHECKED = "Sin revisar"
+MISSING = "No existe"
+
+# Partes clave mas chicas que esto se descomprimen completas (CRC incluido)
+KEY_PART_FULL = 4 * 1024 * 1024
+
+# De las partes clave grandes solo se descomprime este prefijo
+KEY_PART_PREFIX = 64 * 1024
+
+# Por debajo de esta cantidad de archivos no vale la pena arrancar procesos
+POOL_MIN_FILES = 8
+
+# Sectores especiales de OLE2
+_MAXREGSECT = 0xFFFFFFFA
+_ENDOFCHAIN = 0xFFFFFFFE
+
+# Stream principal de cada tipo OLE2 (cualquiera de los nombres basta)
+_OLE_MAIN_STREAMS = {
+    ".xls": ("Workbook", "Book"),
+    ".doc": ("WordDocument",),
+    ".ppt": ("PowerPoint Document",),
+}
+
+# Parte principal de cada tipo OOXML
+_ZIP_MAIN_PARTS = {
+    "xl/": "xl/workbook.xml",
+    "word/": "word/document.xml",
+    "ppt/": "ppt/presentation.xml",
+}
+
+# Cache de veredictos: (ruta, tamano, mtime, profunda) -> (estado, detalle)
+_VERDICT_CACHE: dict[tuple[str, int, float, bool], tuple[str, str]] = {}
+
+
+class _Damaged(Exception):
+    """Estructura invalida; el mensaje es el detalle para el usuario."""
+
+
+# ─── ZIP ──────────────────────────────────────────────────────────
+
+
+def _is_key_part(name: str) -> bool:
+    if name == "[Content_Types].xml" or name in _ZIP_MAIN_PARTS.values():
+        return True
+    return name.startswith(("xl/worksheets/sheet", "ppt/slides/slide")) and name.endswith(".xml")
+
+
+def _read_part(zf: zipfile.ZipFile, info: zipfile.ZipInfo, full: bool) -> None:
+    """Descomprime una parte; con `full` zipfile valida el CRC al llegar al final."""
+    with zf.open(info) as f:
+        if full:
+            while f.read(1024 * 1024):
+                pass
+        else:
+            f.read(KEY_PART_PREFIX)
+
+
+def _check_zip(f, file_size: int, deep: bool) -> str:
+    try:
+        zf = zipfile.ZipFile(f)
+    except zipfile.BadZipFile:
+        raise _Damaged("sin directorio central (archivo truncado?)")
+
+    with zf:
+        infos = zf.infolist()
+        names = {i.filename for i in infos}
+        if "[Content_Types].xml" not in names:
+            raise _Damaged("falta [Content_Types].xml")
+        main = next((part for prefix, part in _ZIP_MAIN_PARTS.items()
+                     if any(n.startswith(prefix) for n in names)), None)
+        if main is None:
+            raise _Damaged("no es un documento Office")
+        if main not in names:
+            raise _Damaged(f"falta {main}")
+
+        # Encabezados locales: baratos (una lectura de 30 bytes por entrada)
+        for info in infos:
+            f.seek(info.header_offset)
+            header = f.read(30)
+            if len(header) < 30 or header[:4] != ZIP_LOCAL:
+                raise _Damaged(f"encabezado local danado: {info.filename}")
+            name_len, extra_len = struct.unpack_from("<HH", header, 26)
+            if info.header_offset + 30 + name_len + extra_len + info.compress_size > file_size:
+                raise _Damaged(f"{info.filename} queda fuera del archivo (truncado)")
+
+        try:
+            for info in infos:
+                if deep:
+                    _read_part(zf, info, True)
+                elif _is_key_part(info.filename):
+                    _read_part(zf, info, info.file_size <= KEY_PART_FULL)
+        except zipfile.BadZipFile as e:
+            raise _Damaged(str(e))
+        except (zlib.error, EOFError, NotImplementedError) as e:
+            raise _Damaged(f"{info.filename}: no se puede descomprimir ({e})")
+        except RuntimeError as e:  # partes cifradas
+            raise _Damaged(f"{info.filename}: {e}")
+
+    return f"{len(infos)} partes"
+
+
+# ─── OLE2 ─────────────────────────────────────────────────────────
+
+
+def _ole_chain(table: list[int], start: int, limit: int, what: str) -> list[int]:
+    """Recorre una cadena validando limites y ciclos."""
+    chain = []
+    seen = set()
+    current = start
+    while current != _ENDOFCHAIN:
+        if current > _MAXREGSECT or current >= limit or current >= len(table):
+            raise _Damaged(f"cadena de {what} apunta fuera del archivo")
+        if current in seen:
+            raise _Damaged(f"cadena de {what} con ciclo")
+        seen.add(current)
+        chain.append(current)
+        current = table[current]
+    return chain
+
+
+def _check_ole(f, file_size: int, ext: str, deep: bool) -> str:
+    header = f.read(512)
+    if len(header) < 512:
+        raise _Damaged("encabezado OLE2 incompleto")
+    sector_shift, mini_shift = struct.unpack_from("<HH", header, 0x1E)
+    if sector_shift not in (9, 12) or mini_shift != 6:
+        raise _Damaged("tamano de sector invalido")
+    ssize = 1 << sector_shift
+    num_fat, first_dir = struct.unpack_from("<II", header, 0x2C)
+    cutoff, first_minifat, num_minifat, first_difat, num_difat = (
+        struct.unpack_from("<IIIII", header, 0x38)
+    )
+    sectors = (file_size - ssize) // ssize  # sectores completos tras el encabezado
+
+    def sector(n: int) -> bytes:
+        f.seek((n + 1) * ssize)
+        data = f.read(ssize)
+        if len(data) < ssize:
+            raise _Damaged("sector truncado")
+        return data
+
+    # DIFAT -> lista de sectores de la FAT
+    fat_sectors = [s for s in struct.unpack_from("<109I", header, 0x4C) if s <= _MAXREGSECT]
+    per_difat = ssize // 4 - 1
+    current, seen = first_difat, set()
+    for _ in range(num_difat):
+        if current >= sectors or current in seen:
+            raise _Damaged("cadena DIFAT invalida")
+        seen.add(current)
+        entries = struct.unpack(f"<{per_difat + 1}I", sector(current))
+        fat_sectors.extend(s for s in entries[:per_difat] if s <= _MAXREGSECT)
+        current = entries[-1]
+    fat_sectors = fat_sectors[:num_fat]
+    if len(fat_sectors) != num_fat:
+        raise _Damaged("FAT incompleta")
+    if any(s >= sectors for s in fat_sectors):
+        raise _Damaged("FAT fuera del archivo (truncado?)")
+
+    fat = []
+    for s in fat_sectors:
+        fat.extend(struct.unpack(f"<{ssize // 4}I", sector(s)))
+
+    # Directorio
+    dir_chain = _ole_chain(fat, first_dir, sectors, "directorio")
+    directory = b"".join(sector(s) for s in dir_chain)
+    entries = {}
+    root = None
+    for off in range(0, len(directory) - 127, 128):
+        name_len, obj_type = struct.unpack_from("<HB", directory, off + 64)
+        if obj_type == 0:
+            continue
+        start, size = struct.unpack_from("<IQ", directory, off + 116)
+        if ssize == 512:
+            size &= 0xFFFFFFFF
+        name = directory[off:off + max(name_len - 2, 0)].decode("utf-16-le", "replace")
+        if obj_type == 5 and root is None:
+            root = (start, size)
+        elif obj_type == 2:
+            entries[name] = (start, size)
+    if root is None:
+        raise _Damaged("falta la entrada raiz del directorio")
+
+    if "EncryptionInfo" in entries and "EncryptedPackage" in entries:
+        return "protegido con contrasena"
+
+    wanted = _OLE_MAIN_STREAMS.get(ext)
+    if wanted:
+        main = next((n for n in wanted if n in entries), None)
+        if main is None:
+            raise _Damaged(f"falta el stream {wanted[0]}")
+        to_check = entries.items() if deep else [(main, entries[main])]
+    else:
+        to_check = entries.items() if deep else []
+
+    minifat = None
+    mini_sectors = 0
+    for name, (start, size) in to_check:
+        if size == 0:
+            continue
+        if size >= cutoff:
+            chain = _ole_chain(fat, start, sectors, name)
+            if len(chain) * ssize < size:
+                raise _Damaged(f"stream {name} incompleto")
+        else:
+            if minifat is None:
+                mf_chain = _ole_chain(fat, first_minifat, sectors, "MiniFAT")[:num_minifat]
+                minifat = []
+                for s in mf_chain:
+                    minifat.extend(struct.unpack(f"<{ssize // 4}I", sector(s)))
+                mini_sectors = root[1] // 64
+                _ole_chain(fat, root[0], sectors, "mini stream")
+            chain = _ole_chain(minifat, start, mini_sectors, name)
+            if len(chain) * 64 < size:
+                raise _Damaged(f"stream {name} incompleto")
+
+    return f"{len(entries)} streams"
+
+
+# ─── API ──────────────────────────────────────────────────────────
+
+
+def check_file(path: str, deep: bool = False) -> tuple[str, str]:
+    """Revisa un archivo y devuelve (estado, detalle).
+
+    Args:
+        path: Ruta del archivo.
+        deep: Descomprimir y validar el CRC de todas las partes, no solo
+            el inicio de las partes clave grandes.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            magic = f.read(8)
+            f.seek(0)
+            if size == 0:
+                return DAMAGED, "archivo vacio"
+            if magic.startswith(ZIP_LOCAL):
+                return OK, _check_zip(f, size, deep)
+            if magic == OLE_MAGIC:
+                return OK, _check_ole(f, size, ext, deep)
+            if ext == ".rtf":
+                return (OK, "RTF") if magic.startswith(b"{\\rtf") else (DAMAGED, "no inicia como RTF")
+            if ext == ".csv":
+                return UNCHECKED, "texto plano"
+            if not magic.strip(b"\x00"):
+                return DAMAGED, "contenido en ceros"
+            return DAMAGED, "encabezado desconocido"
+    except _Damaged as e:
+        return DAMAGED, str(e)
+    except (OSError, struct.error, ValueError) as e:
+        return DAMAGED, f"no se pudo leer ({e})"
+
+
+def _check_worker(args: tuple[str, bool]) -> tuple[str, str]:
+    return check_file(*args)
+
+
+def validate_results(results: list[dict], deep: bool = False, progress_callback=None) -> dict:
+    """Agrega "salud" y "salud_detalle" a cada resultado.
+
+    Usa la cache por (ruta, tamano, mtime) y reparte el resto en un pool
+    de procesos.
+
+    Args:
+        progress_callback: Funcion opcional (revisados, total).
+
+    Returns:
+        Conteo por estado.
+    """
+    pending = []
+    for r in results:
+        source = r.get("ruta_fuente") or r.get("ruta", "")
+        ext = os.path.splitext(r.get("nombre", "") or source)[1].lower()
+        if ext not in OFFICE_EXTENSIONS:
+            r["salud"], r["salud_detalle"] = UNCHECKED, ""
+            continue
+        try:
+            st = os.stat(source)
+        except OSError:
+            r["salud"], r["salud_detalle"] = MISSING, ""
+            continue
+        key = (source, st.st_size, st.st_mtime, deep)
+        verdict = _VERDICT_CACHE.get(key)
+        if verdict is None:
+            pending.append((r, key))
+        else:
+            r["salud"], r["salud_detalle"] = verdict
+
+    total = len(pending)
+    if progress_callback:
+        progress_callback(0, total)
+    jobs = [(key[0], deep) for _, key in pending]
+    if total < POOL_MIN_FILES:
+        verdicts = map(_check_worker, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 2, total))
+        verdicts = pool.map(_check_worker, jobs, chunksize=max(1, total // 64))
+    try:
+        for done, ((r, key), verdict) in enumerate(zip(pending, verdicts), 1):
+            _VERDICT_CACHE[key] = verdict
+            r["salud"], r["salud_detalle"] = verdict
+            if progress_callback:
+                progress_callback(done, total)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    counts: dict[str, int] = {}
+    for r in results:
+        counts[r["salud"]] = counts.get(r["salud"], 0) + 1
+    return counts
@@ -7,6 +7,7 @@ from rich.prompt import Prompt
 from rich.table import Table
 
 from tools import is_admin
+from tools._powershell import run_powershell
 from utils import ps_escape, console
 
 
@@ -14,12 +15,10 @@ from utils import ps_escape, console
 def _get_printers() -> list[dict]:
     """Obtiene la lista de impresoras instaladas via PowerShell."""
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command",
-             "Get-Printer | Select-Object Name, DriverName, PortName, Shared, ShareName "
-             "| ConvertTo-Json -Compress"],
-            capture_output=True, text=True, timeout=30,
-            creationflags=subprocess.CREATE_NO_WINDOW,
+        result = run_powershell(
+            "Get-Printer | Select-Object Name, DriverName, PortName, Shared, ShareName "
+            "| ConvertTo-Json -Compress",
+            timeout=30,
         )
         if result.returncode != 0:
             return []
@@ -106,11 +105,9 @@ def _share_printer() -> None:
 
     try:
         with console.status("[bold green]Compartiendo impresora..."):
-            result = subprocess.run(
-                ["powershell", "-NoProfile", "-Command",
-                 f'Set-Printer -Name "{ps_escape(name)}" -Shared $true -ShareName "{ps_escape(share_name)}"'],
-                capture_output=True, text=True, timeout=15,
-                creationflags=subprocess.CREATE_NO_WINDOW,
+            result = run_powershell(
+                f'Set-Printer -Name "{ps_escape(name)}" -Shared $true -ShareName "{ps_escape(share_name)}"',
+                timeout=15,
             )
 
         if result.returncode == 0:
@@ -169,11 +166,8 @@ def _unshare_printer() -> None:
 
     try:
         with console.status("[bold green]Quitando comparticion..."):
-            result = subprocess.run(
-                ["powershell", "-NoProfile", "-Command",
-                 f'Set-Printer -Name "{ps_escape(name)}" -Shared $false'],
-                capture_output=True, text=True, timeout=15,
-                creationflags=subprocess.CREATE_NO_WINDOW,
+            result = run_powershell(
+                f'Set-Printer -Name "{ps_escape(name)}" -Shared $false', timeout=15
             )
 
         if result.returncode == 0:
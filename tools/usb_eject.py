@@ -5,6 +5,7 @@ import subprocess
 from rich.prompt import Prompt
 
 from tools import get_removable_drives
+from tools._powershell import run_powershell
 from utils import ps_escape, console
 
 
@@ -22,14 +23,11 @@ def _eject_drive(drive_letter: str) -> None:
         f'$shell = New-Object -ComObject Shell.Application; '
         f'$item = $shell.Namespace(17).ParseName("{ps_escape(drive)}"); '
         f'if ($item) {{ $item.InvokeVerb("Eject") }} '
-        f'else {{ exit 1 }}'
+        f'else {{ throw "No se encontro la unidad {ps_escape(drive)}" }}'
     )
 
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command", ps_script],
-            capture_output=True, text=True, timeout=30,
-        )
+        result = run_powershell(ps_script, timeout=30)
         if result.returncode != 0:
             stderr = result.stderr.strip()
             if stderr:
@@ -10,6 +10,7 @@ from rich.prompt import Prompt
 from rich.table import Table
 
 from tools import get_removable_drives, format_size
+from tools._powershell import run_powershell
 from utils import console
 
 
@@ -21,13 +22,11 @@ def _get_usb_info(drive: str) -> dict:
         return {"label": "Desconocido", "filesystem": "Desconocido",
                 "size": 0, "free": 0, "health": "Desconocido"}
     try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command",
-             f"Get-Volume -DriveLetter {letter} | Select-Object "
-             f"FileSystemLabel, FileSystem, Size, SizeRemaining, HealthStatus "
-             f"| ConvertTo-Json -Compress"],
-            capture_output=True, text=True, timeout=15,
-            creationflags=subprocess.CREATE_NO_WINDOW,
+        result = run_powershell(
+            f"Get-Volume -DriveLetter {letter} | Select-Object "
+            f"FileSystemLabel, FileSystem, Size, SizeRemaining, HealthStatus "
+            f"| ConvertTo-Json -Compress",
+            timeout=15,
         )
         if result.returncode == 0 and result.stdout.strip():
             data = json.loads(result.stdout)
@@ -0,0 +1,632 @@
+"""Reparacion de .xlsx truncados o danados rescatando las entradas del ZIP.
+
+Un .xlsx cortado a la mitad pierde el directorio central (que va al
+final), asi que ni Excel ni openpyxl lo abren aunque casi todo el
+contenido siga ahi. Este modulo recorre el archivo de principio a fin
+buscando encabezados locales ("PK\\x03\\x04"), descomprime cada parte
+por streaming y la copia a un paquete nuevo:
+
+- Partes integras: se copian tal cual.
+- Hojas (xl/worksheets/*.xml) y sharedStrings danadas: se conserva todo
+  hasta la ultima fila (</row>) o cadena (</si>) completa y se cierran
+  las etiquetas abiertas.
+- Otras partes danadas: se descartan.
+- [Content_Types].xml se regenera con las partes recuperadas, y
+  workbook.xml / sus relaciones / _rels/.rels se sintetizan si faltan o
+  apuntan a partes perdidas.
+
+Todo se procesa por bloques: el libro nunca se carga completo en memoria.
+"""
+
+import os
+import re
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+from xml.parsers import expat
+
+from rich.prompt import Prompt
+
+from utils import format_size, console
+
+
+ZIP_LOCAL = b"PK\x03\x04"
+ZIP_DESCRIPTOR = b"PK\x07\x08"
+# Firmas que marcan el fin de los datos de una entrada "stored" sin tamano
+_NEXT_RECORD = (ZIP_LOCAL, b"PK\x01\x02", b"PK\x05\x06")
+
+# Bloque de lectura del archivo danado
+READ_CHUNK = 1024 * 1024
+
+# Partes no recortables (imagenes, vbaProject...) pasan a disco arriba de esto
+SPOOL_MEMORY = 8 * 1024 * 1024
+
+# Partes que se guardan en memoria y se escriben al final (se pueden reemplazar)
+_DEFERRED = {
+    "[Content_Types].xml",
+    "_rels/.rels",
+    "xl/workbook.xml",
+    "xl/_rels/workbook.xml.rels",
+}
+
+_SHEET_RE = re.compile(r"^xl/worksheets/sheet(\d+)\.xml$")
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_CT = "application/vnd.openxmlformats-officedocument."
+
+# Tipo de contenido por patron de ruta, para regenerar [Content_Types].xml
+_CONTENT_TYPES = [
+    (re.compile(r"^xl/workbook\.xml$"), _CT + "spreadsheetml.sheet.main+xml"),
+    (re.compile(r"^xl/worksheets/sheet\d+\.xml$"), _CT + "spreadsheetml.worksheet+xml"),
+    (re.compile(r"^xl/sharedStrings\.xml$"), _CT + "spreadsheetml.sharedStrings+xml"),
+    (re.compile(r"^xl/styles\.xml$"), _CT + "spreadsheetml.styles+xml"),
+    (re.compile(r"^xl/theme/theme\d+\.xml$"), _CT + "theme+xml"),
+    (re.compile(r"^xl/calcChain\.xml$"), _CT + "spreadsheetml.calcChain+xml"),
+    (re.compile(r"^xl/drawings/drawing\d+\.xml$"), _CT + "drawing+xml"),
+    (re.compile(r"^xl/charts/chart\d+\.xml$"), _CT + "drawingml.chart+xml"),
+    (re.compile(r"^xl/comments\d+\.xml$"), _CT + "spreadsheetml.comments+xml"),
+    (re.compile(r"^xl/tables/table\d+\.xml$"), _CT + "spreadsheetml.table+xml"),
+    (re.compile(r"^docProps/core\.xml$"), "application/vnd.openxmlformats-package.core-properties+xml"),
+    (re.compile(r"^docProps/app\.xml$"), _CT + "extended-properties+xml"),
+    # Las partes .bin no comparten tipo: se distinguen por nombre
+    (re.compile(r"^xl/vbaProject\.bin$"), "application/vnd.ms-office.vbaProject"),
+    (re.compile(r"^xl/printerSettings/printerSettings\d+\.bin$"),
+     _CT + "spreadsheetml.printerSettings"),
+    (re.compile(r"^xl/activeX/activeX\d+\.bin$"), "application/vnd.ms-office.activeX"),
+    (re.compile(r"^xl/embeddings/oleObject\d+\.bin$"), _CT + "oleObject"),
+]
+_DEFAULT_TYPES = {
+    "rels": "application/vnd.openxmlformats-package.relationships+xml",
+    "xml": "application/xml",
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "emf": "image/x-emf",
+    "wmf": "image/x-wmf",
+    "vml": "application/vnd.openxmlformats-officedocument.vmlDrawing",
+}
+
+
+# ─── Lectura secuencial del archivo danado ────────────────────────
+
+
+class _Reader:
+    """Buffer deslizante sobre el archivo: permite buscar firmas y devolver bytes."""
+
+    def __init__(self, f):
+        self._f = f
+        self._buf = bytearray()
+        self.offset = 0  # posicion en el archivo de _buf[0]
+        self.eof = False
+
+    def _fill(self, size: int) -> None:
+        while len(self._buf) < size and not self.eof:
+            data = self._f.read(READ_CHUNK)
+            if not data:
+                self.eof = True
+            self._buf += data
+
+    def peek(self, size: int) -> bytes:
+        self._fill(size)
+        return bytes(self._buf[:size])
+
+    def take(self, size: int) -> bytes:
+        self._fill(size)
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        self.offset += len(data)
+        return data
+
+    def chunk(self) -> bytes:
+        """Hasta READ_CHUNK bytes (lo que haya en el buffer o un bloque nuevo)."""
+        self._fill(1)
+        return self.take(min(len(self._buf), READ_CHUNK))
+
+    def unread(self, data: bytes) -> None:
+        self._buf[:0] = data
+        self.offset -= len(data)
+
+    def seek_signature(self, signatures) -> bool:
+        """Avanza hasta la proxima firma de la lista; False si se acabo el archivo."""
+        while True:
+            self._fill(4)
+            hits = [i for i in (self._buf.find(s) for s in signatures) if i >= 0]
+            if hits:
+                self.take(min(hits))
+                return True
+            if self.eof:
+                self.take(len(self._buf))
+                return False
+            # Conservar 3 bytes por si la firma quedo partida entre bloques
+            keep = len(self._buf) - 3
+            self.take(keep)
+            self._fill(len(self._buf) + READ_CHUNK)
+
+
+# ─── Salida con recorte de XML danado ─────────────────────────────
+
+
+class _PartWriter:
+    """Recibe el contenido descomprimido de una parte y lo escribe al paquete.
+
+    Para hojas y sharedStrings retiene lo posterior al ultimo elemento
+    completo; si la parte resulta danada, ese resto se recorta y se
+    cierran las etiquetas. El miembro del ZIP se abre hasta que hay algo
+    que escribir, asi una parte irrecuperable no deja rastro.
+    """
+
+    def __init__(self, zout: zipfile.ZipFile, name: str, deferred: dict,
+                 discard: bool = False):
+        self.zout = zout
+        self.name = name
+        self.deferred = deferred
+        self.discard = discard
+        self.kind = ("sheet" if _SHEET_RE.match(name)
+                     else "sst" if name == "xl/sharedStrings.xml" else None)
+        self._item = {"sheet": b"</row>", "sst": b"</si>"}.get(self.kind)
+        self._pending = bytearray()
+        # Partes que no se pueden recortar esperan en disco si son grandes
+        self._spool = (tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+                       if self._item is None and name not in _DEFERRED and not discard
+                       else None)
+        self._member = None
+        self._flushed = False
+        self.crc = 0
+        # Las hojas se validan al vuelo: basura que zlib no detecta rompe el XML
+        self._parser = expat.ParserCreate() if self._item and not discard else None
+        self._pending_start = 0  # offset (en el XML) de _pending[0]
+        self.broken = False
+
+    def _open(self):
+        if self._member is None:
+            self._member = self.zout.open(self.name, "w", force_zip64=True)
+        return self._member
+
+    def write(self, data: bytes) -> None:
+        self.crc = zlib.crc32(data, self.crc)
+        if self.discard:
+            return
+        if self._spool is not None:
+            self._spool.write(data)
+            return
+        if self.broken:
+            return
+        self._pending += data
+        if self._item is None:
+            return
+        try:
+            self._parser.Parse(data, False)
+        except expat.ExpatError:
+            # Conservar solo lo anterior al error y dejar de aceptar datos
+            valid = max(self._parser.ErrorByteIndex - self._pending_start, 0)
+            del self._pending[valid:]
+            self.broken = True
+        cut = self._pending.rfind(self._item)
+        if cut >= 0:
+            cut += len(self._item)
+            self._open().write(self._pending[:cut])
+            del self._pending[:cut]
+            self._pending_start += cut
+            self._flushed = True
+
+    def finish(self, intact: bool) -> str:
+        """Cierra la parte. Devuelve "ok", "recortada" o "descartada"."""
+        if self._spool is not None:
+            with self._spool:
+                if not intact:
+                    return "descartada"
+                self._spool.seek(0)
+                shutil.copyfileobj(self._spool, self._open(), READ_CHUNK)
+            self._close()
+            return "ok"
+        if intact:
+            tail = bytes(self._pending)
+            if self.name in _DEFERRED:
+                self.deferred[self.name] = tail
+            else:
+                self._open().write(tail)
+        else:
+            tail = self._salvage_tail()
+            if tail is None:
+                self._close()
+                return "descartada"
+            self._open().write(tail)
+        self._close()
+        return "ok" if intact else "recortada"
+
+    def _salvage_tail(self) -> bytes | None:
+        rem = bytes(self._pending)
+        if self.kind == "sheet":
+            for marker in (b"</sheetData>", b"<sheetData/>"):
+                idx = rem.find(marker)
+                if idx >= 0:
+                    return rem[:idx + len(marker)] + b"</worksheet>"
+            if self._flushed:
+                return b"</sheetData></worksheet>"
+            idx = rem.find(b"<sheetData>")
+            if idx >= 0:
+                return rem[:idx + len(b"<sheetData>")] + b"</sheetData></worksheet>"
+            return None
+        if self.kind == "sst":
+            if self._flushed:
+                return b"</sst>"
+            match = re.search(rb"<sst\b[^>]*>", rem)
+            return rem[:match.end()] + b"</sst>" if match else None
+        return None
+
+    def _close(self) -> None:
+        if self._member is not None:
+            self._member.close()
+            self._member = None
+
+
+# ─── Recorrido de entradas ────────────────────────────────────────
+
+
+def _inflate(reader: _Reader, writer: _PartWriter, csize: int | None) -> bool:
+    """Descomprime una entrada deflate por bloques. True si termino limpia."""
+    d = zlib.decompressobj(-15)
+    remaining = csize
+    while not d.eof:
+        data = reader.chunk()
+        if not data:
+            return False
+        if remaining is not None:
+            if len(data) > remaining:
+                reader.unread(data[remaining:])
+                data = data[:remaining]
+            remaining -= len(data)
+        try:
+            out = d.decompress(data, READ_CHUNK * 4)
+            writer.write(out)
+            # Al llegar al final del stream el resto queda en unused_data
+            while d.unconsumed_tail and not d.eof:
+                out = d.decompress(d.unconsumed_tail, READ_CHUNK * 4)
+                writer.write(out)
+        except zlib.error:
+            return False
+        if remaining == 0 and not d.eof:
+            return False
+    if d.unused_data:
+        reader.unread(d.unused_data)
+    return True
+
+
+def _copy_stored(reader: _Reader, writer: _PartWriter, csize: int | None) -> bool:
+    """Copia una entrada sin compresion. Sin tamano conocido, hasta la siguiente firma."""
+    if csize is not None:
+        while csize > 0:
+            data = reader.take(min(csize, READ_CHUNK))
+            if not data:
+                return False
+            writer.write(data)
+            csize -= len(data)
+        return True
+    while True:
+        window = reader.peek(READ_CHUNK + 3)
+        if not window:
+            return False
+        hits = [i for i in (window.find(s) for s in _NEXT_RECORD) if i >= 0]
+        if hits:
+            writer.write(reader.take(min(hits)))
+            return True
+        if reader.eof:
+            writer.write(reader.take(len(window)))
+            return False
+        writer.write(reader.take(len(window) - 3))
+
+
+def _salvage_entries(f, zout: zipfile.ZipFile, progress_callback=None) -> tuple[dict, dict]:
+    """Recorre las entradas locales y copia lo recuperable a `zout`.
+
+    Returns:
+        (estado por parte, partes diferidas {nombre: bytes})
+    """
+    reader = _Reader(f)
+    status: dict[str, str] = {}
+    deferred: dict[str, bytes] = {}
+
+    while reader.seek_signature([ZIP_LOCAL]):
+        header = reader.take(30)
+        if len(header) < 30:
+            break
+        (_, _, flags, method, _, _, crc, csize, usize,
+         name_len, extra_len) = struct.unpack("<4sHHHHHIIIHH", header)
+        raw_name = reader.take(name_len)
+        extra = reader.take(extra_len)
+        try:
+            name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        except UnicodeDecodeError:
+            name = ""
+        if (not name or len(raw_name) < name_len or method not in (0, 8)
+                or name.endswith("/") or "\x00" in name):
+            # Falsa firma o encabezado danado: seguir buscando justo despues
+            reader.unread((header + raw_name + extra)[4:])
+            continue
+
+        sized = not (flags & 0x08)
+        if sized and (csize == 0xFFFFFFFF or usize == 0xFFFFFFFF):
+            # ZIP64: tamanos reales en el campo extra 0x0001
+            pos = 0
+            while pos + 4 <= len(extra):
+                tag, length = struct.unpack_from("<HH", extra, pos)
+                if tag == 1 and length >= 16:
+                    usize, csize = struct.unpack_from("<QQ", extra, pos + 4)
+                pos += 4 + length
+
+        # Entrada repetida: se lee para avanzar, pero se conserva la primera
+        writer = _PartWriter(zout, name, deferred, discard=name in status)
+
+        known = csize if sized else None
+        ok = (_inflate(reader, writer, known) if method == 8
+              else _copy_stored(reader, writer, known))
+
+        if ok and not sized:
+            # Descriptor: [firma] crc, csize, usize; los tamanos son de 4 u 8
+            # bytes (ZIP64) y se distingue viendo donde empieza el siguiente registro
+            if reader.peek(4) == ZIP_DESCRIPTOR:
+                reader.take(4)
+            desc = reader.peek(24)
+            crc = struct.unpack_from("<I", desc)[0] if len(desc) >= 4 else writer.crc
+            wide = desc[20:24] in _NEXT_RECORD and desc[12:16] not in _NEXT_RECORD
+            reader.take(20 if wide else 12)
+        if ok and (writer.crc != crc or writer.broken):
+            ok = False
+
+        if writer.discard:
+            continue
+        status[name] = writer.finish(ok)
+        if progress_callback:
+            progress_callback(reader.offset)
+
+    return status, deferred
+
+
+# ─── Sintesis de partes de estructura ─────────────────────────────
+
+
+def _rel_targets(rels_xml: bytes) -> dict[str, str]:
+    """Id -> Target (solo relaciones internas)."""
+    targets = {}
+    for tag in re.findall(rb"<Relationship\b[^>]*>", rels_xml):
+        attrs = dict(re.findall(rb'(\w+)="([^"]*)"', tag))
+        if attrs.get(b"TargetMode") == b"External":
+            continue
+        if b"Id" in attrs and b"Target" in attrs:
+            targets[attrs[b"Id"].decode()] = attrs[b"Target"].decode()
+    return targets
+
+
+def _resolve(target: str, base: str = "xl") -> str:
+    if target.startswith("/"):
+        return target[1:]
+    return os.path.normpath(f"{base}/{target}").replace("\\", "/")
+
+
+def _sheet_names(workbook_xml: bytes | None, rels_xml: bytes | None) -> dict[str, str]:
+    """Ruta de hoja -> nombre original, si el workbook y sus relaciones sobrevivieron."""
+    if not workbook_xml or not rels_xml:
+        return {}
+    targets = _rel_targets(rels_xml)
+    names = {}
+    for tag in re.findall(rb"<sheet\b[^>]*>", workbook_xml):
+        name = re.search(rb'\bname="([^"]*)"', tag)
+        rid = re.search(rb'\br:id="([^"]*)"', tag)
+        if name and rid and rid.group(1).decode() in targets:
+            names[_resolve(targets[rid.group(1).decode()])] = name.group(1).decode("utf-8", "replace")
+    return names
+
+
+def _structure_ok(parts: set[str], deferred: dict) -> bool:
+    """True si workbook.xml y sus relaciones existen y todo lo que apuntan se recupero."""
+    wb = deferred.get("xl/workbook.xml")
+    rels = deferred.get("xl/_rels/workbook.xml.rels")
+    if not wb or not rels:
+        return False
+    targets = _rel_targets(rels)
+    sheets_ok = all(
+        rid.decode() in targets
+        for rid in re.findall(rb'<sheet\b[^>]*\br:id="([^"]*)"', wb)
+    )
+    return sheets_ok and all(_resolve(t) in parts for t in targets.values())
+
+
+def _build_workbook(parts: set[str], deferred: dict) -> tuple[bytes, bytes]:
+    """workbook.xml + workbook.xml.rels minimos con las hojas recuperadas."""
+    sheets = sorted((p for p in parts if _SHEET_RE.match(p)),
+                    key=lambda p: int(_SHEET_RE.match(p).group(1)))
+    original = _sheet_names(deferred.get("xl/workbook.xml"),
+                            deferred.get("xl/_rels/workbook.xml.rels"))
+    used = set()
+    sheet_tags, rels = [], []
+    for i, path in enumerate(sheets, 1):
+        name = original.get(path) or f"Hoja{i}"
+        while name.lower() in used:
+            name = f"{name}_{i}"
+        used.add(name.lower())
+        safe = (name.replace("&", "&amp;").replace('"', "&quot;")
+                .replace("<", "&lt;").replace(">", "&gt;"))
+        sheet_tags.append(f'<sheet name="{safe}" sheetId="{i}" r:id="rId{i}"/>')
+        rels.append(
+            f'<Relationship Id="rId{i}" Type="{_NS_REL}/worksheet" '
+            f'Target="{path[len("xl/"):]}"/>'
+        )
+    extra = [("xl/styles.xml", "styles"), ("xl/sharedStrings.xml", "sharedStrings"),
+             ("xl/theme/theme1.xml", "theme")]
+    n = len(sheets)
+    for path, rel_type in extra:
+        if path in parts:
+            n += 1
+            rels.append(f'<Relationship Id="rId{n}" Type="{_NS_REL}/{rel_type}" '
+                        f'Target="{path[len("xl/"):]}"/>')
+
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">'
+        f'<sheets>{"".join(sheet_tags)}</sheets></workbook>'
+    )
+    workbook_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{_NS_PKG_REL}">{"".join(rels)}</Relationships>'
+    )
+    return workbook.encode("utf-8"), workbook_rels.encode("utf-8")
+
+
+def _build_root_rels(parts: set[str]) -> bytes:
+    rels = [f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>']
+    if "docProps/core.xml" in parts:
+        rels.append('<Relationship Id="rId2" '
+                    'Type="http://schemas.openxmlformats.org/package/2006/relationships/'
+                    'metadata/core-properties" Target="docProps/core.xml"/>')
+    if "docProps/app.xml" in parts:
+        rels.append(f'<Relationship Id="rId3" Type="{_NS_REL}/extended-properties" '
+                    'Target="docProps/app.xml"/>')
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{_NS_PKG_REL}">{"".join(rels)}</Relationships>'
+    ).encode("utf-8")
+
+
+def _build_content_types(parts: set[str], original: bytes | None) -> bytes:
+    """[Content_Types].xml para las partes presentes, reutilizando tipos originales.
+
+    Los <Default> del original se conservan todos; de _DEFAULT_TYPES solo
+    se agregan las extensiones que falten.
+    """
+    overrides = {}
+    defaults = {}
+    if original:
+        for tag in re.findall(rb"<(?:Override|Default)\b[^>]*>", original):
+            attrs = dict(re.findall(rb'(\w+)="([^"]*)"', tag))
+            if b"ContentType" not in attrs:
+                continue
+            ctype = attrs[b"ContentType"].decode()
+            if b"PartName" in attrs:
+                overrides[attrs[b"PartName"].decode().lstrip("/")] = ctype
+            elif b"Extension" in attrs:
+                defaults[attrs[b"Extension"].decode().lower()] = ctype
+
+    for ext in ("rels", "xml"):
+        defaults.setdefault(ext, _DEFAULT_TYPES[ext])
+    entries = []
+    for part in sorted(parts):
+        ctype = overrides.get(part)
+        if ctype is None:
+            ctype = next((t for pattern, t in _CONTENT_TYPES if pattern.match(part)), None)
+        if ctype is not None:
+            entries.append(f'<Override PartName="/{part}" ContentType="{ctype}"/>')
+        else:
+            ext = part.rsplit(".", 1)[-1].lower() if "." in part else ""
+            if ext not in defaults and ext in _DEFAULT_TYPES:
+                defaults[ext] = _DEFAULT_TYPES[ext]
+    default_tags = [f'<Default Extension="{ext}" ContentType="{ctype}"/>'
+                    for ext, ctype in sorted(defaults.items())]
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        f'{"".join(default_tags)}{"".join(entries)}</Types>'
+    ).encode("utf-8")
+
+
+# ─── API ──────────────────────────────────────────────────────────
+
+
+def repair_xlsx(source: str, dest: str, progress_callback=None) -> dict:
+    """Reconstruye un .xlsx a partir de lo que se pueda rescatar de `source`.
+
+    Args:
+        source: Archivo danado.
+        dest: Ruta del .xlsx reparado (no debe ser la misma).
+        progress_callback: Funcion opcional que recibe los bytes leidos.
+
+    Returns:
+        dict con listas "ok", "recortadas", "descartadas", "sintetizadas"
+        y "hojas" (numero de hojas en el resultado).
+
+    Raises:
+        ValueError: Si no se recupero ninguna hoja.
+        OSError: Si no se puede leer el origen o escribir el destino.
+    """
+    with open(source, "rb") as f, zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as zout:
+        status, deferred = _salvage_entries(f, zout, progress_callback)
+
+        parts = {name for name, st in status.items() if st != "descartada"}
+        sheets = [p for p in parts if _SHEET_RE.match(p)]
+        if not sheets:
+            raise ValueError("No se recupero ninguna hoja del archivo")
+
+        synthesized = []
+        if not _structure_ok(parts, deferred):
+            wb, wb_rels = _build_workbook(parts, deferred)
+            deferred["xl/workbook.xml"], deferred["xl/_rels/workbook.xml.rels"] = wb, wb_rels
+            synthesized += ["xl/workbook.xml", "xl/_rels/workbook.xml.rels"]
+        if "_rels/.rels" not in deferred:
+            deferred["_rels/.rels"] = _build_root_rels(parts)
+            synthesized.append("_rels/.rels")
+
+        parts.update(deferred)
+        content_types = _build_content_types(parts - {"[Content_Types].xml"},
+                                             deferred.get("[Content_Types].xml"))
+        deferred["[Content_Types].xml"] = content_types
+        for name, data in deferred.items():
+            zout.writestr(name, data)
+
+    return {
+        "ok": sorted(n for n, st in status.items() if st == "ok"),
+        "recortadas": sorted(n for n, st in status.items() if st == "recortada"),
+        "descartadas": sorted(n for n, st in status.items() if st == "descartada"),
+        "sintetizadas": synthesized,
+        "hojas": len(sheets),
+    }
+
+
+def xlsx_repair_menu() -> None:
+    """Menu para reparar un .xlsx que no abre."""
+    console.print("\n[bold cyan]Reparar Excel danado (.xlsx)[/bold cyan]\n")
+    source = Prompt.ask("[bold]Ruta del archivo danado[/bold]").strip().strip('"')
+    if not source or not os.path.isfile(source):
+        console.print("[red]Archivo no encontrado.[/red]")
+        return
+
+    base, _ = os.path.splitext(source)
+    dest = Prompt.ask("Guardar reparado como", default=f"{base}_reparado.xlsx").strip().strip('"')
+    if os.path.abspath(dest) == os.path.abspath(source):
+        console.print("[red]El destino no puede ser el mismo archivo.[/red]")
+        return
+
+    total = os.path.getsize(source)
+    try:
+        with console.status("[bold green]Rescatando partes...") as status:
+            def progress(done):
+                status.update(
+                    f"[bold green]Rescatando partes...[/bold green] "
+                    f"{format_size(done)} / {format_size(total)}"
+                )
+            report = repair_xlsx(source, dest, progress)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]No se pudo reparar: {e}[/red]")
+        try:
+            os.remove(dest)
+        except OSError:
+            pass
+        return
+
+    console.print(f"\n[bold green]Archivo reparado:[/bold green] {dest}")
+    console.print(f"  Hojas recuperadas: {report['hojas']}")
+    console.print(f"  Partes integras: {len(report['ok'])}")
+    for name in report["recortadas"]:
+        console.print(f"  [yellow]Recortada (se conservaron las filas completas):[/yellow] {name}")
+    for name in report["descartadas"]:
+        console.print(f"  [red]Descartada:[/red] {name}")
+    if report["sintetizadas"]:
+        console.print(f"  [dim]Reconstruidas: {', '.join(report['sintetizadas'])}[/dim]")
+    if report["recortadas"] or report["descartadas"]:
+        console.print(
+            "[dim]Si Excel ofrece reparar el archivo al abrirlo, acepta: "
+            "completara lo que haga falta.[/dim]"
+        )
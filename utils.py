@@ -41,65 +41,296 @@ def get_drives() -> list[str]:
     return drives
 
 
-def read_lnk_target(lnk_path: str) -> str | None:
-    """Lee la ruta destino de un archivo .lnk (shortcut de Windows).
+def filetime_to_timestamp(filetime: int) -> float | None:
+    """Convierte un FILETIME de Windows (100 ns desde 1601) a timestamp Unix."""
+    if not filetime:
+        return None
+    return (filetime - 116_444_736_000_000_000) / 10_000_000
+
+
+def raw_device_path(path: str) -> str:
+    """Convierte una letra de unidad ('E:' o 'E:\\') a la ruta del volumen crudo.
 
-    Implementacion basada en la especificacion [MS-SHLLINK] que extrae
-    la ruta del LocalBasePath del formato Shell Link Binary (.lnk).
+    Rutas de imagenes (.img, .dd, etc.) se devuelven sin cambios.
     """
-    try:
-        with open(lnk_path, "rb") as f:
-            content = f.read()
+    path = path.strip().strip('"')
+    if len(path) in (2, 3) and path[0].isalpha() and path[1] == ":" and path[2:] in ("", "\\"):
+        return f"\\\\.\\{path[0].upper()}:"
+    return path
 
-        # Verificar magic number del formato .lnk
-        if len(content) < 76:
-            return None
+
+def read_aligned(f, offset: int, size: int, align: int = 4096) -> bytes:
+    """Lee `size` bytes desde `offset` alineando la lectura a sectores.
+
+    Windows exige lecturas alineadas a sector al abrir volumenes crudos
+    (\\\\.\\E:); en archivos de imagen la alineacion no estorba.
+    """
+    start = offset - offset % align
+    end = offset + size
+    end += -end % align
+    f.seek(start)
+    data = f.read(end - start)
+    return data[offset - start:offset - start + size]
+
+
+# Flags del header de un Shell Link [MS-SHLLINK 2.1.1]
+_LNK_HAS_ID_LIST = 0x01
+_LNK_HAS_LINK_INFO = 0x02
+_LNK_STRING_FLAGS = (
+    (0x04, "nombre"),
+    (0x08, "ruta_relativa"),
+    (0x10, "dir_trabajo"),
+    (0x20, "argumentos"),
+    (0x40, "icono"),
+)
+_LNK_IS_UNICODE = 0x80
+_LNK_ENV_BLOCK = 0xA0000001
+
+
+def _lnk_ansi(data: bytes, mv: memoryview, start: int) -> str:
+    """String ANSI terminado en NUL a partir de `start` (latin-1 para no fallar con acentos)."""
+    end = data.find(b"\x00", start)
+    if end == -1:
+        end = len(data)
+    return str(mv[start:end], "latin-1")
+
+
+def _lnk_unicode(data: bytes, mv: memoryview, start: int) -> str:
+    """String UTF-16LE terminado en NUL a partir de `start`."""
+    end = data.find(b"\x00\x00", start)
+    while end != -1 and (end - start) % 2:
+        end = data.find(b"\x00\x00", end + 1)
+    if end == -1:
+        end = len(data) - (len(data) - start) % 2
+    return str(mv[start:end], "utf-16-le", "replace")
+
+
+def _parse_link_info(data: bytes, mv: memoryview, base: int, info: dict) -> None:
+    """Parsea la estructura LinkInfo: ruta local y/o de red, ANSI y Unicode."""
+    header_size, flags, _, local_off, net_off, suffix_off = (
+        struct.unpack_from("<IIIIII", mv, base + 4)
+    )
+    local_u = suffix_u = 0
+    if header_size >= 0x24:
+        local_u, suffix_u = struct.unpack_from("<II", mv, base + 0x1C)
+
+    if suffix_u:
+        suffix = _lnk_unicode(data, mv, base + suffix_u)
+    elif suffix_off:
+        suffix = _lnk_ansi(data, mv, base + suffix_off)
+    else:
+        suffix = ""
+
+    # VolumeIDAndLocalBasePath
+    if flags & 0x01:
+        if local_u:
+            local = _lnk_unicode(data, mv, base + local_u)
+        else:
+            local = _lnk_ansi(data, mv, base + local_off)
+        info["ruta_local"] = local + suffix
+
+    # CommonNetworkRelativeLinkAndPathSuffix
+    if flags & 0x02 and net_off:
+        cnrl = base + net_off
+        net_name_off, device_off = struct.unpack_from("<II", mv, cnrl + 8)
+        if net_name_off > 0x14:
+            net_name_u, device_u = struct.unpack_from("<II", mv, cnrl + 0x14)
+            net_name = _lnk_unicode(data, mv, cnrl + net_name_u)
+            device = _lnk_unicode(data, mv, cnrl + device_u) if device_u else ""
+        else:
+            net_name = _lnk_ansi(data, mv, cnrl + net_name_off)
+            device = _lnk_ansi(data, mv, cnrl + device_off) if device_off else ""
+        net_name = net_name.rstrip("\\")
+        info["ruta_red"] = f"{net_name}\\{suffix}" if suffix else net_name
+        if device:
+            info["unidad_red"] = device
+
+
+def parse_lnk(content: bytes) -> dict | None:
+    """Parsea un Shell Link (.lnk) completo ya leido en memoria.
+
+    Implementacion basada en la especificacion [MS-SHLLINK]: LinkInfo
+    (ruta local, CommonNetworkRelativeLink y offsets Unicode), StringData
+    y el bloque EnvironmentVariableDataBlock de ExtraData. Trabaja sobre
+    un memoryview para no copiar el contenido.
+
+    Returns:
+        dict con las llaves encontradas (ruta_local, ruta_red, unidad_red,
+        nombre, ruta_relativa, dir_trabajo, argumentos, icono,
+        ruta_entorno) mas `destino`, la mejor ruta disponible; o None si
+        el contenido no es un Shell Link valido.
+    """
+    mv = memoryview(content)
+    try:
         # HeaderSize debe ser 0x4C
-        header_size = struct.unpack_from("<I", content, 0)[0]
-        if header_size != 0x4C:
+        if len(content) < 0x4C or struct.unpack_from("<I", mv, 0)[0] != 0x4C:
             return None
+        flags, = struct.unpack_from("<I", mv, 0x14)
+        info = {}
+        offset = 0x4C
 
-        # Flags en offset 0x14
-        flags = struct.unpack_from("<I", content, 0x14)[0]
-        has_link_target_id = flags & 0x01
-        has_link_info = flags & 0x02
+        # Saltar LinkTargetIDList si existe
+        if flags & _LNK_HAS_ID_LIST:
+            offset += 2 + struct.unpack_from("<H", mv, offset)[0]
 
-        offset = 0x4C  # Despues del header
+        if flags & _LNK_HAS_LINK_INFO:
+            link_info_size, = struct.unpack_from("<I", mv, offset)
+            _parse_link_info(content, mv, offset, info)
+            offset += link_info_size
 
-        # Saltar LinkTargetIDList si existe
-        if has_link_target_id:
-            if offset + 2 > len(content):
-                return None
-            id_list_size = struct.unpack_from("<H", content, offset)[0]
-            offset += 2 + id_list_size
-
-        # Leer LinkInfo si existe
-        if has_link_info:
-            if offset + 20 > len(content):
-                return None
-            link_info_start = offset
-
-            # LinkInfoFlags en offset+8: bit 0 = VolumeIDAndLocalBasePath
-            link_info_flags = struct.unpack_from("<I", content, offset + 8)[0]
-            if not (link_info_flags & 0x01):
-                return None  # No hay ruta local (posible ruta de red)
-
-            # LocalBasePathOffset esta en offset+16 dentro de LinkInfo
-            local_base_path_offset = struct.unpack_from("<I", content, offset + 16)[0]
-
-            path_start = link_info_start + local_base_path_offset
-            if path_start >= len(content):
-                return None
-
-            # Leer string null-terminated (latin-1 para soportar acentos)
-            end = content.index(b"\x00", path_start)
-            path = content[path_start:end].decode("latin-1")
-            if path and os.path.splitext(path)[1]:
-                return path
+        # StringData: CountCharacters (2 bytes) + caracteres sin NUL
+        char_size = 2 if flags & _LNK_IS_UNICODE else 1
+        encoding = "utf-16-le" if char_size == 2 else "latin-1"
+        for flag, key in _LNK_STRING_FLAGS:
+            if flags & flag:
+                count, = struct.unpack_from("<H", mv, offset)
+                offset += 2
+                info[key] = str(mv[offset:offset + count * char_size], encoding, "replace")
+                offset += count * char_size
 
+        # ExtraData: bloques (BlockSize, BlockSignature) hasta un terminal < 4
+        while offset + 8 <= len(content):
+            block_size, signature = struct.unpack_from("<II", mv, offset)
+            if block_size < 8:
+                break
+            if signature == _LNK_ENV_BLOCK and block_size >= 0x314:
+                target = _lnk_unicode(content, mv, offset + 268) or _lnk_ansi(content, mv, offset + 8)
+                if target:
+                    info["ruta_entorno"] = target
+            offset += block_size
+    except (struct.error, ValueError, IndexError):
         return None
-    except (OSError, struct.error, ValueError):
+
+    info["destino"] = (
+        info.get("ruta_local")
+        or info.get("ruta_red")
+        or (os.path.expandvars(info["ruta_entorno"]) if "ruta_entorno" in info else None)
+        or info.get("ruta_relativa")
+    )
+    return info
+
+
+def read_lnk(lnk_path: str) -> dict | None:
+    """Lee y parsea un archivo .lnk completo (ver `parse_lnk`)."""
+    try:
+        with open(lnk_path, "rb") as f:
+            content = f.read()
+    except OSError:
+        return None
+    return parse_lnk(content)
+
+
+def parse_lnk_target(content: bytes, base_dir: str = "") -> str | None:
+    """Ruta destino de un Shell Link en memoria, solo si apunta a un archivo.
+
+    Se usa tanto para archivos .lnk como para los streams de las listas
+    de saltos (jump lists), que contienen shell links embebidos.
+
+    Args:
+        content: Bytes del shell link.
+        base_dir: Carpeta del .lnk, para resolver rutas relativas.
+    """
+    info = parse_lnk(content)
+    if not info:
         return None
+    path = info["destino"]
+    if path and base_dir and path == info.get("ruta_relativa"):
+        path = os.path.normpath(os.path.join(base_dir, path))
+    if path and os.path.splitext(path)[1]:
+        return path
+    return None
+
+
+def read_lnk_target(lnk_path: str) -> str | None:
+    """Lee la ruta destino de un archivo .lnk (shortcut de Windows)."""
+    try:
+        with open(lnk_path, "rb") as f:
+            content = f.read()
+    except OSError:
+        return None
+    return parse_lnk_target(content, os.path.dirname(lnk_path))
+
+
+def read_cfb_streams(data: bytes) -> dict[str, bytes]:
+    """Extrae los streams de un Compound File Binary (OLE2) en memoria.
+
+    Soporta sectores de 512/4096 bytes, cadena DIFAT y mini stream.
+    Devuelve todos los streams por nombre, sin la jerarquia de storages.
+
+    Raises:
+        ValueError: Si el archivo no es CFB o su estructura esta corrupta.
+    """
+    if data[:8] != b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" or len(data) < 512:
+        raise ValueError("No es un archivo OLE2")
+    try:
+        sector_shift, mini_shift = struct.unpack_from("<HH", data, 0x1E)
+        ssize = 1 << sector_shift
+        mini_size = 1 << mini_shift
+        num_fat, first_dir = struct.unpack_from("<II", data, 0x2C)
+        cutoff, first_minifat, num_minifat, first_difat, num_difat = (
+            struct.unpack_from("<IIIII", data, 0x38)
+        )
+        max_sector = len(data) // ssize
+
+        def sector(n: int) -> bytes:
+            return data[(n + 1) * ssize:(n + 2) * ssize]
+
+        fat_sectors = list(struct.unpack_from("<109I", data, 0x4C))
+        per_difat = ssize // 4 - 1
+        current = first_difat
+        for _ in range(num_difat):
+            if current >= max_sector:
+                raise ValueError("Cadena DIFAT invalida")
+            entries = struct.unpack(f"<{per_difat + 1}I", sector(current))
+            fat_sectors.extend(entries[:per_difat])
+            current = entries[-1]
+        fat = []
+        for s in fat_sectors[:num_fat]:
+            if s >= max_sector:
+                raise ValueError("Sector de FAT fuera del archivo")
+            fat.extend(struct.unpack(f"<{ssize // 4}I", sector(s)))
+
+        def chain(start: int, table: list[int]) -> list[int]:
+            sectors = []
+            while start < len(table) and len(sectors) <= len(table):
+                sectors.append(start)
+                start = table[start]
+            return sectors
+
+        def read_stream(start: int, size: int) -> bytes:
+            return b"".join(sector(s) for s in chain(start, fat))[:size]
+
+        directory = read_stream(first_dir, len(data))
+        entries = []
+        for off in range(0, len(directory) - 127, 128):
+            name_len, obj_type = struct.unpack_from("<HB", directory, off + 64)
+            start, size = struct.unpack_from("<IQ", directory, off + 116)
+            if ssize == 512:
+                size &= 0xFFFFFFFF  # En v3 la parte alta no es confiable
+            name = directory[off:off + max(name_len - 2, 0)].decode("utf-16-le", "replace")
+            entries.append((name, obj_type, start, size))
+        if not entries or entries[0][1] != 5:
+            raise ValueError("Falta la entrada raiz")
+
+        root_start, root_size = entries[0][2], entries[0][3]
+        mini_stream = read_stream(root_start, root_size)
+        minifat_data = read_stream(first_minifat, num_minifat * ssize)
+        minifat = list(struct.unpack(f"<{len(minifat_data) // 4}I", minifat_data))
+
+        streams = {}
+        for name, obj_type, start, size in entries[1:]:
+            if obj_type != 2:
+                continue
+            if size < cutoff:
+                streams[name] = b"".join(
+                    mini_stream[s * mini_size:(s + 1) * mini_size]
+                    for s in chain(start, minifat)
+                )[:size]
+            else:
+                streams[name] = read_stream(start, size)
+        return streams
+    except struct.error as e:
+        raise ValueError(f"Estructura OLE2 corrupta: {e}") from e
 
 
 def get_openpyxl():